@@ -10,6 +10,8 @@ from fireworks import explicit_serialize, FiretaskBase, FWAction
 
 from atomate.utils.utils import env_chk, load_class, recursive_get_result
 from atomate.utils.fileio import FileClient
+from atomate.utils.blob_store import offload_large_values
+from atomate.utils.parse_cache import ParseCache
 from monty.shutil import copy_r, gzip_dir
 
 __author__ = "Anubhav Jain"
@@ -273,10 +275,21 @@ class PassResult(FiretaskBase):
             defaults to "_set"
         mod_spec_key (str): key to pass to mod_spec _set dictmod command, defaults
             to "prev_calc_result"
+        parse_cache (dict): if set, the parsed output is loaded from (or stored in)
+            the on-disk parse cache, see atomate.utils.parse_cache. The dict holds
+            the ParseCache kwargs, e.g. {"cache_dir": None, "max_size": 2e9}.
+            Requires a "filename" key in parse_kwargs.
+        blob_store (dict): if set, the values of pass_dict that are larger
+            than blob_store["min_size"] bytes (serialized) are stored once in
+            the blob store and a small handle is passed instead, see
+            atomate.utils.blob_store. The dict holds the db_file (GridFS,
+            supports env_chk) or blob_dir (local, shared directory) and
+            optionally min_size. The consumers must resolve the handles.
     """
 
     required_params = ["pass_dict", "parse_class", "parse_kwargs"]
-    optional_params = ["calc_dir", "mod_spec_cmd", "mod_spec_key"]
+    optional_params = ["calc_dir", "mod_spec_cmd", "mod_spec_key", "parse_cache",
+                       "blob_store"]
 
     def run_task(self, fw_spec):
         pass_dict = self.get("pass_dict")
@@ -285,9 +298,18 @@ class PassResult(FiretaskBase):
         parse_class = load_class(*pc_string.rsplit(".", 1))
         calc_dir = self.get("calc_dir", ".")
         with monty.os.cd(calc_dir):
-            result = parse_class(**parse_kwargs)
+            if self.get("parse_cache") is not None:
+                parse_kwargs = dict(parse_kwargs)
+                filename = parse_kwargs.pop("filename")
+                result = ParseCache(**self["parse_cache"]).parse(parse_class, filename,
+                                                                  **parse_kwargs)
+            else:
+                result = parse_class(**parse_kwargs)
 
         pass_dict = recursive_get_result(pass_dict, result)
+        if self.get("blob_store"):
+            pass_dict = offload_large_values(pass_dict, fw_spec=fw_spec,
+                                             **self["blob_store"])
         mod_spec_key = self.get("mod_spec_key", "prev_calc_result")
         mod_spec_cmd = self.get("mod_spec_cmd", "_set")
         return FWAction(mod_spec=[{mod_spec_cmd: {mod_spec_key: pass_dict}}])
@@ -5,7 +5,7 @@
 This module defines the database classes.
 """
 
-from atomate.utils.database import CalcDb
+from atomate.utils.database import CalcDb, decode_array
 from atomate.utils.utils import get_logger
 
 __author__ = 'Kiran Mathew'
@@ -27,6 +27,20 @@ class FeffCalcDb(CalcDb):
         for i in _indexes:
             self.collection.create_index(i, background=background)
 
+    @staticmethod
+    def get_spectrum(doc):
+        """
+        The spectrum of a task document, stored inline as a list or as a compact
+        binary array.
+
+        Args:
+            doc (dict): the task document
+
+        Returns:
+            numpy array
+        """
+        return decode_array(doc["spectrum"])
+
     def reset(self):
         self.collection.delete_many({})
         self.build_indexes()
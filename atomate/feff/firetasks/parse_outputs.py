@@ -18,12 +18,21 @@ from atomate.utils.utils import env_chk
 from atomate.common.firetasks.glue_tasks import get_calc_loc
 from atomate.utils.utils import get_logger
 from atomate.feff.database import FeffCalcDb
+from atomate.feff.firetasks.run_calc import get_site_dir
+from atomate.utils.database import encode_array
 
 __author__ = 'Kiran Mathew'
 __email__ = 'kmathew@lbl.gov'
 
 logger = get_logger(__name__)
 
+# file name of the archive of the path files
+PATHS_ARCHIVE = "feff_paths.json"
+
+# number of leading axis (not spectral) columns of the spectrum files: the absolute
+# energy, and for xmu.dat the energy relative to the edge and k
+SPECTRUM_AXIS_COLUMNS = {"xmu.dat": 3, "eels.dat": 1}
+
 
 @explicit_serialize
 class SpectrumToDbTask(FiretaskBase):
@@ -46,10 +55,13 @@ class SpectrumToDbTask(FiretaskBase):
         db_file (str): path to the db file.
         edge (str): absorption edge
         metadata (dict): meta data
+        binary_arrays (bool): store the spectrum in the database as a compact binary
+            array rather than a nested list. Use FeffCalcDb.get_spectrum to read it.
     """
 
     required_params = ["absorbing_atom", "structure", "spectrum_type", "output_file"]
-    optional_params = ["input_file", "calc_dir", "calc_loc", "db_file", "edge", "metadata"]
+    optional_params = ["input_file", "calc_dir", "calc_loc", "db_file", "edge", "metadata",
+                       "binary_arrays"]
 
     def run_task(self, fw_spec):
         calc_dir = os.getcwd()
@@ -62,6 +74,7 @@ class SpectrumToDbTask(FiretaskBase):
 
         db_file = env_chk(self.get('db_file'), fw_spec)
 
+        spectrum = np.loadtxt(os.path.join(calc_dir, self["output_file"]))
         cluster_dict = None
         tags = Tags.from_file(filename="feff.inp")
         if "RECIPROCAL" not in tags:
@@ -71,7 +84,7 @@ class SpectrumToDbTask(FiretaskBase):
                "structure": self["structure"].as_dict(),
                "absorbing_atom": self["absorbing_atom"],
                "spectrum_type": self["spectrum_type"],
-               "spectrum": np.loadtxt(os.path.join(calc_dir, self["output_file"])).tolist(),
+               "spectrum": spectrum.tolist(),
                "edge": self.get("edge", None),
                "metadata": self.get("metadata", None),
                "dir_name": os.path.abspath(os.getcwd()),
@@ -82,6 +95,8 @@ class SpectrumToDbTask(FiretaskBase):
                 f.write(json.dumps(doc, default=DATETIME_HANDLER))
 
         else:
+            if self.get("binary_arrays", False):
+                doc["spectrum"] = encode_array(spectrum)
             db = FeffCalcDb.from_db_file(db_file, admin=True)
             db.insert(doc)
 
@@ -90,6 +105,110 @@ class SpectrumToDbTask(FiretaskBase):
         return FWAction(stored_data={"task_id": doc.get("task_id", None)})
 
 
+@explicit_serialize
+class SiteAveragedSpectrumToDbTask(FiretaskBase):
+    """
+    Parse the spectra(xmu.dat, eels.dat) of the absorbing sites of a batch run (see
+    RunFeffBatch), average them and insert the site-averaged spectrum into the database.
+    The spectral columns are interpolated on the energy grid of the first site and averaged
+    with the given weights (e.g. the multiplicities of the symmetrically distinct sites); the
+    axis columns (energy, and for xmu.dat the relative energy and k) are those of the first
+    site.
+
+    Required_params:
+        absorbing_atom (str): absorbing atom symbol
+        absorbing_atoms ([int]): site indices of the absorbing atoms
+        structure (Structure): input structure
+        spectrum_type (str): XANES, EXAFS, ELNES, EXELFS
+        output_file (str): the output file name. xmu.dat or eels.dat
+
+    Optional_params:
+        weights ([float]): weights of the absorbing sites. Default: equal weights.
+        calc_dir (str): path to dir (on current filesystem) that contains the site
+            subdirectories. Default: use current working directory.
+        calc_loc (str OR bool): if True will set most recent calc_loc. If str search for the
+            most recent calc_loc with the matching name
+        db_file (str): path to the db file.
+        edge (str): absorption edge
+        metadata (dict): meta data
+        site_spectra (bool): also store the spectra of the individual sites.
+        binary_arrays (bool): store the spectra in the database as compact binary arrays.
+    """
+
+    required_params = ["absorbing_atom", "absorbing_atoms", "structure", "spectrum_type",
+                       "output_file"]
+    optional_params = ["weights", "calc_dir", "calc_loc", "db_file", "edge", "metadata",
+                       "site_spectra", "binary_arrays"]
+
+    def run_task(self, fw_spec):
+        calc_dir = os.getcwd()
+        if "calc_dir" in self:
+            calc_dir = self["calc_dir"]
+        elif self.get("calc_loc"):
+            calc_dir = get_calc_loc(self["calc_loc"], fw_spec["calc_locs"])["path"]
+
+        logger.info("PARSING DIRECTORY: {}".format(calc_dir))
+
+        db_file = env_chk(self.get('db_file'), fw_spec)
+
+        # the sites whose run failed are left out of the average
+        absorbing_atoms, weights, spectra = [], [], []
+        all_weights = self.get("weights") or [1.0] * len(self["absorbing_atoms"])
+        for ab_idx, w in zip(self["absorbing_atoms"], all_weights):
+            fname = os.path.join(calc_dir, get_site_dir(ab_idx), self["output_file"])
+            if not os.path.exists(fname):
+                logger.warning("No {} for the absorbing site {}".format(self["output_file"],
+                                                                       ab_idx))
+                continue
+            absorbing_atoms.append(ab_idx)
+            weights.append(w)
+            spectra.append(np.atleast_2d(np.loadtxt(fname)))
+        if not spectra:
+            raise RuntimeError("No spectrum found in {}".format(calc_dir))
+
+        n_axes = SPECTRUM_AXIS_COLUMNS.get(os.path.basename(self["output_file"]), 1)
+        energies = spectra[0][:, 0]
+        spectrum = np.zeros_like(spectra[0])
+        spectrum[:, :n_axes] = spectra[0][:, :n_axes]
+        for w, sp in zip(weights, spectra):
+            for j in range(n_axes, sp.shape[1]):
+                spectrum[:, j] += w * np.interp(energies, sp[:, 0], sp[:, j])
+        spectrum[:, n_axes:] /= sum(weights)
+
+        feff_inp = os.path.join(calc_dir, get_site_dir(absorbing_atoms[0]), "feff.inp")
+        tags = Tags.from_file(filename=feff_inp)
+        doc = {"input_parameters": tags.as_dict(),
+               "structure": self["structure"].as_dict(),
+               "absorbing_atom": self["absorbing_atom"],
+               "absorbing_atom_indices": absorbing_atoms,
+               "site_weights": weights,
+               "site_averaged": True,
+               "spectrum_type": self["spectrum_type"],
+               "spectrum": spectrum.tolist(),
+               "edge": self.get("edge", None),
+               "metadata": self.get("metadata", None),
+               "dir_name": os.path.abspath(calc_dir),
+               "last_updated": datetime.utcnow()}
+        if self.get("site_spectra", False):
+            doc["site_spectra"] = [sp.tolist() for sp in spectra]
+
+        if not db_file:
+            with open("feff_task.json", "w") as f:
+                f.write(json.dumps(doc, default=DATETIME_HANDLER))
+
+        else:
+            if self.get("binary_arrays", False):
+                doc["spectrum"] = encode_array(spectrum)
+                if "site_spectra" in doc:
+                    doc["site_spectra"] = [encode_array(sp) for sp in spectra]
+            db = FeffCalcDb.from_db_file(db_file, admin=True)
+            db.insert(doc)
+
+        logger.info("Finished parsing the spectra of {} sites".format(len(absorbing_atoms)))
+
+        return FWAction(stored_data={"task_id": doc.get("task_id", None)})
+
+
 @explicit_serialize
 class AddPathsToFilepadTask(FiretaskBase):
     """
@@ -100,15 +219,54 @@ class AddPathsToFilepadTask(FiretaskBase):
         filepad_file (str): path to the filepad connection settings file.
         compress (bool): wether or not to compress the file contents before insertion.
         metadata (dict): metadata.
+        archive (bool): insert all the path files at once, as a single (compressed) archive
+            whose metadata holds the index of the files, rather than one filepad
+            entry per file. Use get_paths_from_filepad to read them back.
+        identifier (str): identifier of the archive. Default is
+            "<dir_name>:feff_paths". It is returned in the stored_data.
     """
 
-    optional_params = ["labels", "filepad_file", "compress", "metadata"]
+    optional_params = ["labels", "filepad_file", "compress", "metadata", "archive", "identifier"]
 
     def run_task(self, fw_spec):
-        paths = glob("feff????.dat")
+        paths = sorted(glob("feff????.dat"))
         fpad = get_fpad(self.get("filepad_file", None))
         labels = self.get("labels", None)
+        if self.get("archive", False):
+            contents = {}
+            for p in paths:
+                with open(p, "r") as f:
+                    contents[p] = f.read()
+            metadata = dict(self.get("metadata", None) or {})
+            metadata["paths"] = paths
+            if labels:
+                metadata["labels"] = labels
+            with open(PATHS_ARCHIVE, "w") as f:
+                json.dump(contents, f)
+            identifier = self.get("identifier", None) or \
+                "{}:feff_paths".format(os.path.abspath(os.getcwd()))
+            fpad.add_file(PATHS_ARCHIVE, identifier=identifier,
+                          metadata=metadata, compress=self.get("compress", True))
+            logger.info("Inserted {} path files in one archive".format(len(paths)))
+            return FWAction(stored_data={"identifier": identifier})
         for i, p in enumerate(paths):
-            l = labels[i] if labels is not None else None
-            fpad.add_file(p, label=l, metadata=self.get("metadata", None),
+            l = labels[i] if labels else None
+            fpad.add_file(p, identifier=l, metadata=self.get("metadata", None),
                           compress=self.get("compress", True))
+
+
+def get_paths_from_filepad(fpad, identifier):
+    """
+    Read the path files of an archive inserted by AddPathsToFilepadTask.
+
+    Args:
+        fpad (FilePad): the filepad
+        identifier (str): identifier of the archive
+
+    Returns:
+        (dict) path file name -> file contents
+    """
+    contents, _ = fpad.get_file(identifier)
+    if isinstance(contents, bytes):
+        contents = contents.decode("utf-8")
+    return json.loads(contents)
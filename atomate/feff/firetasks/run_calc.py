@@ -5,10 +5,13 @@
 This module defines tasks to run FEFF.
 """
 
+import os
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
 
-from fireworks import explicit_serialize, FiretaskBase
+from fireworks import explicit_serialize, FiretaskBase, FWAction
 
+from atomate.feff.firetasks.write_inputs import get_feff_input_set_obj
 from atomate.utils.utils import env_chk, get_logger
 
 __author__ = 'Kiran Mathew'
@@ -33,3 +36,62 @@ class RunFeffDirect(FiretaskBase):
         logger.info("Running FEFF using exe: {}".format(feff_cmd))
         return_code = subprocess.call(feff_cmd, shell=True)
         logger.info("FEFF finished running with returncode: {}".format(return_code))
+
+
+def get_site_dir(absorbing_atom):
+    """
+    Name of the subdirectory of the FEFF run of an absorbing site in a batch.
+    """
+    return "site_{}".format(absorbing_atom)
+
+
+def _run_feff_site(args):
+    """
+    Write the input of an absorbing site and run FEFF in its subdirectory, in a
+    worker process.
+    """
+    site_dir, feff_input_set, absorbing_atom, structure, other_params, feff_cmd = args
+    fis = get_feff_input_set_obj(feff_input_set, absorbing_atom, structure, **other_params)
+    fis.write_input(site_dir)
+    return subprocess.call(feff_cmd, shell=True, cwd=site_dir)
+
+
+@explicit_serialize
+class RunFeffBatch(FiretaskBase):
+    """
+    Write the inputs and run FEFF for several absorbing sites of a structure,
+    concurrently, each in its own subdirectory (see get_site_dir).
+
+    Required params:
+        absorbing_atoms ([int]): site indices of the absorbing atoms
+        structure (Structure): input structure
+        feff_input_set (str): the input set, as the entire path to the class or the
+            spectrum type, e.g. "pymatgen.io.feff.sets.MPXANESSet" or "XANES"
+        feff_cmd (str): the name of the full executable for running FEFF (supports env_chk)
+
+    Optional params:
+        other_params (dict): **kwargs to pass into the input set, e.g. edge, radius and
+            user_tag_settings
+        n_concurrent (int): number of FEFF runs at a time (supports env_chk). Default:
+            the number of cores.
+    """
+
+    required_params = ["absorbing_atoms", "structure", "feff_input_set", "feff_cmd"]
+    optional_params = ["other_params", "n_concurrent"]
+
+    def run_task(self, fw_spec):
+        feff_cmd = env_chk(self["feff_cmd"], fw_spec)
+        n_concurrent = env_chk(self.get("n_concurrent"), fw_spec) or os.cpu_count()
+        other_params = self.get("other_params", {})
+        absorbing_atoms = self["absorbing_atoms"]
+        run_args = [(get_site_dir(ab_idx), self["feff_input_set"], ab_idx, self["structure"],
+                     other_params, feff_cmd) for ab_idx in absorbing_atoms]
+        logger.info("Running FEFF for {} absorbing sites, {} at a time, using exe: {}".format(
+            len(absorbing_atoms), n_concurrent, feff_cmd))
+        with ProcessPoolExecutor(max_workers=n_concurrent) as executor:
+            return_codes = list(executor.map(_run_feff_site, run_args))
+        failed = [ab_idx for ab_idx, rc in zip(absorbing_atoms, return_codes) if rc != 0]
+        if failed:
+            logger.warning("FEFF failed for the absorbing sites {}".format(failed))
+        logger.info("FEFF finished running for {} absorbing sites".format(len(absorbing_atoms)))
+        return FWAction(stored_data={"failed_sites": failed})
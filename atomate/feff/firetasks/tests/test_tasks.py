@@ -1,16 +1,24 @@
 # coding: utf-8
 
 
+import json
 import os
 import shutil
 import unittest
 from glob import glob
 
+import numpy as np
+
 from pymatgen import Structure
 from pymatgen.io.feff.sets import MPEXAFSSet
 from pymatgen.io.feff.inputs import Paths
 
 from atomate.feff.firetasks.glue_tasks import CopyFeffOutputs
+from fireworks.utilities.filepad import FilePad
+
+from atomate.feff.firetasks.parse_outputs import SiteAveragedSpectrumToDbTask, \
+    AddPathsToFilepadTask, get_paths_from_filepad
+from atomate.feff.firetasks.run_calc import get_site_dir
 from atomate.feff.firetasks.write_inputs import WriteEXAFSPaths
 from atomate.utils.testing import AtomateTest
 
@@ -44,6 +52,47 @@ class TestTasks(AtomateTest):
         with open("paths_ans.dat", "r") as ans, open("paths.dat", "r") as tmp:
             self.assertEqual(ans.readlines(), tmp.readlines())
 
+    def test_add_paths_archive(self):
+        contents = {}
+        for i in [1, 2]:
+            contents["feff000{}.dat".format(i)] = "path {}\n".format(i)
+            with open("feff000{}.dat".format(i), "w") as f:
+                f.write(contents["feff000{}.dat".format(i)])
+        filepad_file = os.path.join(db_dir, "db.json")
+        action = AddPathsToFilepadTask(filepad_file=filepad_file, archive=True).run_task({})
+        identifier = action.stored_data["identifier"]
+        self.assertEqual(identifier, "{}:feff_paths".format(os.path.abspath(os.getcwd())))
+        fpad = FilePad.from_db_file(filepad_file)
+        try:
+            self.assertEqual(get_paths_from_filepad(fpad, identifier), contents)
+        finally:
+            fpad.delete_file(identifier)
+
+    def test_site_averaged_spectrum_task(self):
+        test_files = os.path.join(module_dir, "..", "..", "test_files")
+        xmu = np.loadtxt(os.path.join(test_files, "xmu.dat"))
+        # the second site has its edge 0.5 eV higher, and twice the absorption
+        xmu_shifted = xmu.copy()
+        xmu_shifted[:, :2] += 0.5
+        xmu_shifted[:, 3:] *= 2
+        for ab_idx, data in [(0, xmu), (1, xmu_shifted)]:
+            os.makedirs(get_site_dir(ab_idx))
+            np.savetxt(os.path.join(get_site_dir(ab_idx), "xmu.dat"), data)
+            shutil.copy(os.path.join(test_files, "feff.inp"), get_site_dir(ab_idx))
+
+        t = SiteAveragedSpectrumToDbTask(absorbing_atom="Fe", absorbing_atoms=[0, 1],
+                                         weights=[1, 3], structure=self.struct,
+                                         spectrum_type="XANES", output_file="xmu.dat")
+        t.run_task({})
+        with open("feff_task.json") as f:
+            spectrum = np.array(json.load(f)["spectrum"])
+        # the energy and k axes are those of the first site
+        self.assertTrue(np.allclose(spectrum[:, :3], xmu[:, :3]))
+        for j in range(3, xmu.shape[1]):
+            ref = (xmu[:, j] + 3 * np.interp(xmu[:, 0], xmu_shifted[:, 0],
+                                             xmu_shifted[:, j])) / 4
+            self.assertTrue(np.allclose(spectrum[:, j], ref))
+
 
 if __name__ == "__main__":
     unittest.main()
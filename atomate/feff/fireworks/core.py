@@ -11,8 +11,9 @@ from fireworks import Firework
 from atomate.common.firetasks.glue_tasks import PassCalcLocs
 from atomate.feff.firetasks.glue_tasks import CopyFeffOutputs
 from atomate.feff.firetasks.write_inputs import WriteFeffFromIOSet, WriteEXAFSPaths, get_feff_input_set_obj
-from atomate.feff.firetasks.run_calc import RunFeffDirect
-from atomate.feff.firetasks.parse_outputs import SpectrumToDbTask, AddPathsToFilepadTask
+from atomate.feff.firetasks.run_calc import RunFeffDirect, RunFeffBatch
+from atomate.feff.firetasks.parse_outputs import SpectrumToDbTask, AddPathsToFilepadTask, \
+    SiteAveragedSpectrumToDbTask
 
 __author__ = 'Kiran Mathew'
 __email__ = 'kmathew@lbl.gov'
@@ -21,7 +22,7 @@ __email__ = 'kmathew@lbl.gov'
 class XASFW(Firework):
     def __init__(self, absorbing_atom, structure, feff_input_set="XANES", edge="K", radius=10.0,
                  name="XAS spectroscopy", feff_cmd="feff", override_default_feff_params=None,
-                 db_file=None, parents=None, metadata=None, **kwargs):
+                 db_file=None, parents=None, metadata=None, binary_arrays=False, **kwargs):
         """
         Write the input set for FEFF-XAS spectroscopy, run FEFF and insert the absorption
         coefficient to the database (or dump to a json file if db_file=None).
@@ -40,6 +41,7 @@ class XASFW(Firework):
             db_file (str): path to the db file.
             parents (Firework): Parents of this particular Firework. FW or list of FWS.
             metadata (dict): meta data
+            binary_arrays (bool): store the spectrum in the database as compact binary arrays.
             **kwargs: Other kwargs that are passed to Firework.__init__.
         """
         override_default_feff_params = override_default_feff_params or {}
@@ -54,18 +56,76 @@ class XASFW(Firework):
              PassCalcLocs(name=name),
              SpectrumToDbTask(absorbing_atom=absorbing_atom, structure=structure,
                               db_file=db_file, spectrum_type=spectrum_type, edge=edge,
-                              output_file="xmu.dat", metadata=metadata)]
+                              output_file="xmu.dat", metadata=metadata,
+                              binary_arrays=binary_arrays)]
 
         super(XASFW, self).__init__(t, parents=parents, name="{}-{}".
                                     format(structure.composition.reduced_formula, name), **kwargs)
 
 
+class XASBatchFW(Firework):
+    def __init__(self, absorbing_atoms, structure, feff_input_set="XANES", edge="K", radius=10.0,
+                 name="XAS spectroscopy", feff_cmd="feff", override_default_feff_params=None,
+                 weights=None, n_concurrent=None, site_spectra=False, db_file=None, parents=None,
+                 metadata=None, binary_arrays=False, **kwargs):
+        """
+        Write the inputs for FEFF-XAS spectroscopy and run FEFF for many absorbing sites of a
+        structure at once, concurrently, and insert the site-averaged absorption coefficient to
+        the database (or dump to a json file if db_file=None).
+
+        Args:
+            absorbing_atoms ([int]): site indices of the absorbing atoms
+            structure (Structure): input structure
+            feff_input_set (str): The inputset for setting params. Either the entire path to
+                the class or spectrum type must be provided
+                e.g. "pymatgen.io.feff.sets.MPXANESSet" or "XANES"
+            edge (str): absorption edge
+            radius (float): cluster radius in angstroms
+            name (str)
+            feff_cmd (str): path to the feff binary
+            override_default_feff_params (dict): override feff tag settings.
+            weights ([float]): weights of the sites in the average, e.g. their multiplicities.
+            n_concurrent (int): number of FEFF runs at a time. Default: the number of cores.
+            site_spectra (bool): also store the spectra of the individual sites.
+            db_file (str): path to the db file.
+            parents (Firework): Parents of this particular Firework. FW or list of FWS.
+            metadata (dict): meta data
+            binary_arrays (bool): store the spectra in the database as compact binary arrays.
+            **kwargs: Other kwargs that are passed to Firework.__init__.
+        """
+        override_default_feff_params = override_default_feff_params or {}
+        other_params = dict(override_default_feff_params, edge=edge, radius=radius)
+
+        feff_input_set_obj = get_feff_input_set_obj(feff_input_set, absorbing_atoms[0], structure,
+                                                    **other_params)
+        spectrum_type = feff_input_set_obj.__class__.__name__[2:-3]
+        if not isinstance(feff_input_set, str):
+            feff_input_set = "{}.{}".format(feff_input_set.__class__.__module__,
+                                            feff_input_set.__class__.__name__)
+        absorbing_atom = structure[absorbing_atoms[0]].specie.symbol
+
+        t = [RunFeffBatch(absorbing_atoms=absorbing_atoms, structure=structure,
+                          feff_input_set=feff_input_set, feff_cmd=feff_cmd,
+                          other_params=other_params, n_concurrent=n_concurrent),
+             PassCalcLocs(name=name),
+             SiteAveragedSpectrumToDbTask(absorbing_atom=absorbing_atom,
+                                          absorbing_atoms=absorbing_atoms, weights=weights,
+                                          structure=structure, db_file=db_file,
+                                          spectrum_type=spectrum_type, edge=edge,
+                                          output_file="xmu.dat", metadata=metadata,
+                                          site_spectra=site_spectra, binary_arrays=binary_arrays)]
+
+        super(XASBatchFW, self).__init__(t, parents=parents, name="{}-{}".
+                                         format(structure.composition.reduced_formula, name),
+                                         **kwargs)
+
+
 class EELSFW(Firework):
     def __init__(self, absorbing_atom, structure, feff_input_set="ELNES", edge="K", radius=10.,
                  name="EELS spectroscopy", beam_energy=100, beam_direction=None, collection_angle=1,
                  convergence_angle=1, user_eels_settings=None, feff_cmd="feff",
                  override_default_feff_params=None, db_file=None, parents=None, metadata=None,
-                 **kwargs):
+                 binary_arrays=False, **kwargs):
         """
         Write the input set for FEFF-EELSS spectroscopy, run feff and insert the core-loss spectrum
         to the database(or dump to a json file if db_file=None).
@@ -89,6 +149,7 @@ class EELSFW(Firework):
             db_file (str): path to the db file.
             parents (Firework): Parents of this particular Firework. FW or list of FWS.
             metadata (dict): meta data
+            binary_arrays (bool): store the spectrum in the database as compact binary arrays.
             **kwargs: Other kwargs that are passed to Firework.__init__.
         """
         override_default_feff_params = override_default_feff_params or {}
@@ -105,17 +166,86 @@ class EELSFW(Firework):
              PassCalcLocs(name=name),
              SpectrumToDbTask(absorbing_atom=absorbing_atom, structure=structure,
                               db_file=db_file, spectrum_type=spectrum_type, edge=edge,
-                              output_file="eels.dat", metadata=metadata)]
+                              output_file="eels.dat", metadata=metadata,
+                              binary_arrays=binary_arrays)]
 
         super(EELSFW, self).__init__(t, parents=parents, name="{}-{}".
                                      format(structure.composition.reduced_formula, name), **kwargs)
 
 
+class EELSBatchFW(Firework):
+    def __init__(self, absorbing_atoms, structure, feff_input_set="ELNES", edge="K", radius=10.,
+                 name="EELS spectroscopy", beam_energy=100, beam_direction=None, collection_angle=1,
+                 convergence_angle=1, user_eels_settings=None, feff_cmd="feff",
+                 override_default_feff_params=None, weights=None, n_concurrent=None,
+                 site_spectra=False, db_file=None, parents=None, metadata=None,
+                 binary_arrays=False, **kwargs):
+        """
+        Write the inputs for FEFF-EELS spectroscopy and run FEFF for many absorbing sites of a
+        structure at once, concurrently, and insert the site-averaged core-loss spectrum to the
+        database (or dump to a json file if db_file=None).
+
+        Args:
+            absorbing_atoms ([int]): site indices of the absorbing atoms
+            structure (Structure): input structure
+            feff_input_set (str): The inputset for setting params. Either the entire path to
+                the class or spectrum type must be provided
+                e.g. "pymatgen.io.feff.sets.MPELNESSet" or "ELNES"
+            edge (str): absorption edge
+            radius (float): cluster radius in angstroms
+            name (str)
+            beam_energy (float): Incident beam energy in keV
+            beam_direction (list): Incident beam direction. If None, the cross section will be averaged.
+            collection_angle (float): Detector collection angle in mrad.
+            convergence_angle (float): Beam convergence angle in mrad.
+            user_eels_settings (dict): override default EELS config. See MPELNESSet.yaml for supported keys.
+            feff_cmd (str): path to the feff binary
+            override_default_feff_params (dict): override feff tag settings.
+            weights ([float]): weights of the sites in the average, e.g. their multiplicities.
+            n_concurrent (int): number of FEFF runs at a time. Default: the number of cores.
+            site_spectra (bool): also store the spectra of the individual sites.
+            db_file (str): path to the db file.
+            parents (Firework): Parents of this particular Firework. FW or list of FWS.
+            metadata (dict): meta data
+            binary_arrays (bool): store the spectra in the database as compact binary arrays.
+            **kwargs: Other kwargs that are passed to Firework.__init__.
+        """
+        override_default_feff_params = override_default_feff_params or {}
+        other_params = dict(override_default_feff_params, edge=edge, radius=radius,
+                            beam_energy=beam_energy, beam_direction=beam_direction,
+                            collection_angle=collection_angle,
+                            convergence_angle=convergence_angle,
+                            user_eels_settings=user_eels_settings)
+
+        feff_input_set_obj = get_feff_input_set_obj(feff_input_set, absorbing_atoms[0], structure,
+                                                    **other_params)
+        spectrum_type = feff_input_set_obj.__class__.__name__[2:-3]
+        if not isinstance(feff_input_set, str):
+            feff_input_set = "{}.{}".format(feff_input_set.__class__.__module__,
+                                            feff_input_set.__class__.__name__)
+        absorbing_atom = structure[absorbing_atoms[0]].specie.symbol
+
+        t = [RunFeffBatch(absorbing_atoms=absorbing_atoms, structure=structure,
+                          feff_input_set=feff_input_set, feff_cmd=feff_cmd,
+                          other_params=other_params, n_concurrent=n_concurrent),
+             PassCalcLocs(name=name),
+             SiteAveragedSpectrumToDbTask(absorbing_atom=absorbing_atom,
+                                          absorbing_atoms=absorbing_atoms, weights=weights,
+                                          structure=structure, db_file=db_file,
+                                          spectrum_type=spectrum_type, edge=edge,
+                                          output_file="eels.dat", metadata=metadata,
+                                          site_spectra=site_spectra, binary_arrays=binary_arrays)]
+
+        super(EELSBatchFW, self).__init__(t, parents=parents, name="{}-{}".
+                                          format(structure.composition.reduced_formula, name),
+                                          **kwargs)
+
+
 class EXAFSPathsFW(Firework):
     def __init__(self, absorbing_atom, structure, paths, degeneracies=None, edge="K", radius=10.0,
                  name="EXAFS Paths", feff_input_set="pymatgen.io.feff.sets.MPEXAFSSet", feff_cmd="feff",
                  override_default_feff_params=None, parents=None, filepad_file=None, labels=None,
-                 metadata=None, **kwargs):
+                 metadata=None, archive=False, identifier=None, **kwargs):
         """
         Write the input set for FEFF-EXAFS spectroscopy with customized scattering paths, run feff,
         and insert the scattering amplitude output files(feffNNNN.dat files) to filepad.
@@ -135,6 +265,10 @@ class EXAFSPathsFW(Firework):
             filepad_file (str): path to the filepad config file.
             labels (list): list of label used to tag the files inserted into filepad.
             metadata (dict): meta data
+            archive (bool): insert the path files as a single archive, see
+                AddPathsToFilepadTask.
+            identifier (str): identifier of the archive. Default is
+                "<dir_name>:feff_paths".
             **kwargs: Other kwargs that are passed to Firework.__init__.
         """
         override_default_feff_params = override_default_feff_params or {}
@@ -149,7 +283,8 @@ class EXAFSPathsFW(Firework):
                                 feff_input_set=feff_input_set),
              WriteEXAFSPaths(feff_input_set=feff_input_set, paths=paths, degeneracies=degeneracies),
              RunFeffDirect(feff_cmd=feff_cmd),
-             AddPathsToFilepadTask(filepad_file=filepad_file, labels=labels, metadata=metadata)]
+             AddPathsToFilepadTask(filepad_file=filepad_file, labels=labels, metadata=metadata,
+                                   archive=archive, identifier=identifier)]
 
         super(EXAFSPathsFW, self).__init__(t, parents=parents, name="{}-{}".format(
             structure.composition.reduced_formula, name), **kwargs)
@@ -35,6 +35,11 @@ class TestFireworks(AtomateTest):
                '{{atomate.feff.firetasks.parse_outputs.AddPathsToFilepadTask}}']
         self.assertEqual(ans, [ft["_fw_name"] for ft in fw_dict["spec"]["_tasks"]])
 
+        fw = EXAFSPathsFW(0, self.struct, [[249, 0], [85, 0]], archive=True,
+                          identifier="feo_paths")
+        self.assertTrue(fw.tasks[-1]["archive"])
+        self.assertEqual(fw.tasks[-1]["identifier"], "feo_paths")
+
 
 if __name__ == "__main__":
     unittest.main()
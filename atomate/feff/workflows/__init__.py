@@ -1,3 +1,5 @@
 
-from .core import *
-from .presets import *
+from atomate.utils.lazy_import import lazy_star_imports
+
+# the workflows are imported on first use
+__getattr__, __dir__ = lazy_star_imports(__name__, ["core", "presets"])
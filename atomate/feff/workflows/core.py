@@ -12,7 +12,7 @@ from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
 from fireworks import Workflow
 
 from atomate.utils.utils import get_logger
-from atomate.feff.fireworks.core import XASFW, EXAFSPathsFW, EELSFW
+from atomate.feff.fireworks.core import XASFW, XASBatchFW, EXAFSPathsFW, EELSFW, EELSBatchFW
 from atomate.feff.firetasks.write_inputs import get_feff_input_set_obj
 
 __author__ = 'Kiran Mathew'
@@ -23,7 +23,8 @@ logger = get_logger(__name__)
 
 def get_wf_xas(absorbing_atom, structure, feff_input_set="pymatgen.io.feff.sets.MPXANESSet",
                edge="K", radius=10.0, feff_cmd="feff", db_file=None, metadata=None,
-               user_tag_settings=None, use_primitive=False):
+               user_tag_settings=None, use_primitive=False, batch=False, n_concurrent=None,
+               binary_arrays=False):
     """
     Returns FEFF XANES/EXAFS spectroscopy workflow.
 
@@ -44,6 +45,13 @@ def get_wf_xas(absorbing_atom, structure, feff_input_set="pymatgen.io.feff.sets.
         use_primitive (bool): convert the structure to primitive form. This helps to
             reduce the number of fireworks in the workflow if the absorbing atom is
             specified by its atomic symbol.
+        batch (bool): run FEFF for all the absorbing sites in a single firework, concurrently,
+            and insert one site-averaged spectrum (weighted by the multiplicities of the sites)
+            rather than one spectrum per site. Suited to many sites, e.g. in large disordered
+            supercells.
+        n_concurrent (int): number of concurrent FEFF runs in batch mode. Default: the number
+            of cores.
+        binary_arrays (bool): store the spectra in the database as compact binary arrays.
 
     Returns:
         Workflow
@@ -51,23 +59,38 @@ def get_wf_xas(absorbing_atom, structure, feff_input_set="pymatgen.io.feff.sets.
     if use_primitive:
         structure = structure.get_primitive_structure()
 
-    # get the absorbing atom site index/indices
-    ab_atom_indices = get_absorbing_atom_indices(structure, absorbing_atom)
+    # get the absorbing atom site index/indices and their multiplicities, from a single
+    # symmetry analysis
+    multiplicities = get_site_multiplicities(structure) if isinstance(absorbing_atom, str) else {}
+    ab_atom_indices = get_absorbing_atom_indices(structure, absorbing_atom,
+                                                 multiplicities=multiplicities)
 
     override_default_feff_params = {"user_tag_settings": user_tag_settings}
 
     spectrum_type = get_feff_input_set_obj(feff_input_set, ab_atom_indices[0], structure).__class__.__name__[2:-3]
 
-    # add firework for each absorbing atom site index
     fws = []
-    for ab_idx in ab_atom_indices:
+    if batch:
+        # a single firework for all the sites, with a site-averaged spectrum
         fw_metadata = dict(metadata) if metadata else {}
-        fw_metadata["absorbing_atom_index"] = ab_idx
-        fw_name = "{}-{}-{}".format(spectrum_type, edge, ab_idx)
-        fws.append(XASFW(ab_idx, structure, edge=edge, radius=radius,
-                         feff_input_set=feff_input_set, feff_cmd=feff_cmd, db_file=db_file,
-                         metadata=fw_metadata, name=fw_name,
-                         override_default_feff_params=override_default_feff_params))
+        fw_metadata["absorbing_atom_indices"] = list(ab_atom_indices)
+        fw_name = "{}-{}-site averaged".format(spectrum_type, edge)
+        weights = [multiplicities.get(ab_idx, 1) for ab_idx in ab_atom_indices]
+        fws.append(XASBatchFW(ab_atom_indices, structure, edge=edge, radius=radius,
+                              feff_input_set=feff_input_set, feff_cmd=feff_cmd, db_file=db_file,
+                              metadata=fw_metadata, name=fw_name, weights=weights,
+                              n_concurrent=n_concurrent, binary_arrays=binary_arrays,
+                              override_default_feff_params=override_default_feff_params))
+    else:
+        # add firework for each absorbing atom site index
+        for ab_idx in ab_atom_indices:
+            fw_metadata = dict(metadata) if metadata else {}
+            fw_metadata["absorbing_atom_index"] = ab_idx
+            fw_name = "{}-{}-{}".format(spectrum_type, edge, ab_idx)
+            fws.append(XASFW(ab_idx, structure, edge=edge, radius=radius,
+                             feff_input_set=feff_input_set, feff_cmd=feff_cmd, db_file=db_file,
+                             metadata=fw_metadata, name=fw_name, binary_arrays=binary_arrays,
+                             override_default_feff_params=override_default_feff_params))
 
     wf_metadata = dict(metadata) if metadata else {}
     wf_metadata["absorbing_atom_indices"] = list(ab_atom_indices)
@@ -80,7 +103,8 @@ def get_wf_xas(absorbing_atom, structure, feff_input_set="pymatgen.io.feff.sets.
 def get_wf_exafs_paths(absorbing_atom, structure, paths, degeneracies=None, edge="K", radius=10.0,
                        feff_input_set="pymatgen.io.feff.sets.MPEXAFSSet", feff_cmd="feff",
                        db_file=None, metadata=None, user_tag_settings=None, use_primitive=False,
-                       labels=None, filepad_file=None):
+                       labels=None, filepad_file=None, archive=False, identifier=None,
+                       binary_arrays=False):
     """
     Returns FEFF EXAFS spectroscopy workflow that generates the scattering amplitudes for the given
     list of scattering paths. The scattering amplitude output files(feffNNNN.dat files) are
@@ -108,16 +132,22 @@ def get_wf_exafs_paths(absorbing_atom, structure, paths, degeneracies=None, edge
         labels ([str]): list of labels for the scattering amplitudes file contents inserted into
             filepad. Useful for fetching the data from filepad later.
         filepad_file (str): path to filepad connection settings file.
+        archive (bool): insert the scattering amplitude files into filepad as a single archive.
+            Use get_paths_from_filepad to read them back.
+        identifier (str): identifier of the archive. Default is "<dir_name>:feff_paths".
+        binary_arrays (bool): store the spectra in the database as compact binary arrays.
 
     Returns:
         Workflow
     """
     labels = labels or []
     wflow = get_wf_xas(absorbing_atom, structure, feff_input_set, edge, radius, feff_cmd,
-                       db_file, metadata, user_tag_settings, use_primitive)
+                       db_file, metadata, user_tag_settings, use_primitive,
+                       binary_arrays=binary_arrays)
     paths_fw = EXAFSPathsFW(absorbing_atom, structure, paths, degeneracies=degeneracies, edge=edge,
                             radius=radius, name="EXAFS Paths", feff_input_set=feff_input_set,
-                            feff_cmd=feff_cmd, labels=labels, filepad_file=filepad_file)
+                            feff_cmd=feff_cmd, labels=labels, filepad_file=filepad_file,
+                            archive=archive, identifier=identifier)
     # append the scattering paths firework to the regular EXAFS workflow.
     paths_wf = Workflow.from_Firework(paths_fw)
     wflow.append_wf(paths_wf, wflow.leaf_fw_ids)
@@ -127,7 +157,8 @@ def get_wf_exafs_paths(absorbing_atom, structure, paths, degeneracies=None, edge
 def get_wf_eels(absorbing_atom, structure=None, feff_input_set="pymatgen.io.feff.sets.MPELNESSet",
                 edge="K", radius=10., beam_energy=100, beam_direction=None, collection_angle=1,
                 convergence_angle=1, user_eels_settings=None, user_tag_settings=None, feff_cmd="feff",
-                db_file=None, metadata=None, use_primitive=False):
+                db_file=None, metadata=None, use_primitive=False, batch=False, n_concurrent=None,
+                binary_arrays=False):
     """
     Returns FEFF ELNES/EXELFS spectroscopy workflow.
 
@@ -153,6 +184,12 @@ def get_wf_eels(absorbing_atom, structure=None, feff_input_set="pymatgen.io.feff
         use_primitive (bool): convert the structure to primitive form. This helps to
             reduce the number of fireworks in the workflow if the absorbing atoms is
             specified by its atomic symbol.
+        batch (bool): run FEFF for all the absorbing sites in a single firework, concurrently,
+            and insert one site-averaged spectrum (weighted by the multiplicities of the sites)
+            rather than one spectrum per site. See get_wf_xas.
+        n_concurrent (int): number of concurrent FEFF runs in batch mode. Default: the number
+            of cores.
+        binary_arrays (bool): store the spectra in the database as compact binary arrays.
 
     Returns:
         Workflow
@@ -160,25 +197,46 @@ def get_wf_eels(absorbing_atom, structure=None, feff_input_set="pymatgen.io.feff
     if use_primitive:
         structure = structure.get_primitive_structure()
 
-    # get the absorbing atom site index/indices
-    ab_atom_indices = get_absorbing_atom_indices(structure, absorbing_atom)
+    # get the absorbing atom site index/indices and their multiplicities, from a single
+    # symmetry analysis
+    multiplicities = get_site_multiplicities(structure) if isinstance(absorbing_atom, str) else {}
+    ab_atom_indices = get_absorbing_atom_indices(structure, absorbing_atom,
+                                                 multiplicities=multiplicities)
 
     override_default_feff_params = {"user_tag_settings": user_tag_settings}
 
     spectrum_type = get_feff_input_set_obj(feff_input_set, ab_atom_indices[0], structure).__class__.__name__[2:-3]
 
-    # add firework for each absorbing atom site index
     fws = []
-    for ab_idx in ab_atom_indices:
+    if batch:
+        # a single firework for all the sites, with a site-averaged spectrum
         fw_metadata = dict(metadata) if metadata else {}
-        fw_metadata["absorbing_atom_index"] = ab_idx
-        fw_name = "{}-{}-{}".format(spectrum_type, edge, ab_idx)
-        fws.append(EELSFW(ab_idx, structure, feff_input_set=feff_input_set, edge=edge, radius=radius,
-                          beam_energy=beam_energy, beam_direction=beam_direction,
-                          collection_angle=collection_angle, convergence_angle=convergence_angle,
-                          user_eels_settings=user_eels_settings, feff_cmd=feff_cmd, db_file=db_file,
-                          metadata=fw_metadata, name=fw_name,
-                          override_default_feff_params=override_default_feff_params))
+        fw_metadata["absorbing_atom_indices"] = list(ab_atom_indices)
+        fw_name = "{}-{}-site averaged".format(spectrum_type, edge)
+        weights = [multiplicities.get(ab_idx, 1) for ab_idx in ab_atom_indices]
+        fws.append(EELSBatchFW(ab_atom_indices, structure, feff_input_set=feff_input_set,
+                               edge=edge, radius=radius, beam_energy=beam_energy,
+                               beam_direction=beam_direction, collection_angle=collection_angle,
+                               convergence_angle=convergence_angle,
+                               user_eels_settings=user_eels_settings, feff_cmd=feff_cmd,
+                               db_file=db_file, metadata=fw_metadata, name=fw_name,
+                               weights=weights, n_concurrent=n_concurrent,
+                               binary_arrays=binary_arrays,
+                               override_default_feff_params=override_default_feff_params))
+    else:
+        # add firework for each absorbing atom site index
+        for ab_idx in ab_atom_indices:
+            fw_metadata = dict(metadata) if metadata else {}
+            fw_metadata["absorbing_atom_index"] = ab_idx
+            fw_name = "{}-{}-{}".format(spectrum_type, edge, ab_idx)
+            fws.append(EELSFW(ab_idx, structure, feff_input_set=feff_input_set, edge=edge,
+                              radius=radius, beam_energy=beam_energy,
+                              beam_direction=beam_direction, collection_angle=collection_angle,
+                              convergence_angle=convergence_angle,
+                              user_eels_settings=user_eels_settings, feff_cmd=feff_cmd,
+                              db_file=db_file, metadata=fw_metadata, name=fw_name,
+                              binary_arrays=binary_arrays,
+                              override_default_feff_params=override_default_feff_params))
 
     wfname = "{}:{}:{} edge".format(structure.composition.reduced_formula,
                                     "{} spectroscopy".format(spectrum_type), edge)
@@ -188,11 +246,13 @@ def get_wf_eels(absorbing_atom, structure=None, feff_input_set="pymatgen.io.feff
     return Workflow(fws, name=wfname, metadata=wf_metadata)
 
 
-def get_absorbing_atom_indices(structure, absorbing_atom):
+def get_absorbing_atom_indices(structure, absorbing_atom, multiplicities=None):
     """
     Args:
         structure (Structure):
         absorbing_atom (int/str):
+        multiplicities (dict): the multiplicities of the symmetrically distinct sites, see
+            get_site_multiplicities. Computed if not given.
 
     Returns:
         list of site ids
@@ -202,16 +262,31 @@ def get_absorbing_atom_indices(structure, absorbing_atom):
         ab_atom_indices = [absorbing_atom]
     # site symbol
     else:
+        multiplicities = multiplicities or get_site_multiplicities(structure)
         all_indices = set(structure.indices_from_symbol(absorbing_atom))
-        uniq_indices = set(get_unique_site_indices(structure))
-        ab_atom_indices = list(all_indices.intersection(uniq_indices))
+        ab_atom_indices = sorted(all_indices.intersection(multiplicities))
     return ab_atom_indices
 
 
-def get_unique_site_indices(structure):
+def get_site_multiplicities(structure):
+    """
+    Multiplicities of the symmetrically distinct sites of a structure.
+
+    Args:
+        structure (Structure):
+
+    Returns:
+        (dict) index of the first site of each set of equivalent sites -> number of
+            equivalent sites
+    """
     sa = SpacegroupAnalyzer(structure)
     symm_data = sa.get_symmetry_dataset()
     # equivalency mapping for the structure
     # i'th site in the struct equivalent to eq_struct[i]'th site
     eq_atoms = symm_data["equivalent_atoms"]
-    return np.unique(eq_atoms).tolist()
+    uniq, counts = np.unique(eq_atoms, return_counts=True)
+    return dict(zip(uniq.tolist(), counts.tolist()))
+
+
+def get_unique_site_indices(structure):
+    return sorted(get_site_multiplicities(structure))
@@ -4,6 +4,8 @@
 import os
 import unittest
 
+import numpy as np
+
 from pymatgen import Structure
 from pymatgen.io.feff.inputs import Tags
 
@@ -63,6 +65,29 @@ class TestEELSWorkflow(AtomateTest):
         self.assertEqual(len(wf_prim.as_dict()["fws"]), 1)
         self.assertEqual(len(wf.as_dict()["fws"]), 1)
 
+    def test_eels_batch_wflow(self):
+        xmu_file_path = os.path.abspath(os.path.join(module_dir, "../../test_files/xmu.dat"))
+        feff_bin = "cp {} eels.dat".format(xmu_file_path)
+
+        wf = get_wf_eels("O", self.structure, feff_input_set="ELNES", edge="L1",
+                         user_tag_settings=self.user_tag_settings, use_primitive=False,
+                         feff_cmd=feff_bin, db_file=">>db_file<<", batch=True, n_concurrent=2)
+        wf_dict = wf.as_dict()
+        self.assertEqual(len(wf_dict["fws"]), 1)
+        tasks = wf_dict["fws"][0]["spec"]["_tasks"]
+        self.assertEqual(tasks[0]["absorbing_atoms"], wf_dict["metadata"]["absorbing_atom_indices"])
+        self.assertEqual(tasks[0]["other_params"]["beam_energy"], 100)
+        self.assertEqual(tasks[-1]["output_file"], "eels.dat")
+        self.assertEqual(sum(tasks[-1]["weights"]), len(self.structure.indices_from_symbol("O")))
+
+        self.lp.add_wf(wf)
+        rapidfire(self.lp, fworker=FWorker(env={"db_file": os.path.join(db_dir, "db.json")}))
+
+        d = self.get_task_collection().find_one({"spectrum_type": "ELNES"})
+        self.assertTrue(d["site_averaged"])
+        self.assertEqual(d["absorbing_atom"], "O")
+        self.assertTrue(np.allclose(d["spectrum"], np.loadtxt(xmu_file_path)))
+
     def test_elnes_vs_exelfs(self):
         wf_elnes = get_wf_eels(self.absorbing_atom, self.structure, feff_input_set="ELNES",
                         edge="L1", user_tag_settings=self.user_tag_settings, use_primitive=True)
@@ -71,6 +71,29 @@ class TestXASWorkflow(AtomateTest):
         self.assertEqual(len(wf_prim.as_dict()["fws"]), 1)
         self.assertEqual(len(wf.as_dict()["fws"]), 1)
 
+    def test_xas_batch_wflow(self):
+        xmu_file_path = os.path.abspath(os.path.join(module_dir, "../../test_files/xmu.dat"))
+        feff_bin = "cp {} .".format(xmu_file_path)
+
+        wf = get_wf_xas("O", self.structure, feff_input_set="XANES", edge="K",
+                        feff_cmd=feff_bin, db_file=">>db_file<<", use_primitive=False,
+                        user_tag_settings=self.user_tag_settings, batch=True, n_concurrent=2)
+        wf_dict = wf.as_dict()
+        self.assertEqual(len(wf_dict["fws"]), 1)
+        tasks = wf_dict["fws"][0]["spec"]["_tasks"]
+        self.assertEqual(tasks[0]["absorbing_atoms"], wf_dict["metadata"]["absorbing_atom_indices"])
+        self.assertEqual(sum(tasks[-1]["weights"]), len(self.structure.indices_from_symbol("O")))
+
+        self.lp.add_wf(wf)
+        rapidfire(self.lp, fworker=FWorker(env={"db_file": os.path.join(db_dir, "db.json")}))
+
+        d = self.get_task_collection().find_one({"spectrum_type": "XANES"})
+        self.assertTrue(d["site_averaged"])
+        self.assertEqual(d["absorbing_atom"], "O")
+        self.assertEqual(d["absorbing_atom_indices"], tasks[0]["absorbing_atoms"])
+        xmu = np.loadtxt(xmu_file_path)
+        self.assertTrue(np.allclose(d["spectrum"], xmu))
+
     def test_xanes_vs_exafs(self):
         wf_xanes = get_wf_xas(self.absorbing_atom, self.structure, feff_input_set="XANES", edge="K",
                               user_tag_settings=self.user_tag_settings)
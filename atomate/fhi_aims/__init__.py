@@ -1,4 +1,6 @@
 __author__ = 'janK'
 
-from atomate.fhi_aims.firetasks import *
-from atomate.fhi_aims.fireworks import *
\ No newline at end of file
+from atomate.utils.lazy_import import lazy_star_imports
+
+# the firetasks and fireworks are imported on first use
+__getattr__, __dir__ = lazy_star_imports(__name__, ["firetasks", "fireworks"])
@@ -7,6 +7,7 @@ This module defines the database classes.
 
 import pymongo
 
+from atomate.lammps.trajectory import read_dump_frames
 from atomate.utils.database import CalcDb
 from atomate.utils.utils import get_logger
 
@@ -31,6 +32,23 @@ class LammpsCalcDb(CalcDb):
         for i in indexes:
             self.collection.create_index(i, background=background)
 
+    def get_dump_frames(self, task_id, dump_filename, start=0, stop=None):
+        """
+        Read a range of frames of a dump trajectory of a task.
+
+        Args:
+            task_id (int): task id
+            dump_filename (str): name of the dump file
+            start (int): index of the first frame
+            stop (int): index after the last frame. Defaults to the last frame.
+
+        Yields:
+            (dict) frames, see atomate.lammps.trajectory.read_dump_frames
+        """
+        doc = self.collection.find_one({"task_id": task_id}, {"output.dumps": 1})
+        dump_doc = doc["output"]["dumps"][dump_filename]
+        return read_dump_frames(dump_doc, start=start, stop=stop, db=self.db)
+
     def reset(self):
         self.collection.delete_many({})
         self.db.counter.delete_one({"_id": "taskid"})
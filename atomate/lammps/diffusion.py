@@ -0,0 +1,404 @@
+# coding: utf-8
+
+
+"""
+This module defines a streaming mean square displacement (MSD) and diffusivity
+analysis of LAMMPS trajectories.
+
+pymatgen's DiffusionAnalyzer needs the displacements of all the atoms at all
+the time steps in memory, which is infeasible for long trajectories of large
+systems. StreamingDiffusionAnalyzer consumes the frames one at a time (e.g.
+from the chunked dump storage of atomate.lammps.trajectory), keeps the
+positions of the diffusing atoms at a bounded number of time origins, and
+accumulates the squared displacements for each lag. The diffusivity fit and
+the summary dict are the same as DiffusionAnalyzer's. With smoothed="max",
+the time origins are spaced so that their positions fit in a memory budget:
+when the budget allows one origin per frame, the MSD is identical to
+DiffusionAnalyzer's; otherwise it is averaged over fewer origins, hence
+noisier, but not biased.
+"""
+
+import numpy as np
+from scipy import constants as const
+
+from atomate.lammps.trajectory import read_dump_frames
+
+# columns of the positions -> (scaled, unwrapped)
+POSITION_KINDS = {"x": (False, False), "xu": (False, True), "xs": (True, False),
+                  "xsu": (True, True)}
+
+# default memory budget in bytes of the positions stored at the time origins
+MAX_ORIGIN_MEMORY = 256 * 1024 ** 2
+
+
+def get_lattice(box):
+    """
+    Lattice matrix (rows are the lattice vectors) of a LAMMPS box.
+
+    Args:
+        box (list): the 3x2 (orthogonal) or 3x3 (triclinic, with the tilt
+            factors xy, xz, yz) box bounds of a dump frame
+
+    Returns:
+        (3, 3) array
+    """
+    box = np.array(box, dtype=float)
+    if box.shape[1] == 2:
+        return np.diag(box[:, 1] - box[:, 0])
+    xy, xz, yz = box[:, 2]
+    xlo = box[0, 0] - min(0.0, xy, xz, xy + xz)
+    xhi = box[0, 1] - max(0.0, xy, xz, xy + xz)
+    ylo = box[1, 0] - min(0.0, yz)
+    yhi = box[1, 1] - max(0.0, yz)
+    return np.array([[xhi - xlo, 0, 0], [xy, yhi - ylo, 0], [xz, yz, box[2, 1] - box[2, 0]]])
+
+
+def get_conversion_factor(n_ions, volume, charge, temperature):
+    """
+    Conversion factor from diffusivity (cm^2/s) to conductivity (mS/cm),
+    as in pymatgen.analysis.diffusion_analyzer.get_conversion_factor.
+
+    Args:
+        n_ions (int): number of diffusing ions
+        volume (float): volume in A^3
+        charge (float): charge of the diffusing ions
+        temperature (float): temperature in K
+    """
+    vol = volume * 1e-24  # units cm^3
+    return 1000 * n_ions / (vol * const.N_A) * charge ** 2 * (const.N_A * const.e) ** 2 \
+        / (const.R * temperature)
+
+
+class StreamingDiffusionAnalyzer:
+    """
+    Incremental MSD and diffusivity of a species from the frames of a
+    trajectory, with multiple time origins.
+    """
+
+    def __init__(self, specie_types, temperature, time_step, step_skip, n_frames,
+                 smoothed="max", min_obs=30, avg_nsteps=1000, origin_interval=None,
+                 max_origin_memory=MAX_ORIGIN_MEMORY, charge=1, specie=None,
+                 position_kind="x"):
+        """
+        Args:
+            specie_types ([int]): LAMMPS atom types of the diffusing species.
+                The other atoms are the framework, used for drift correction.
+            temperature (float): temperature in K
+            time_step (float): time step in fs
+            step_skip (int): number of time steps between frames
+            n_frames (int): number of frames of the trajectory
+            smoothed (str): as in DiffusionAnalyzer: "max" uses all the time
+                origins (every origin_interval frames) for the lags up to the
+                limit given by min_obs, "constant" the first avg_nsteps frames
+                as origins, and None/False only the first frame.
+            min_obs (int): see DiffusionAnalyzer, for smoothed="max"
+            avg_nsteps (int): see DiffusionAnalyzer, for smoothed="constant"
+            origin_interval (int): number of frames between time origins, for
+                smoothed="max". The memory used is proportional to the number
+                of origins within the maximum lag. Defaults to the smallest
+                interval within max_origin_memory.
+            max_origin_memory (float): memory budget in bytes of the positions
+                stored at the time origins, used if origin_interval is None.
+                A smaller budget means fewer origins per lag, i.e. a noisier
+                MSD. smoothed="constant" always stores avg_nsteps origins and
+                smoothed=None a single one.
+            charge (float): charge of the diffusing ions, for the conductivity
+            specie (str): name of the diffusing species in the summary.
+                Defaults to the types.
+            position_kind (str): the position columns of the frames: "x"
+                (wrapped, with image flags if any), "xu" (unwrapped), "xs"
+                or "xsu" (scaled)
+        """
+        self.specie_types = [int(t) for t in specie_types]
+        self.temperature = temperature
+        self.time_step = time_step
+        self.step_skip = step_skip
+        self.n_frames = n_frames
+        self.smoothed = smoothed
+        self.min_obs = min_obs
+        self.avg_nsteps = avg_nsteps
+        self.origin_interval = origin_interval if smoothed == "max" else 1
+        self.max_origin_memory = max_origin_memory
+        self.charge = charge
+        self.specie = specie or " ".join(str(t) for t in self.specie_types)
+        self.scaled, self.unwrapped = POSITION_KINDS[position_kind]
+
+        self.n_processed = 0
+        self._indices = None
+
+    def _init_first_frame(self, frame, positions):
+        mask = np.isin(frame["types"].ravel(), self.specie_types)
+        self._indices = np.where(mask)[0]
+        self._framework = np.where(~mask)[0]
+        n_ions = len(self._indices)
+        if n_ions == 0:
+            raise ValueError("No atom of types {} in the trajectory".format(self.specie_types))
+
+        if not self.smoothed:
+            self.max_lag = self.n_frames - 1
+            self._is_origin = lambda i: i == 0
+        elif self.smoothed == "constant":
+            if self.n_frames <= self.avg_nsteps:
+                raise ValueError("Not enough data to calculate diffusivity")
+            self.max_lag = self.n_frames - self.avg_nsteps - 1
+            self._is_origin = lambda i: i < self.avg_nsteps
+        else:
+            self.max_lag = min(n_ions * self.n_frames // self.min_obs, self.n_frames) - 1
+            if self.origin_interval is None:
+                # at most max_slots origins within the maximum lag (+ 2 at the ends)
+                max_slots = max(int(self.max_origin_memory // (n_ions * 3 * 8)), 3)
+                self.origin_interval = max(
+                    1, int(np.ceil(self.max_lag / float(max_slots - 2))))
+            self._is_origin = lambda i: i % self.origin_interval == 0
+
+        if not self.smoothed:
+            n_slots = 1
+        elif self.smoothed == "constant":
+            n_slots = self.avg_nsteps
+        else:
+            n_slots = min(self.max_lag // self.origin_interval + 2, self.n_frames)
+
+        # ring buffer of the drift corrected positions at the time origins
+        self._origin_pos = np.zeros((n_slots, n_ions, 3))
+        self._origin_frame = np.full(n_slots, -1, dtype=int)
+        self._next_slot = 0
+
+        n_lags = self.max_lag + 1
+        self.sum_sq = np.zeros(n_lags)
+        self.sum_components = np.zeros((n_lags, 3))
+        self.sum_chg = np.zeros(n_lags)
+        self.counts = np.zeros(n_lags, dtype=int)
+
+        self._pos0 = positions.copy()
+        self._prev = positions.copy()
+        self._unwrap_shift = np.zeros_like(positions)
+        self.max_framework_displacement = 0.0
+        self.volume = abs(np.linalg.det(get_lattice(frame["box"])))
+        self.n_ions = n_ions
+
+    def _get_positions(self, frame):
+        lattice = get_lattice(frame["box"])
+        pos = frame["positions"]
+        if self.scaled:
+            pos = pos.dot(lattice)
+        if not self.unwrapped and frame.get("images") is not None:
+            pos = pos + frame["images"].dot(lattice)
+        elif not self.unwrapped:
+            # no image flags: unwrap with the minimum image convention
+            if self._indices is not None:
+                frac = np.linalg.solve(lattice.T, (pos + self._unwrap_shift - self._prev).T).T
+                self._unwrap_shift -= np.round(frac).dot(lattice)
+                pos = pos + self._unwrap_shift
+        return pos
+
+    def update(self, frame):
+        """
+        Process the next frame.
+
+        Args:
+            frame (dict): frame with the "types", "positions", "box" and
+                optionally "images" arrays, with the atoms in the same order
+                in all the frames, as given by read_dump_frames
+        """
+        positions = self._get_positions(frame)
+        if self._indices is None:
+            self._init_first_frame(frame, positions)
+        self._prev = positions
+        i = self.n_processed
+
+        # drift correction: remove the mean displacement of the framework
+        disp = positions - self._pos0
+        drift = disp[self._framework].mean(axis=0) if len(self._framework) else np.zeros(3)
+        if len(self._framework):
+            fw_disp = np.linalg.norm(disp[self._framework] - drift, axis=1).max()
+            self.max_framework_displacement = max(self.max_framework_displacement, fw_disp)
+        dc = positions[self._indices] - drift
+
+        if self._is_origin(i):
+            slot = self._next_slot % len(self._origin_frame)
+            self._origin_pos[slot] = dc
+            self._origin_frame[slot] = i
+            self._next_slot += 1
+
+        lags = i - self._origin_frame
+        active = np.where((self._origin_frame >= 0) & (lags <= self.max_lag))[0]
+        if len(active):
+            dx = dc[None, :, :] - self._origin_pos[active]
+            np.add.at(self.sum_sq, lags[active], np.sum(dx ** 2, axis=(1, 2)))
+            np.add.at(self.sum_components, lags[active], np.sum(dx ** 2, axis=1))
+            np.add.at(self.sum_chg, lags[active], np.sum(np.sum(dx, axis=1) ** 2, axis=1))
+            np.add.at(self.counts, lags[active], 1)
+        self.n_processed += 1
+
+    def get_msd(self):
+        """
+        Returns:
+            (lags, msd, msd_components, mscd) for the lags with data, in frames
+        """
+        lags = np.where(self.counts > 0)[0]
+        counts = self.counts[lags]
+        msd = self.sum_sq[lags] / counts / self.n_ions
+        msd_components = self.sum_components[lags] / counts[:, None] / self.n_ions
+        mscd = self.sum_chg[lags] / counts / self.n_ions
+        return lags, msd, msd_components, mscd
+
+    def get_summary_dict(self, include_msd_t=False, include_mscd_t=False):
+        """
+        Summary of the diffusion analysis, with the same keys as
+        DiffusionAnalyzer.get_summary_dict.
+        """
+        lags, msd, msd_components, mscd = self.get_msd()
+        if self.smoothed == "max":
+            # as DiffusionAnalyzer: at most ~200 lags from 1 ps
+            min_dt = int(1000 / (self.step_skip * self.time_step))
+            max_dt = self.max_lag + 1
+            if min_dt >= max_dt:
+                raise ValueError("Not enough data to calculate diffusivity")
+            sel = np.arange(min_dt, max_dt, max(int((max_dt - min_dt) / 200), 1))
+        else:
+            sel = np.arange(0, self.max_lag + 1)
+        sel = sel[np.isin(sel, lags)]
+        idx = np.searchsorted(lags, sel)
+        msd, msd_components, mscd = msd[idx], msd_components[idx], mscd[idx]
+        dt = sel * self.time_step * self.step_skip
+
+        def weighted_lstsq(a, b):
+            if self.smoothed == "max":
+                w_root = (1 / dt) ** 0.5
+                return np.linalg.lstsq(a * w_root[:, None], b * w_root, rcond=None)
+            return np.linalg.lstsq(a, b, rcond=None)
+
+        a = np.ones((len(dt), 2))
+        a[:, 0] = dt
+        m_components, m_components_res = np.zeros(3), np.zeros(3)
+        for i in range(3):
+            (m, c), res, rank, s = weighted_lstsq(a, msd_components[:, i])
+            m_components[i] = max(m, 1e-15)
+            m_components_res[i] = res[0] if len(res) else 0
+        (m, c), res, rank, s = weighted_lstsq(a, msd)
+        m = max(m, 1e-15)
+        (m_chg, c_chg), res_chg, _, _ = weighted_lstsq(a, mscd)
+        m_chg = max(m_chg, 1e-15)
+        res = res[0] if len(res) else 0
+        res_chg = res_chg[0] if len(res_chg) else 0
+
+        conv_factor = get_conversion_factor(self.n_ions, self.volume, self.charge,
+                                            self.temperature)
+        n = len(dt)
+        denom = (n * np.sum((dt / 1000) ** 2) - np.sum(dt / 1000) ** 2) * (n - 2)
+        diffusivity = m / 60
+        chg_diffusivity = m_chg / 60
+        diffusivity_std_dev = np.sqrt(n * res / denom) / 60 / 1000
+        components = m_components / 20
+        components_std_dev = np.sqrt(n * m_components_res / denom) / 20 / 1000
+        d = {
+            "D": diffusivity,
+            "D_sigma": diffusivity_std_dev,
+            "D_charge": chg_diffusivity,
+            "D_charge_sigma": np.sqrt(n * res_chg / denom) / 60 / 1000,
+            "S": diffusivity * conv_factor,
+            "S_sigma": diffusivity_std_dev * conv_factor,
+            "S_charge": chg_diffusivity * conv_factor,
+            "D_components": components.tolist(),
+            "S_components": (components * conv_factor).tolist(),
+            "D_components_sigma": components_std_dev.tolist(),
+            "S_components_sigma": (components_std_dev * conv_factor).tolist(),
+            "specie": str(self.specie),
+            "step_skip": self.step_skip,
+            "time_step": self.time_step,
+            "temperature": self.temperature,
+            "max_framework_displacement": self.max_framework_displacement,
+            "Haven_ratio": diffusivity / chg_diffusivity,
+        }
+        if include_msd_t:
+            d["msd"] = msd.tolist()
+            d["msd_components"] = msd_components.tolist()
+            d["dt"] = dt.tolist()
+        if include_mscd_t:
+            d["mscd"] = mscd.tolist()
+        return d
+
+
+def get_type_map(data_file):
+    """
+    Elements of the atom types of a LAMMPS data file, guessed from their
+    masses as LammpsData does: each atom type is mapped to the element of
+    closest atomic mass.
+
+    Args:
+        data_file (str): path to the data file
+
+    Returns:
+        (dict) LAMMPS atom type -> element, e.g. {"1": "Li"}
+    """
+    from pymatgen.core.periodic_table import Element
+
+    elements = [el for el in Element if el.atomic_mass is not None]
+    masses = np.array([float(el.atomic_mass) for el in elements])
+    type_map, in_masses = {}, False
+    with open(data_file) as f:
+        for line in f:
+            fields = line.split("#")[0].split()
+            if not fields:
+                continue
+            if len(fields) == 1 and fields[0] == "Masses":
+                in_masses = True
+            elif in_masses and len(fields) == 2 and fields[0].isdigit():
+                type_map[fields[0]] = elements[
+                    int(np.argmin(np.abs(masses - float(fields[1]))))].symbol
+            elif in_masses:
+                break
+    if not type_map:
+        raise ValueError("No Masses section in {}".format(data_file))
+    return type_map
+
+
+def get_diffusion_summary(dump_doc, specie, temperature, time_step, step_skip=None, type_map=None,
+                          charge=None, db=None, smoothed="max", min_obs=30, avg_nsteps=1000,
+                          origin_interval=None, max_origin_memory=MAX_ORIGIN_MEMORY,
+                          include_msd_t=False):
+    """
+    Streaming diffusion analysis of a dump stored with
+    atomate.lammps.trajectory.store_dump; the chunks are read one at a time.
+
+    Args:
+        dump_doc (dict): summary of the stored dump
+        specie (str/int/[int]): diffusing species, as an element (requires
+            type_map) or as LAMMPS atom type(s)
+        temperature (float): temperature in K
+        time_step (float): time step in fs
+        step_skip (int): number of time steps between frames. Defaults to the
+            interval between the time steps of the first two frames.
+        type_map (dict): LAMMPS atom type -> element, e.g. {"1": "Li"}
+        charge (float): charge of the diffusing ions. Defaults to the number
+            of valence electrons of the element, as in DiffusionAnalyzer.
+        db (Database): pymongo database of the GridFS chunks, if any
+        smoothed, min_obs, avg_nsteps, origin_interval, max_origin_memory: see
+            StreamingDiffusionAnalyzer
+        include_msd_t (bool): include the MSD vs time data
+
+    Returns:
+        (dict) summary dict
+    """
+    if isinstance(specie, str):
+        if not type_map:
+            raise ValueError("A type_map is needed to select the atoms of {}".format(specie))
+        specie_types = [int(t) for t, el in type_map.items() if el == specie]
+        if charge is None:
+            from pymatgen.core.periodic_table import get_el_sp
+            sp = get_el_sp(specie)
+            charge = getattr(sp, "oxi_state", None) or sp.full_electronic_structure[-1][2]
+    else:
+        specie_types = [specie] if isinstance(specie, int) else list(specie)
+    if step_skip is None:
+        step_skip = dump_doc["timesteps"][1] - dump_doc["timesteps"][0]
+    position_cols = dump_doc["column_groups"]["positions"]
+    analyzer = StreamingDiffusionAnalyzer(
+        specie_types, temperature, time_step, step_skip, dump_doc["n_frames"],
+        smoothed=smoothed, min_obs=min_obs, avg_nsteps=avg_nsteps,
+        origin_interval=origin_interval, max_origin_memory=max_origin_memory,
+        charge=1 if charge is None else charge,
+        specie=specie, position_kind=position_cols[0])
+    for frame in read_dump_frames(dump_doc, db=db):
+        analyzer.update(frame)
+    return analyzer.get_summary_dict(include_msd_t=include_msd_t)
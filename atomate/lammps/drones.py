@@ -15,6 +15,8 @@ from pymatgen.apps.borg.hive import AbstractDrone
 from atomate.utils.utils import get_uri
 
 from atomate.utils.utils import get_logger
+from atomate.lammps.diffusion import get_diffusion_summary, get_type_map
+from atomate.lammps.trajectory import DEFAULT_CHUNK_SIZE, LocalChunkStore, store_dump
 
 __author__ = 'Brandon Wood, Kiran Mathew'
 __email__ = 'b.wood@berkeley.edu'
@@ -30,19 +32,28 @@ class LammpsDrone(AbstractDrone):
         "root": {"schema", "dir_name", "input", "output", "last_updated", "state", "completed_at"}
     }
 
-    def __init__(self, additional_fields=None, use_full_uri=True, diffusion_params=None):
+    def __init__(self, additional_fields=None, use_full_uri=True, diffusion_params=None,
+                 dump_store=None, dump_chunk_size=DEFAULT_CHUNK_SIZE):
         """
 
         Args:
             additional_fields (dict):
             use_full_uri (bool):
-            diffusion_params (dict): parameters to the diffusion_analyzer. If specified a summary
+            diffusion_params (dict): parameters to the streaming diffusion analysis of the
+                dump trajectory, see atomate.lammps.diffusion.get_diffusion_summary (specie,
+                temperature, time_step, step_skip, type_map, ...). If specified a summary
                 of diffusion statistics will be added.
+            dump_store (LocalChunkStore/GridFSChunkStore): where the chunks of the dump
+                trajectories are stored, see atomate.lammps.trajectory. Defaults to a
+                "dump_chunks" directory in the run folder.
+            dump_chunk_size (int): maximum size in bytes of a chunk of a dump trajectory
         """
         self.additional_fields = additional_fields or {}
         self.use_full_uri = use_full_uri
         self.runs = []
         self.diffusion_params = diffusion_params
+        self.dump_store = dump_store
+        self.dump_chunk_size = dump_chunk_size
 
     def assimilate(self, path, input_filename, log_filename="log.lammps",  is_forcefield=False,
                    data_filename=None, dump_files=None):
@@ -70,11 +81,13 @@ class LammpsDrone(AbstractDrone):
         # input set
         lmps_input = LammpsInputSet.from_file("lammps", input_file, {}, data_file, data_filename)
 
-        # dumps
+        # dumps: the frames are streamed to the dump store in chunks
         dumps = []
+        store = self.dump_store or LocalChunkStore(os.path.join(path, "dump_chunks"))
         if dump_files:
             for df in dump_files:
-                dumps.append((df, LammpsDump.from_file(os.path.join(path, df))))
+                dumps.append((df, store_dump(os.path.join(path, df), store,
+                                             chunk_size=self.dump_chunk_size)))
 
         # log
         log = LammpsLog(log_file=log_file)
@@ -82,27 +95,31 @@ class LammpsDrone(AbstractDrone):
         logger.info("Getting task doc for base dir :{}".format(path))
         d = self.generate_doc(path, lmps_input, log, dumps)
 
-        lmps_run = None
-        if len(dump_files) == 1 and data_file:
-            lmps_run = LammpsRun(data_file, dump_files[0], log_file=log_filename)
-
-        self.post_process(d, lmps_run)
+        self.post_process(d, dumps, db=getattr(store, "db", None), data_file=data_file)
 
         return d
 
-    def post_process(self, d, lmps_run):
+    def post_process(self, d, dumps, db=None, data_file=None):
         """
-        Simple post processing.
+        Simple post processing. The diffusion analysis streams the frames of the
+        stored dump, so that the trajectory is never fully loaded in memory.
 
         Args:
             d (dict)
-            lmps_run (LammpsRun)
+            dumps ([(filename, dict)]): the stored dumps
+            db (Database): pymongo database of the GridFS chunks, if any
+            data_file (str): path to the data file. The elements of the atom
+                types are taken from its masses if the diffusing specie is an
+                element and diffusion_params has no type_map.
         """
-        if self.diffusion_params and isinstance(lmps_run, LammpsRun):
+        if self.diffusion_params and len(dumps) == 1:
             d["analysis"] = {}
             d["analysis"]["diffusion_params"] = self.diffusion_params
-            diffusion_analyzer = lmps_run.get_diffusion_analyzer(**self.diffusion_params)
-            d["analysis"]["diffusion"] = diffusion_analyzer.get_summary_dict()
+            params = dict(self.diffusion_params)
+            if isinstance(params.get("specie"), str) and not params.get("type_map") \
+                    and data_file:
+                params["type_map"] = get_type_map(data_file)
+            d["analysis"]["diffusion"] = get_diffusion_summary(dumps[0][1], db=db, **params)
         d['state'] = 'successful'
 
     def generate_doc(self, dir_name, lmps_input, log, dumps):
@@ -112,7 +129,8 @@ class LammpsDrone(AbstractDrone):
             dir_name (str): path to the run dir.
             lmps_input (LammpsInput/LammpsInputSet):
             log (LammpsLog):
-            dumps ([(filename, LammpsDump)]): list of (dump filename, dump) tuples
+            dumps ([(filename, dict)]): list of (dump filename, summary of the stored dump)
+                tuples, see atomate.lammps.trajectory.store_dump
 
         Returns:
             dict
@@ -128,7 +146,7 @@ class LammpsDrone(AbstractDrone):
             d["last_updated"] = datetime.utcnow()
             d["input"] = lmps_input.as_dict()
             d["output"] = {"log": log.as_dict()}
-            d["output"]["dumps"] = dict([(dump_fname, dmp.as_dict()) for dump_fname, dmp in dumps])
+            d["output"]["dumps"] = dict(dumps)
             return d
 
         except:
@@ -143,7 +161,8 @@ class LammpsDrone(AbstractDrone):
     def as_dict(self):
         init_args = {"additional_fields": self.additional_fields,
                      "use_full_uri": self.use_full_uri,
-                     "diffusion_params": self.diffusion_params}
+                     "diffusion_params": self.diffusion_params,
+                     "dump_chunk_size": self.dump_chunk_size}
 
         return {"@module": self.__class__.__module__,
                 "@class": self.__class__.__name__,
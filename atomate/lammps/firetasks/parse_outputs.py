@@ -18,6 +18,7 @@ from atomate.common.firetasks.glue_tasks import get_calc_loc
 from atomate.utils.utils import env_chk
 from atomate.lammps.drones import LammpsDrone
 from atomate.lammps.database import LammpsCalcDb
+from atomate.lammps.trajectory import DEFAULT_CHUNK_SIZE, GridFSChunkStore
 
 __author__ = 'Kiran Mathew'
 __email__ = "kmathew@lbl.gov"
@@ -44,15 +45,19 @@ class LammpsToDB(FiretaskBase):
         data_filename:
         log_filename:
         dump_filenames:
-        diffusion_params
+        diffusion_params (dict): parameters of the streaming diffusion analysis of the dump,
+            see atomate.lammps.diffusion.get_diffusion_summary
         additional_fields:
+        dump_chunk_size (int): maximum size in bytes of the chunks in which the dump
+            trajectories are stored, in GridFS if db_file is set, else in the
+            "dump_chunks" directory of the run.
     """
 
     required_params = ["input_filename"]
 
     optional_params = ["calc_dir", "calc_loc", "db_file", "fw_spec_field",
                        "data_filename", "log_filename", "dump_filenames", "diffusion_params",
-                       "additional_fields"]
+                       "additional_fields", "dump_chunk_size"]
 
     def run_task(self, fw_spec):
 
@@ -66,8 +71,13 @@ class LammpsToDB(FiretaskBase):
         # parse the directory
         logger.info("PARSING DIRECTORY: {}".format(calc_dir))
 
+        db_file = env_chk(self.get('db_file'), fw_spec)
+        mmdb = LammpsCalcDb.from_db_file(db_file) if db_file else None
+
         drone = LammpsDrone(additional_fields=self.get("additional_fields"),
-                            diffusion_params=self.get("diffusion_params", None))
+                            diffusion_params=self.get("diffusion_params", None),
+                            dump_store=GridFSChunkStore(mmdb.db) if mmdb else None,
+                            dump_chunk_size=self.get("dump_chunk_size", DEFAULT_CHUNK_SIZE))
 
         task_doc = drone.assimilate(calc_dir, input_filename=self["input_filename"],
                                     log_filename=self.get("log_filename", "log.lammps"),
@@ -79,14 +89,11 @@ class LammpsToDB(FiretaskBase):
         if self.get("fw_spec_field"):
             task_doc.update(fw_spec[self.get("fw_spec_field")])
 
-        db_file = env_chk(self.get('db_file'), fw_spec)
-
         # db insertion
         if not db_file:
             with open("task.json", "w") as f:
                 f.write(json.dumps(task_doc, default=DATETIME_HANDLER))
         else:
-            mmdb = LammpsCalcDb.from_db_file(db_file)
             # insert the task document
             t_id = mmdb.insert(task_doc)
             logger.info("Finished parsing with task_id: {}".format(t_id))
@@ -0,0 +1,140 @@
+# coding: utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pymatgen.core.lattice import Lattice
+from pymatgen.core.structure import Structure
+
+from atomate.lammps.diffusion import StreamingDiffusionAnalyzer, get_diffusion_summary
+from atomate.lammps.trajectory import LocalChunkStore, read_dump_frames, store_dump
+
+try:
+    from pymatgen.analysis.diffusion_analyzer import DiffusionAnalyzer
+except ImportError:
+    try:
+        from pymatgen.analysis.diffusion.analyzer import DiffusionAnalyzer
+    except ImportError:
+        DiffusionAnalyzer = None
+
+
+def write_dump(filename, positions, box_length, types, images=True):
+    # positions: (n_frames, natoms, 3) unwrapped cartesian positions
+    with open(filename, "w") as f:
+        for i, pos in enumerate(positions):
+            img = np.floor(pos / box_length).astype(int)
+            wrapped = pos - img * box_length
+            cols = "id type x y z ix iy iz" if images else "id type x y z"
+            f.write("ITEM: TIMESTEP\n{}\nITEM: NUMBER OF ATOMS\n{}\n".format(i * 10, len(pos)))
+            f.write("ITEM: BOX BOUNDS pp pp pp\n" + "0.0 {}\n".format(box_length) * 3)
+            f.write("ITEM: ATOMS {}\n".format(cols))
+            for j, (p, im) in enumerate(zip(wrapped, img)):
+                row = [j + 1, types[j]] + p.tolist() + (im.tolist() if images else [])
+                f.write(" ".join(str(x) for x in row) + "\n")
+
+
+def brute_force_msd(positions, indices, framework, max_lag):
+    # the all-origins MSD of pymatgen's DiffusionAnalyzer
+    disp = positions - positions[0]
+    dc = disp[:, indices] - disp[:, framework].mean(axis=1)[:, None, :]
+    return np.array([np.mean(np.sum((dc[n:] - dc[:-n]) ** 2, axis=2)) if n else 0
+                     for n in range(max_lag + 1)])
+
+
+class TestStreamingDiffusion(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch_dir = tempfile.mkdtemp()
+        rs = np.random.RandomState(0)
+        self.n_frames, self.box_length = 300, 10.0
+        self.types = [1] * 20 + [2] * 20
+        steps = rs.normal(scale=0.3, size=(self.n_frames, 40, 3))
+        steps[:, 20:] *= 0.01
+        steps[0] = rs.uniform(0, self.box_length, size=(40, 3))
+        self.positions = np.cumsum(steps, axis=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch_dir)
+
+    def _analyze(self, images=True, **kwargs):
+        filename = os.path.join(self.scratch_dir, "test.dump")
+        write_dump(filename, self.positions, self.box_length, self.types, images=images)
+        doc = store_dump(filename, LocalChunkStore(self.scratch_dir), chunk_size=10000)
+        analyzer = StreamingDiffusionAnalyzer([1], 300, 2, 10, doc["n_frames"], **kwargs)
+        for frame in read_dump_frames(doc):
+            analyzer.update(frame)
+        return doc, analyzer
+
+    def test_msd(self):
+        for images in [True, False]:
+            doc, analyzer = self._analyze(images=images)
+            self.assertGreater(len(doc["chunks"]), 1)
+            lags, msd, msd_components, mscd = analyzer.get_msd()
+            ref = brute_force_msd(self.positions, np.arange(20), np.arange(20, 40),
+                                  analyzer.max_lag)
+            self.assertTrue(np.allclose(msd, ref[lags], atol=1e-4))
+            self.assertTrue(np.allclose(msd_components.sum(axis=1), msd))
+
+    def test_origin_interval(self):
+        _, analyzer = self._analyze(origin_interval=10)
+        self.assertLessEqual(len(analyzer._origin_frame), analyzer.max_lag // 10 + 2)
+        lags, msd, _, _ = analyzer.get_msd()
+        # 3 * 0.3^2 A^2 per frame
+        self.assertAlmostEqual(msd[50] / lags[50], 0.27, delta=0.05)
+
+    def test_origin_memory(self):
+        # the default budget fits one origin per frame
+        _, analyzer = self._analyze()
+        self.assertEqual(analyzer.origin_interval, 1)
+        # room for the positions of the 20 ions at 12 origins
+        _, analyzer = self._analyze(max_origin_memory=12 * 20 * 3 * 8)
+        self.assertEqual(analyzer.origin_interval, 20)
+        self.assertLessEqual(len(analyzer._origin_frame), 12)
+        lags, msd, _, _ = analyzer.get_msd()
+        self.assertAlmostEqual(msd[50] / lags[50], 0.27, delta=0.05)
+
+        _, analyzer = self._analyze(smoothed=None)
+        self.assertEqual(len(analyzer._origin_frame), 1)
+        lags, msd, _, _ = analyzer.get_msd()
+        # the displacements from the first frame only
+        disp = self.positions - self.positions[0]
+        dc = disp[:, :20] - disp[:, 20:].mean(axis=1)[:, None, :]
+        ref = np.mean(np.sum(dc ** 2, axis=2), axis=1)
+        self.assertTrue(np.allclose(msd, ref[lags], atol=1e-4))
+
+    @unittest.skipIf(DiffusionAnalyzer is None, "DiffusionAnalyzer not available")
+    def test_summary_vs_diffusion_analyzer(self):
+        filename = os.path.join(self.scratch_dir, "test.dump")
+        write_dump(filename, self.positions, self.box_length, self.types)
+        doc = store_dump(filename, LocalChunkStore(self.scratch_dir))
+        d = get_diffusion_summary(doc, "Li", 300, 2, type_map={"1": "Li", "2": "O"})
+
+        structure = Structure(Lattice.cubic(self.box_length), ["Li"] * 20 + ["O"] * 20,
+                              self.positions[0], coords_are_cartesian=True)
+        disp = (self.positions - self.positions[0]).transpose(1, 0, 2)
+        ref = DiffusionAnalyzer(structure, disp, "Li", 300, 2, 10).get_summary_dict()
+        for k, v in ref.items():
+            if k in d and k != "specie":
+                self.assertTrue(np.allclose(d[k], v, rtol=1e-6), k)
+
+    def test_summary(self):
+        filename = os.path.join(self.scratch_dir, "test.dump")
+        write_dump(filename, self.positions, self.box_length, self.types)
+        doc = store_dump(filename, LocalChunkStore(self.scratch_dir))
+        d = get_diffusion_summary(doc, "Li", 300, 2, type_map={"1": "Li", "2": "O"},
+                                  charge=1, include_msd_t=True)
+        self.assertEqual(d["step_skip"], 10)
+        self.assertEqual(d["specie"], "Li")
+        # D = msd / (6 t): 0.27 A^2 / 20 fs
+        self.assertAlmostEqual(d["D"] / (0.27 / 20 / 6 * 0.1), 1, delta=0.2)
+        self.assertAlmostEqual(d["Haven_ratio"], 1, delta=0.5)
+        self.assertEqual(len(d["D_components"]), 3)
+        self.assertEqual(len(d["msd"]), len(d["dt"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,11 +3,16 @@
 import os
 import unittest
 
+import numpy as np
+
 # from pymatgen.io.lammps.sets import LammpsInputSet
 # from pymatgen.io.lammps.output import LammpsLog
 
 from atomate.utils.testing import AtomateTest
+from atomate.lammps.diffusion import get_diffusion_summary, get_type_map
 from atomate.lammps.drones import LammpsDrone
+from atomate.lammps.trajectory import LocalChunkStore, store_dump
+from atomate.lammps.tests.test_diffusion import write_dump
 
 __author__ = 'Kiran Mathew'
 __email__ = 'kmathew@lbl.gov'
@@ -46,5 +51,38 @@ class TestLammpsDrone(AtomateTest):
         self.assertEqual(lmps_output.as_dict()['thermo_data']['enthalpy'], enthalpy)
 
 
+class TestLammpsDroneDiffusion(AtomateTest):
+
+    def setUp(self):
+        super(TestLammpsDroneDiffusion, self).setUp(lpad=False)
+        rs = np.random.RandomState(0)
+        steps = rs.normal(scale=0.3, size=(300, 20, 3))
+        steps[0] = rs.uniform(0, 10, size=(20, 3))
+        write_dump("test.dump", np.cumsum(steps, axis=0), 10.0, [1] * 10 + [2] * 10)
+        self.dump = store_dump("test.dump", LocalChunkStore("dump_chunks"))
+        with open("test.data", "w") as f:
+            f.write("test\n\n20 atoms\n2 atom types\n\nMasses\n\n"
+                    "1 6.941 # Li\n2 15.9994\n\nAtoms\n\n")
+
+    def test_get_type_map(self):
+        self.assertEqual(get_type_map("test.data"), {"1": "Li", "2": "O"})
+        self.assertEqual(get_type_map(os.path.join(module_dir, "test_files", "peo.data")),
+                         {"1": "H", "2": "C", "3": "O"})
+
+    def test_post_process(self):
+        params = {"specie": "Li", "temperature": 300, "time_step": 2}
+        drone = LammpsDrone(diffusion_params=params)
+        d = {}
+        drone.post_process(d, [("test.dump", self.dump)], data_file="test.data")
+        self.assertEqual(d["state"], "successful")
+        self.assertEqual(d["analysis"]["diffusion_params"], params)
+        ref = get_diffusion_summary(self.dump, type_map={"1": "Li", "2": "O"}, **params)
+        self.assertEqual(d["analysis"]["diffusion"]["specie"], "Li")
+        self.assertAlmostEqual(d["analysis"]["diffusion"]["D"], ref["D"])
+
+        # without a data file, the atom types must be given
+        self.assertRaises(ValueError, drone.post_process, {}, [("test.dump", self.dump)])
+
+
 if __name__ == "__main__":
     unittest.main()
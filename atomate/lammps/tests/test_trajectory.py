@@ -0,0 +1,57 @@
+# coding: utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from atomate.lammps.trajectory import LocalChunkStore, iter_dump_frames, read_dump_frames, \
+    store_dump
+
+module_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestTrajectory(unittest.TestCase):
+
+    def setUp(self):
+        self.dump_file = os.path.join(module_dir, "test_files", "peo.dump")
+        self.scratch_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch_dir)
+
+    def test_iter_dump_frames(self):
+        frames = list(iter_dump_frames(self.dump_file))
+        self.assertEqual([f["timestep"] for f in frames], [0, 1000])
+        self.assertEqual(frames[0]["columns"],
+                         ["id", "type", "x", "y", "z", "ix", "iy", "iz", "mol"])
+        self.assertEqual(frames[0]["data"].shape, (144, 9))
+        self.assertEqual(frames[1]["box"][0], [0.59470697524060334, 21.405293024759409])
+
+    def test_store_and_read(self):
+        frames = list(iter_dump_frames(self.dump_file))
+        # one frame per chunk
+        doc = store_dump(self.dump_file, LocalChunkStore(self.scratch_dir), chunk_size=1000)
+        self.assertEqual(doc["n_frames"], 2)
+        self.assertEqual(len(doc["chunks"]), 2)
+        self.assertEqual(doc["column_groups"]["positions"], ["x", "y", "z"])
+
+        stored = list(read_dump_frames(doc, start=1))
+        self.assertEqual(len(stored), 1)
+        self.assertEqual(stored[0]["timestep"], 1000)
+        data = frames[1]["data"][np.argsort(frames[1]["data"][:, 0])]
+        np.testing.assert_array_equal(stored[0]["ids"].ravel(), np.arange(1, 145))
+        np.testing.assert_array_equal(stored[0]["positions"], data[:, 2:5])
+        np.testing.assert_array_equal(stored[0]["images"], data[:, 5:8])
+
+        # all the frames in one chunk
+        doc = store_dump(self.dump_file, LocalChunkStore(self.scratch_dir))
+        self.assertEqual(len(doc["chunks"]), 1)
+        self.assertEqual(doc["chunks"][0]["offsets"], [0, 144, 288])
+        self.assertEqual([f["timestep"] for f in read_dump_frames(doc)], [0, 1000])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,257 @@
+# coding: utf-8
+
+
+"""
+This module defines the streaming parser and the chunked, columnar storage of
+LAMMPS text dump trajectories.
+
+Storing every frame of a dump as nested lists in the task document exceeds
+the 16 MB BSON limit for any realistic MD run. Instead, the frames are parsed
+one at a time and grouped in chunks of bounded size; each chunk is stored as
+a compressed npz file of per-column-group arrays (ids, types, positions,
+velocities, ...) of all its frames, in GridFS or in a local directory. The
+task document only holds a summary of the dump: the time steps and boxes of
+the frames, and the location and row offsets of the frames of each chunk.
+read_dump_frames reads a range of frames back, loading only the chunks
+needed.
+"""
+
+import io
+import os
+
+import gridfs
+import numpy as np
+from bson import ObjectId
+from monty.io import zopen
+
+from atomate.utils.utils import get_logger
+
+logger = get_logger(__name__)
+
+# maximum size in bytes of the arrays of a chunk, which bounds the memory used
+DEFAULT_CHUNK_SIZE = 64 * 1024 ** 2
+
+# columns stored together as one array, in order of preference for positions
+COLUMN_GROUPS = [
+    ("ids", [["id"]], np.int64),
+    ("types", [["type"]], np.int32),
+    ("mol", [["mol"]], np.int64),
+    ("positions", [["x", "y", "z"], ["xu", "yu", "zu"], ["xs", "ys", "zs"],
+                   ["xsu", "ysu", "zsu"]], np.float64),
+    ("images", [["ix", "iy", "iz"]], np.int32),
+    ("velocities", [["vx", "vy", "vz"]], np.float64),
+    ("forces", [["fx", "fy", "fz"]], np.float64),
+]
+
+
+def get_column_groups(columns):
+    """
+    Group the per-atom columns of a dump.
+
+    Args:
+        columns ([str]): column names of the ATOMS section
+
+    Returns:
+        (dict) group name -> (column names, dtype). The columns that are not in
+            COLUMN_GROUPS are in the "other" group, as floats.
+    """
+    groups, used = {}, set()
+    for name, candidates, dtype in COLUMN_GROUPS:
+        for cols in candidates:
+            if all(c in columns for c in cols) and not used.intersection(cols):
+                groups[name] = (cols, dtype)
+                used.update(cols)
+                break
+    other = [c for c in columns if c not in used]
+    if other:
+        groups["other"] = (other, np.float64)
+    return groups
+
+
+def iter_dump_frames(filename):
+    """
+    Parse a LAMMPS text dump (possibly compressed) one frame at a time.
+
+    Args:
+        filename (str): path to the dump file
+
+    Yields:
+        (dict) frame, with the keys "timestep", "natoms", "box" (3x2 or 3x3
+            bounds, as in the dump), "boundary", "columns" and "data", the
+            (natoms, ncolumns) float array of the per-atom columns
+    """
+    with zopen(filename, "rt") as f:
+        frame = {}
+        for line in f:
+            if not line.startswith("ITEM:"):
+                continue
+            item = line[5:].strip()
+            if item.startswith("TIMESTEP"):
+                frame = {"timestep": int(f.readline().split()[0])}
+            elif item.startswith("NUMBER OF ATOMS"):
+                frame["natoms"] = int(f.readline().split()[0])
+            elif item.startswith("BOX BOUNDS"):
+                tokens = item.split()[2:]
+                frame["boundary"] = " ".join(t for t in tokens if t not in ("xy", "xz", "yz"))
+                frame["box"] = [[float(x) for x in f.readline().split()] for _ in range(3)]
+            elif item.startswith("ATOMS"):
+                frame["columns"] = item.split()[1:]
+                lines = [f.readline() for _ in range(frame["natoms"])]
+                data = np.array(" ".join(lines).split(), dtype=np.float64)
+                frame["data"] = data.reshape(frame["natoms"], len(frame["columns"]))
+                yield frame
+
+
+class LocalChunkStore:
+    """
+    Stores the chunks of dumps as files in a directory.
+    """
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+
+    def put(self, data, filename):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, filename)
+        with open(path, "wb") as f:
+            f.write(data)
+        return {"path": path}
+
+    @staticmethod
+    def get(ref):
+        with open(ref["path"], "rb") as f:
+            return f.read()
+
+
+class GridFSChunkStore:
+    """
+    Stores the chunks of dumps in GridFS.
+    """
+
+    def __init__(self, db, collection="lammps_dumps_fs"):
+        """
+        Args:
+            db (Database): pymongo database, e.g. LammpsCalcDb.db
+            collection (str): GridFS collection name
+        """
+        self.db = db
+        self.collection = collection
+
+    def put(self, data, filename):
+        fs_id = gridfs.GridFS(self.db, self.collection).put(data, filename=filename)
+        return {"fs_id": str(fs_id), "collection": self.collection}
+
+    def get(self, ref):
+        return gridfs.GridFS(self.db, ref["collection"]).get(ObjectId(ref["fs_id"])).read()
+
+
+def store_dump(filename, store, chunk_size=DEFAULT_CHUNK_SIZE, sort_ids=True):
+    """
+    Parse a dump in a streaming fashion and store its frames in chunks of
+    columnar arrays. The memory used is bounded by chunk_size (plus a frame).
+
+    Args:
+        filename (str): path to the dump file
+        store (LocalChunkStore/GridFSChunkStore): where the chunks are stored
+        chunk_size (int): maximum size in bytes of the arrays of a chunk. A
+            chunk holds at least one frame.
+        sort_ids (bool): sort the atoms of each frame by id, so that the rows
+            of all the frames correspond to the same atoms
+
+    Returns:
+        (dict) summary of the dump for the task doc, see read_dump_frames
+    """
+    doc = {"format": "npz", "n_frames": 0, "timesteps": [], "natoms": [], "boxes": [],
+           "boundary": None, "columns": None, "column_groups": None, "chunks": []}
+    basename = os.path.basename(filename)
+    buffer, buffer_size = [], 0
+
+    def flush():
+        nonlocal buffer_size
+        arrays = {}
+        for name, (cols, dtype) in groups.items():
+            idx = [columns.index(c) for c in cols]
+            arrays[name] = np.concatenate([fr[:, idx] for fr in buffer]).astype(dtype)
+        offsets = np.cumsum([0] + [len(fr) for fr in buffer]).tolist()
+        bio = io.BytesIO()
+        np.savez_compressed(bio, **arrays)
+        ref = store.put(bio.getvalue(), "{}.{}.npz".format(basename, len(doc["chunks"])))
+        doc["chunks"].append({"ref": ref, "first_frame": doc["n_frames"] - len(buffer),
+                              "n_frames": len(buffer), "offsets": offsets})
+        del buffer[:]
+        buffer_size = 0
+
+    for frame in iter_dump_frames(filename):
+        if doc["columns"] is None:
+            columns = frame["columns"]
+            groups = get_column_groups(columns)
+            doc["columns"] = columns
+            doc["column_groups"] = {k: v[0] for k, v in groups.items()}
+            doc["boundary"] = frame["boundary"]
+        elif frame["columns"] != columns:
+            raise ValueError("The columns of the frames of {} differ".format(filename))
+        data = frame["data"]
+        if sort_ids and "id" in columns:
+            data = data[np.argsort(data[:, columns.index("id")], kind="stable")]
+        if buffer and buffer_size + data.nbytes > chunk_size:
+            flush()
+        buffer.append(data)
+        buffer_size += data.nbytes
+        doc["n_frames"] += 1
+        doc["timesteps"].append(frame["timestep"])
+        doc["natoms"].append(frame["natoms"])
+        doc["boxes"].append(frame["box"])
+    if buffer:
+        flush()
+    logger.info("Stored {} frames of {} in {} chunks".format(
+        doc["n_frames"], basename, len(doc["chunks"])))
+    return doc
+
+
+def get_chunk_store(ref, db=None):
+    """
+    The store holding a chunk.
+
+    Args:
+        ref (dict): reference to the chunk
+        db (Database): pymongo database of the GridFS chunks
+    """
+    if "path" in ref:
+        return LocalChunkStore(os.path.dirname(ref["path"]))
+    if db is None:
+        raise ValueError("A database is needed to read chunks stored in GridFS")
+    return GridFSChunkStore(db, ref["collection"])
+
+
+def read_dump_frames(dump_doc, start=0, stop=None, db=None):
+    """
+    Read a range of frames of a dump stored with store_dump. Only the chunks
+    holding the frames are loaded.
+
+    Args:
+        dump_doc (dict): summary of the dump in the task doc, i.e.
+            output.dumps.<dump filename>
+        start (int): index of the first frame
+        stop (int): index after the last frame. Defaults to the last frame.
+        db (Database): pymongo database of the GridFS chunks, if any
+
+    Yields:
+        (dict) frame, with the keys "index", "timestep", "box" and the arrays
+            of the column groups ("ids", "types", "positions", ...)
+    """
+    stop = dump_doc["n_frames"] if stop is None else min(stop, dump_doc["n_frames"])
+    for chunk in dump_doc["chunks"]:
+        first, last = chunk["first_frame"], chunk["first_frame"] + chunk["n_frames"]
+        if last <= start or first >= stop:
+            continue
+        data = get_chunk_store(chunk["ref"], db).get(chunk["ref"])
+        with np.load(io.BytesIO(data)) as npz:
+            arrays = {k: npz[k] for k in npz.files}
+        offsets = chunk["offsets"]
+        for i in range(max(start, first), min(stop, last)):
+            j = i - first
+            frame = {"index": i, "timestep": dump_doc["timesteps"][i],
+                     "box": dump_doc["boxes"][i]}
+            for name, arr in arrays.items():
+                frame[name] = arr[offsets[j]:offsets[j + 1]]
+            yield frame
@@ -3,6 +3,7 @@
 
 # This module defines the database classes.
 
+from atomate.qchem.trajectory import TRAJECTORY_ARRAYS
 from atomate.utils.database import CalcDb
 from atomate.utils.utils import get_logger
 
@@ -29,6 +30,82 @@ class QChemCalcDb(CalcDb):
         super(QChemCalcDb, self).__init__(host, port, database, collection,
                                           user, password, **kwargs)
 
+    def insert_task(self, task_doc, binary_arrays=False):
+        """
+        Inserts a task document (e.g., as returned by Drone.assimilate()) into the database.
+
+        Args:
+            task_doc (dict): the task document
+            binary_arrays (bool): store the arrays of the optimization trajectory
+                (coordinates and site properties) as compressed binary arrays in gridfs.
+                The task doc keeps a reference in opt_trajectory.<name>_fs_id; use
+                get_opt_trajectory to read them back.
+        Returns:
+            (int) - task_id of inserted document
+        """
+        arrays_to_store = self._pop_trajectory_arrays(task_doc) if binary_arrays else {}
+        t_id = self.insert(task_doc)
+        self._insert_trajectory_arrays(t_id, arrays_to_store)
+        return t_id
+
+    def insert_tasks(self, task_docs, binary_arrays=False, update_duplicates=True):
+        """
+        Inserts several task documents in a single bulk write, e.g. to
+        (re-)ingest many QChem runs.
+
+        Args:
+            task_docs ([dict]): the task documents
+            binary_arrays (bool): see insert_task
+            update_duplicates (bool): whether to update the documents of runs
+                (dir_name) already in the database
+        Returns:
+            ([int]) - task_ids of the documents, None for the skipped duplicates
+        """
+        arrays = [self._pop_trajectory_arrays(d) if binary_arrays else {} for d in task_docs]
+        t_ids = self.insert_many(task_docs, update_duplicates=update_duplicates)
+        for t_id, arrays_to_store in zip(t_ids, arrays):
+            if t_id is not None:
+                self._insert_trajectory_arrays(t_id, arrays_to_store)
+        return t_ids
+
+    @staticmethod
+    def _pop_trajectory_arrays(task_doc):
+        arrays_to_store = {}
+        traj = task_doc.get("opt_trajectory")
+        if traj:
+            for key in TRAJECTORY_ARRAYS:
+                arrays_to_store["opt_trajectory." + key] = traj.pop(key)
+            for key in list(traj["site_properties"]):
+                arrays_to_store["opt_trajectory.site_properties." + key] = \
+                    traj["site_properties"].pop(key)
+        return arrays_to_store
+
+    def _insert_trajectory_arrays(self, t_id, arrays_to_store):
+        array_fs_ids = {}
+        for field, array in arrays_to_store.items():
+            array_fs_ids[field + "_fs_id"] = self.insert_array(
+                array, collection="opt_trajectory_fs", task_id=t_id)
+        if array_fs_ids:
+            self.collection.update_one({"task_id": t_id}, {"$set": array_fs_ids})
+
+    def get_opt_trajectory(self, task_doc):
+        """
+        Get the optimization trajectory of a task doc, with the arrays stored in
+        gridfs loaded.
+
+        Args:
+            task_doc (dict): the task document
+        Returns:
+            (dict) the compact trajectory, see atomate.qchem.trajectory
+        """
+        traj = dict(task_doc["opt_trajectory"])
+        traj["site_properties"] = dict(traj["site_properties"])
+        for d in [traj, traj["site_properties"]]:
+            for field in [k for k in d if k.endswith("_fs_id")]:
+                d[field[:-len("_fs_id")]] = self.get_array(d.pop(field),
+                                                           collection="opt_trajectory_fs")
+        return traj
+
     def build_indexes(self, indexes=None, background=True):
         """
         Build the indexes.
@@ -3,23 +3,24 @@
 
 import os
 import datetime
+import hashlib
 from fnmatch import fnmatch
 from collections import OrderedDict
 import json
 import glob
 import traceback
 from itertools import chain
-import copy
 
 from monty.io import zopen
 from monty.json import jsanitize
-from pymatgen.core import Molecule
 from pymatgen.io.qchem.outputs import QCOutput, check_for_structure_changes
 from pymatgen.io.qchem.inputs import QCInput
 from pymatgen.apps.borg.hive import AbstractDrone
 from pymatgen.io.babel import BabelMolAdaptor
 from pymatgen.symmetry.analyzer import PointGroupAnalyzer
+import numpy as np
 
+from atomate.qchem.trajectory import get_opt_trajectory
 from atomate.utils.utils import get_logger
 from atomate import __version__ as atomate_version
 
@@ -34,6 +35,75 @@ __credits__ = "Brandon Wood, Shyam Dwaraknath, Xiaohui Qu, Kiran Mathew, Shyue P
 
 logger = get_logger(__name__)
 
+# SMILES and point groups of molecules, by molecule key. Re-ingesting archived
+# runs sees the same molecules over and over (e.g. the optimized molecule of an
+# opt is the initial molecule of the following freq).
+_MOLECULE_ANALYSIS_CACHE = {}
+_MOLECULE_ANALYSIS_CACHE_SIZE = 10000
+
+
+def get_molecule_key(mol, decimals=4, ordered=False):
+    """
+    Key of a molecule that does not depend on its position: the hash of its
+    charge, spin multiplicity and species and centered coordinates, rounded to
+    decimals. Unless ordered, the sites are sorted, so that the key does not
+    depend on their order either.
+
+    Args:
+        mol (Molecule): the molecule
+        decimals (int): number of decimals of the coordinates in A
+        ordered (bool): keep the order of the sites
+
+    Returns:
+        (str) key
+    """
+    coords = mol.cart_coords - mol.cart_coords.mean(axis=0)
+    # + 0.0 turns -0.0 into 0.0
+    sites = [(str(sp), tuple(np.round(c, decimals) + 0.0))
+             for sp, c in zip(mol.species, coords)]
+    if not ordered:
+        sites = sorted(sites)
+    # the charge is an int or a float depending on how the molecule was built
+    raw = repr((float(mol.charge), int(mol.spin_multiplicity), sites)).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()
+
+
+def _get_molecule_analysis(mol, key, func, ordered=False):
+    cache_key = (get_molecule_key(mol, ordered=ordered), key)
+    if cache_key not in _MOLECULE_ANALYSIS_CACHE:
+        if len(_MOLECULE_ANALYSIS_CACHE) >= _MOLECULE_ANALYSIS_CACHE_SIZE:
+            _MOLECULE_ANALYSIS_CACHE.clear()
+        _MOLECULE_ANALYSIS_CACHE[cache_key] = func(mol)
+    return _MOLECULE_ANALYSIS_CACHE[cache_key]
+
+
+def _smiles(mol):
+    return BabelMolAdaptor(mol).pybel_mol.write(str("smi")).split()[0]
+
+
+def _point_group(mol):
+    try:
+        return PointGroupAnalyzer(mol).sch_symbol
+    except ValueError:
+        return "PGA_error"
+
+
+def get_smiles(mol):
+    """
+    SMILES of a molecule, from OpenBabel, memoized by molecule key. The SMILES
+    written by OpenBabel depend on the order of the sites, which is therefore
+    part of the key.
+    """
+    return _get_molecule_analysis(mol, "smiles", _smiles, ordered=True)
+
+
+def get_point_group(mol):
+    """
+    Schoenflies symbol of the point group of a molecule ("PGA_error" if the
+    analysis fails), memoized by molecule key.
+    """
+    return _get_molecule_analysis(mol, "point_group", _point_group)
+
 
 class QChemDrone(AbstractDrone):
     """
@@ -220,26 +290,9 @@ class QChemDrone(AbstractDrone):
                     d["output"]["final_energy"] = d["calcs_reversed"][1][
                         "final_energy"]
 
-            opt_trajectory = []
-            calcs = copy.deepcopy(d["calcs_reversed"])
-            calcs.reverse()
-            for calc in calcs:
-                job_type = calc["input"]["rem"]["job_type"]
-                if job_type == "opt" or job_type == "optimization":
-                    for ii,geom in enumerate(calc["geometries"]):
-                        site_properties = {"Mulliken":calc["Mulliken"][ii]}
-                        if "RESP" in calc:
-                            site_properties["RESP"] = calc["RESP"][ii]
-                        mol = Molecule(
-                            species=calc["species"],
-                            coords=geom,
-                            charge=calc["charge"],
-                            spin_multiplicity=calc["multiplicity"],
-                            site_properties=site_properties)
-                        traj_entry = {"molecule":mol}
-                        traj_entry["energy"] = calc["energy_trajectory"][ii]
-                        opt_trajectory.append(traj_entry)
-            if opt_trajectory != []:
+            # compact trajectory of the optimizations, in chronological order
+            opt_trajectory = get_opt_trajectory(d["calcs_reversed"][::-1])
+            if opt_trajectory:
                 d["opt_trajectory"] = opt_trajectory
 
             if "final_energy" not in d["output"]:
@@ -270,15 +323,9 @@ class QChemDrone(AbstractDrone):
             if d_calc_final["point_group"] != None:
                 d["pointgroup"] = d_calc_final["point_group"]
             else:
-                try:
-                    d["pointgroup"] = PointGroupAnalyzer(d["output"]["initial_molecule"]).sch_symbol
-                except ValueError:
-                    d["pointgroup"] = "PGA_error"
+                d["pointgroup"] = get_point_group(d["output"]["initial_molecule"])
 
-            bb = BabelMolAdaptor(d["output"]["initial_molecule"])
-            pbmol = bb.pybel_mol
-            smiles = pbmol.write(str("smi")).split()[0]
-            d["smiles"] = smiles
+            d["smiles"] = get_smiles(d["output"]["initial_molecule"])
 
             d["state"] = "successful" if d_calc_final["completion"] else "unsuccessful"
             if "special_run_type" in d:
@@ -382,6 +429,25 @@ class QChemDrone(AbstractDrone):
             if diff:
                 logger.warning("The keys {0} in {1} not set".format(diff, k))
 
-    @staticmethod
-    def get_valid_paths(self, path):
-        return [path]
+    def get_valid_paths(self, path, output_file="mol.qout"):
+        """
+        The directories holding a QChem run.
+
+        Args:
+            path: path to a run directory, or a (parent, subdirs, files) tuple
+                from os.walk, as passed by BorgQueen
+            output_file (str): base name of the output file(s)
+
+        Returns:
+            ([str]) parent if it holds QChem outputs (directly or in subfolders
+                named after self.runs), else []
+        """
+        if isinstance(path, str):
+            return [path]
+        (parent, subdirs, files) = path
+        if any(parent.endswith(os.sep + r) for r in self.runs):
+            return []
+        if set(self.runs).intersection(subdirs) or \
+                any(fnmatch(f, "{}*".format(output_file)) for f in files):
+            return [parent]
+        return []
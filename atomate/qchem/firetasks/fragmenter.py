@@ -4,6 +4,10 @@
 # This module defines a task that returns all fragments of a molecule
 
 import copy
+from collections import defaultdict
+
+from networkx.algorithms.graph_hashing import weisfeiler_lehman_graph_hash
+
 from pymatgen.core.structure import Molecule
 from pymatgen.analysis.graphs import MoleculeGraph
 from pymatgen.analysis.local_env import OpenBabelNN
@@ -22,6 +26,21 @@ __date__ = "6/13/18"
 __credits__ = "John Dagdelen, Shyam Dwaraknath, Evan Spotte-Smith"
 
 
+def get_graph_hash(mol_graph):
+    """
+    Weisfeiler-Lehman hash of the bonding graph of a MoleculeGraph, with the
+    species as node labels. Isomorphic molecule graphs always have the same
+    hash, so only graphs with equal hashes need a full isomorphism check.
+
+    Args:
+        mol_graph (MoleculeGraph): molecule graph
+
+    Returns:
+        (str) hash
+    """
+    return weisfeiler_lehman_graph_hash(mol_graph.graph.to_undirected(), node_attr="specie")
+
+
 @explicit_serialize
 class FragmentMolecule(FiretaskBase):
     """
@@ -205,20 +224,36 @@ class FragmentMolecule(FiretaskBase):
         if len(self.all_relevant_docs) == 0:
             return False
 
-        # otherwise, look through the docs for an entry with an isomorphic molecule with
-        # equivalent charge and multiplicity
+        # otherwise, look through the docs with the same formula, charge, multiplicity and
+        # graph hash for an entry with an isomorphic molecule
         else:
             new_mol_graph = MoleculeGraph.with_local_env_strategy(molecule, OpenBabelNN())
-            for doc in self.all_relevant_docs:
-                if molecule.composition.reduced_formula == doc["formula_pretty"]:
-                    old_mol = Molecule.from_dict(doc["input"]["initial_molecule"])
-                    old_mol_graph = MoleculeGraph.with_local_env_strategy(old_mol, OpenBabelNN())
-                    # If such an equivalent molecule is found, return true
-                    if new_mol_graph.isomorphic_to(old_mol_graph) and molecule.charge == old_mol_graph.molecule.charge and molecule.spin_multiplicity == old_mol_graph.molecule.spin_multiplicity:
-                        return True
+            key = (molecule.composition.reduced_formula, molecule.charge,
+                   molecule.spin_multiplicity, get_graph_hash(new_mol_graph))
+            for old_mol_graph in self._get_db_graph_index().get(key, []):
+                # If such an equivalent molecule is found, return true
+                if new_mol_graph.isomorphic_to(old_mol_graph):
+                    return True
             # Otherwise, return false
             return False
 
+    def _get_db_graph_index(self):
+        """
+        Molecule graphs of self.all_relevant_docs, keyed by formula, charge, multiplicity and
+        graph hash. The graphs are built once and reused for all fragments, and rebuilt only
+        if self.all_relevant_docs is replaced.
+        """
+        if getattr(self, "_indexed_docs", None) is not self.all_relevant_docs:
+            self._db_graph_index = defaultdict(list)
+            for doc in self.all_relevant_docs:
+                old_mol = Molecule.from_dict(doc["input"]["initial_molecule"])
+                old_mol_graph = MoleculeGraph.with_local_env_strategy(old_mol, OpenBabelNN())
+                key = (doc["formula_pretty"], old_mol.charge, old_mol.spin_multiplicity,
+                       get_graph_hash(old_mol_graph))
+                self._db_graph_index[key].append(old_mol_graph)
+            self._indexed_docs = self.all_relevant_docs
+        return self._db_graph_index
+
     def _build_new_FWs(self):
         """
         Build the list of new fireworks: a FrequencyFlatteningOptimizeFW for each unique fragment
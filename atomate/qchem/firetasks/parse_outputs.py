@@ -45,10 +45,13 @@ class QChemToDb(FiretaskBase):
             of this key in the fw_spec.
         multirun (bool): Whether the job to parse includes multiple
             calculations in one input / output pair.
+        binary_arrays (bool): store the arrays of the optimization trajectory as
+            compressed binary arrays in GridFS rather than in the task doc.
     """
     optional_params = [
         "calc_dir", "calc_loc", "input_file", "output_file",
-        "additional_fields", "db_file", "fw_spec_field", "multirun"
+        "additional_fields", "db_file", "fw_spec_field", "multirun",
+        "binary_arrays"
     ]
 
     def run_task(self, fw_spec):
@@ -103,7 +106,7 @@ class QChemToDb(FiretaskBase):
                 f.write(json.dumps(task_doc, default=DATETIME_HANDLER))
         else:
             mmdb = QChemCalcDb.from_db_file(db_file, admin=True)
-            t_id = mmdb.insert(task_doc)
+            t_id = mmdb.insert_task(task_doc, binary_arrays=self.get("binary_arrays", False))
             logger.info("Finished parsing with task_id: {}".format(t_id))
 
         return FWAction(
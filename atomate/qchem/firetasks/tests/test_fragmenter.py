@@ -12,9 +12,10 @@ except ImportError:
 
 from pymatgen.core.structure import Molecule
 from pymatgen.analysis.graphs import MoleculeGraph
+from pymatgen.analysis.local_env import OpenBabelNN
 from pymatgen.io.qchem.outputs import QCOutput
 
-from atomate.qchem.firetasks.fragmenter import FragmentMolecule
+from atomate.qchem.firetasks.fragmenter import FragmentMolecule, get_graph_hash
 from atomate.qchem.firetasks.parse_outputs import QChemToDb
 from atomate.qchem.database import QChemCalcDb
 from atomate.utils.testing import AtomateTest
@@ -291,6 +292,15 @@ class TestFragmentMolecule(AtomateTest):
         new_FWs = ft._build_new_FWs()
         self.assertEqual(len(new_FWs), 29)
 
+    def test_graph_hash(self):
+        pc_graph = MoleculeGraph.with_local_env_strategy(self.pc, OpenBabelNN())
+        permuted = Molecule.from_sites(list(reversed(self.pc.sites)))
+        permuted_graph = MoleculeGraph.with_local_env_strategy(permuted, OpenBabelNN())
+        self.assertTrue(pc_graph.isomorphic_to(permuted_graph))
+        self.assertEqual(get_graph_hash(pc_graph), get_graph_hash(permuted_graph))
+        frag_graph = MoleculeGraph.with_local_env_strategy(self.pc_frag1, OpenBabelNN())
+        self.assertNotEqual(get_graph_hash(pc_graph), get_graph_hash(frag_graph))
+
     def test_in_database_and_EC_neg_frag(self):
         db_file = os.path.join(db_dir, "db.json")
         mmdb = QChemCalcDb.from_db_file(db_file, admin=True)
@@ -0,0 +1,153 @@
+# coding: utf-8
+
+
+"""
+This module defines the bulk ingestion of QChem runs, e.g. to (re-)ingest
+archived calculations: the run directories are found with
+QChemDrone.get_valid_paths, parsed in a process pool and inserted into the
+database in batches.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from atomate.qchem.database import QChemCalcDb
+from atomate.qchem.drones import QChemDrone
+from atomate.utils.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def find_qchem_dirs(root_dirs, drone=None, output_file="mol.qout"):
+    """
+    Find the QChem run directories under the given directories.
+
+    Args:
+        root_dirs (str or [str]): directories to walk
+        drone (QChemDrone): drone whose get_valid_paths selects the runs
+        output_file (str): base name of the output file(s)
+
+    Returns:
+        ([str]) run directories, sorted
+    """
+    drone = drone or QChemDrone()
+    root_dirs = [root_dirs] if isinstance(root_dirs, str) else root_dirs
+    paths = []
+    for root_dir in root_dirs:
+        for parent, subdirs, files in os.walk(root_dir):
+            paths.extend(drone.get_valid_paths((parent, subdirs, files),
+                                               output_file=output_file))
+    return sorted(set(paths))
+
+
+def _assimilate(args):
+    """
+    Parse a QChem run, in a worker process. Failures are logged and skipped.
+    """
+    drone, path, input_file, output_file, multirun = args
+    try:
+        return drone.assimilate(path=path, input_file=input_file,
+                                output_file=output_file, multirun=multirun)
+    except Exception as e:
+        logger.error("Failed to parse {}: {}".format(path, e))
+        return None
+
+
+def parse_qchem_dirs(paths, drone=None, input_file="mol.qin", output_file="mol.qout",
+                     multirun=False, nprocs=1, chunksize=4):
+    """
+    Parse QChem runs, optionally in a process pool. Each worker process
+    memoizes the SMILES and point groups of the molecules it sees.
+
+    Args:
+        paths ([str]): run directories
+        drone (QChemDrone): the drone. Must be picklable if nprocs != 1.
+        input_file (str): base name of the input file(s)
+        output_file (str): base name of the output file(s)
+        multirun (bool): whether the runs include multiple calculations in one
+            input / output pair
+        nprocs (int): number of processes. None uses all available cores.
+        chunksize (int): number of runs sent to a worker at a time
+
+    Returns:
+        iterator over the task docs (None for the runs that failed to
+            parse), in the order of the paths
+    """
+    drone = drone or QChemDrone()
+    jobs = [(drone, path, input_file, output_file, multirun) for path in paths]
+    if nprocs == 1:
+        for job in jobs:
+            yield _assimilate(job)
+    else:
+        with ProcessPoolExecutor(max_workers=nprocs) as executor:
+            for doc in executor.map(_assimilate, jobs, chunksize=chunksize):
+                yield doc
+
+
+def ingest_qchem_dirs(db_file, root_dirs, additional_fields=None, input_file="mol.qin",
+                      output_file="mol.qout", multirun=False, nprocs=1, batch_size=100,
+                      skip_existing=True, binary_arrays=False):
+    """
+    Find, parse and insert into the database all the QChem runs under the
+    given directories.
+
+    Args:
+        db_file (str): path to the file containing the database credentials
+        root_dirs (str or [str]): directories to walk
+        additional_fields (dict): fields added to all the task docs
+        input_file (str): base name of the input file(s)
+        output_file (str): base name of the output file(s)
+        multirun (bool): whether the runs include multiple calculations in one
+            input / output pair
+        nprocs (int): number of parsing processes. None uses all available cores.
+        batch_size (int): number of task docs inserted at a time
+        skip_existing (bool): skip the runs whose dir_name is already in the
+            database. Otherwise their documents are updated.
+        binary_arrays (bool): store the optimization trajectories in GridFS,
+            see QChemCalcDb.insert_task
+
+    Returns:
+        (int, float) number of runs inserted and throughput in runs/s
+    """
+    t0 = time.time()
+    mmdb = QChemCalcDb.from_db_file(db_file, admin=True)
+    drone = QChemDrone(additional_fields=additional_fields)
+    paths = find_qchem_dirs(root_dirs, drone=drone, output_file=output_file)
+    if skip_existing:
+        # one query per batch, as the dir_names of a large collection may not
+        # fit in the result of a distinct
+        new_paths = []
+        for i in range(0, len(paths), batch_size):
+            batch = [os.path.abspath(p) for p in paths[i:i + batch_size]]
+            existing = {d["dir_name"] for d in mmdb.collection.find(
+                {"dir_name": {"$in": batch}}, {"dir_name": 1})}
+            new_paths.extend(p for p in batch if p not in existing)
+        paths = new_paths
+    logger.info("Found {} QChem runs to ingest".format(len(paths)))
+
+    n_inserted, n_failed = 0, 0
+    batch = []
+
+    def flush():
+        nonlocal n_inserted
+        mmdb.insert_tasks(batch, binary_arrays=binary_arrays)
+        n_inserted += len(batch)
+        logger.info("Inserted {} QChem runs ({:.1f} outputs/s)".format(
+            n_inserted, n_inserted / max(time.time() - t0, 1e-9)))
+        del batch[:]
+
+    for doc in parse_qchem_dirs(paths, drone=drone, input_file=input_file,
+                                output_file=output_file, multirun=multirun, nprocs=nprocs):
+        if doc is None:
+            n_failed += 1
+            continue
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    rate = n_inserted / max(time.time() - t0, 1e-9)
+    logger.info("Ingested {} QChem runs ({} failed) in {:.1f} s ({:.1f} outputs/s)".format(
+        n_inserted, n_failed, time.time() - t0, rate))
+    return n_inserted, rate
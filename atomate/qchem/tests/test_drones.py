@@ -5,7 +5,9 @@
 
 import os
 import unittest
-from atomate.qchem.drones import QChemDrone
+from atomate.qchem.drones import QChemDrone, get_molecule_key, get_smiles, _smiles
+from atomate.qchem.ingestion import find_qchem_dirs, parse_qchem_dirs
+from atomate.qchem.trajectory import get_trajectory_molecules
 from pymatgen.core.structure import Molecule
 import numpy as np
 from pymatgen.analysis.local_env import OpenBabelNN
@@ -331,8 +333,14 @@ class QChemDroneTest(unittest.TestCase):
             input_file="mol.qin",
             output_file="mol.qout",
             multirun=False)
-        self.assertEqual(doc["opt_trajectory"][0]["energy"],-784.934084124)
-        self.assertEqual(doc["opt_trajectory"][-1]["energy"],-784.934280182)
+        self.assertEqual(doc["opt_trajectory"]["energies"][0],-784.934084124)
+        self.assertEqual(doc["opt_trajectory"]["energies"][-1],-784.934280182)
+        self.assertEqual(doc["opt_trajectory"]["n_steps"], sum(doc["opt_trajectory"]["calc_steps"]))
+        mols = get_trajectory_molecules(doc["opt_trajectory"], steps=[0, -1])
+        self.assertEqual(len(mols), 2)
+        self.assertEqual(mols[-1].species,
+                         Molecule.from_dict(doc["output"]["optimized_molecule"]).species)
+        self.assertEqual(len(mols[0].site_properties["Mulliken"]), len(mols[0]))
         self.assertEqual(doc["warnings"], {'missing_analytical_derivates': True, 'mkl': True, 'hessian_local_structure': True, 'internal_coordinates': True, 'diagonalizing_BBt': True, 'eigenvalue_magnitude': True, 'positive_definiteness_endangered': True, 'energy_increased': True})
 
     def test_custom_smd(self):
@@ -344,6 +352,39 @@ class QChemDroneTest(unittest.TestCase):
             multirun=False)
         self.assertEqual(doc["custom_smd"],"18.5,1.415,0.00,0.735,20.2,0.00,0.00")
 
+    def test_molecule_key(self):
+        mol = Molecule(["C", "O", "H"], [[0, 0, 0], [0, 0, 1.2], [0, 0.9, -0.5]])
+        moved = Molecule(["H", "C", "O"], [[1, 0.9, -0.5], [1, 0, 0], [1, 0, 1.2]])
+        self.assertEqual(get_molecule_key(mol), get_molecule_key(moved))
+        mol.set_charge_and_spin(-1)
+        self.assertNotEqual(get_molecule_key(mol), get_molecule_key(moved))
+        self.assertEqual(get_smiles(moved), get_smiles(moved.copy()))
+
+    def test_smiles_site_order(self):
+        mol = Molecule(["C", "C", "O", "H", "H", "H", "H", "H", "H"],
+                       [[-0.75, 0.0, 0.0], [0.75, 0.0, 0.0], [1.2, 1.35, 0.0],
+                        [-1.15, 1.0, 0.0], [-1.15, -0.5, 0.87], [-1.15, -0.5, -0.87],
+                        [1.15, -0.5, 0.87], [1.15, -0.5, -0.87], [2.15, 1.35, 0.0]])
+        permuted = Molecule.from_sites([mol[i] for i in [8, 2, 7, 1, 6, 5, 0, 4, 3]])
+        self.assertEqual(get_molecule_key(mol), get_molecule_key(permuted))
+        self.assertNotEqual(get_molecule_key(mol, ordered=True),
+                            get_molecule_key(permuted, ordered=True))
+        # the SMILES of the permuted molecule are not those of the molecule seen first
+        get_smiles(mol)
+        self.assertEqual(get_smiles(permuted), _smiles(permuted))
+
+    def test_find_and_parse_dirs(self):
+        test_files = os.path.join(module_dir, "..", "test_files")
+        paths = find_qchem_dirs(test_files)
+        self.assertIn(os.path.join(test_files, "LiH4C2SO4"), paths)
+        self.assertIn(os.path.join(test_files, "custom_smd"), paths)
+        self.assertNotIn(os.path.join(test_files, "FF_working"), paths)
+        ff_dir = os.path.join(test_files, "FF_working")
+        self.assertIn(ff_dir, find_qchem_dirs(test_files, output_file="test.qout"))
+        docs = list(parse_qchem_dirs([ff_dir], input_file="test.qin", output_file="test.qout"))
+        self.assertEqual(docs[0]["dir_name"], os.path.abspath(ff_dir))
+        self.assertEqual(docs[0]["input"]["job_type"], "opt")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,79 @@
+# coding: utf-8
+
+import os
+import unittest
+
+import numpy as np
+
+from atomate.qchem.database import QChemCalcDb
+from atomate.qchem.trajectory import get_opt_trajectory, get_trajectory_molecules
+from atomate.utils.testing import AtomateTest
+
+module_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+db_dir = os.path.join(module_dir, "..", "..", "common", "test_files")
+
+
+def get_opt_calc(n_steps, resp=True, shift=0.0):
+    species = ["O", "H", "H"]
+    coords = np.array([[0, 0, 0], [0.96, 0, 0], [-0.24, 0.93, 0]]) + shift
+    calc = {"input": {"rem": {"job_type": "opt"}}, "species": species, "charge": 0,
+            "multiplicity": 1,
+            "geometries": [(coords * (1 + 0.01 * i)).tolist() for i in range(n_steps)],
+            "energy_trajectory": [-76.0 - 0.001 * i for i in range(n_steps)],
+            "Mulliken": [[-0.8 + 0.01 * i, 0.4, 0.4 - 0.01 * i] for i in range(n_steps)]}
+    if resp:
+        calc["RESP"] = [[-0.7, 0.35 + 0.01 * i, 0.35 - 0.01 * i] for i in range(n_steps)]
+    return calc
+
+
+class TrajectoryTest(unittest.TestCase):
+
+    def test_missing_resp(self):
+        calcs = [get_opt_calc(3), get_opt_calc(2, resp=False, shift=0.1)]
+        traj = get_opt_trajectory(calcs)
+        self.assertEqual(traj["calc_steps"], [3, 2])
+        resp = np.array(traj["site_properties"]["RESP"])
+        self.assertEqual(resp.shape, (5, 3))
+        # the RESP charges of the first optimization are kept
+        self.assertTrue(np.allclose(resp[:3], calcs[0]["RESP"]))
+        self.assertTrue(np.isnan(resp[3:]).all())
+
+        mols = get_trajectory_molecules(traj)
+        self.assertEqual(mols[0].site_properties["RESP"], calcs[0]["RESP"][0])
+        self.assertNotIn("RESP", mols[-1].site_properties)
+        self.assertEqual(mols[-1].site_properties["Mulliken"], calcs[1]["Mulliken"][-1])
+
+
+class QChemCalcDbTest(AtomateTest):
+
+    def setUp(self):
+        super(QChemCalcDbTest, self).setUp(lpad=False)
+        self.mmdb = QChemCalcDb.from_db_file(os.path.join(db_dir, "db.json"))
+        self.mmdb.reset()
+
+    def tearDown(self):
+        self.mmdb.reset()
+        super(QChemCalcDbTest, self).tearDown()
+
+    def test_binary_arrays(self):
+        traj = get_opt_trajectory([get_opt_calc(3), get_opt_calc(2, resp=False)])
+        task_doc = {"dir_name": "host:/path/to/calc", "opt_trajectory": dict(
+            traj, site_properties=dict(traj["site_properties"]))}
+        t_id = self.mmdb.insert_task(task_doc, binary_arrays=True)
+
+        doc = self.mmdb.collection.find_one({"task_id": t_id})
+        self.assertNotIn("coordinates", doc["opt_trajectory"])
+        self.assertIn("coordinates_fs_id", doc["opt_trajectory"])
+        self.assertEqual(set(doc["opt_trajectory"]["site_properties"]),
+                         {"Mulliken_fs_id", "RESP_fs_id"})
+
+        loaded = self.mmdb.get_opt_trajectory(doc)
+        self.assertTrue(np.allclose(loaded["coordinates"], traj["coordinates"]))
+        for k, v in traj["site_properties"].items():
+            self.assertTrue(np.allclose(loaded["site_properties"][k], v, equal_nan=True))
+        self.assertEqual([m.site_properties for m in get_trajectory_molecules(loaded)],
+                         [m.site_properties for m in get_trajectory_molecules(traj)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+# coding: utf-8
+
+
+"""
+This module defines the compact representation of the optimization
+trajectories of QChem task docs.
+
+Rather than a full Molecule (with its site properties) per geometry, which
+is slow to build and serialize and bloats the task docs of long
+optimizations and frequency flattening loops, the trajectory holds the
+species once and the coordinates, site properties and energies of all the
+steps as stacked arrays:
+
+    {"species": ["C", "H", ...], "charge": 0, "spin_multiplicity": 1,
+     "n_steps": 42, "calc_steps": [30, 12], "energies": [...],
+     "coordinates": [[[x, y, z], ...], ...],
+     "site_properties": {"Mulliken": [...], "RESP": [...]}}
+
+where calc_steps is the number of steps of each optimization. The site
+properties of the steps of the optimizations that lack them (e.g. RESP
+charges, which are optional) are NaN. Use get_trajectory_molecules to
+reconstruct the Molecules on demand.
+QChemCalcDb.insert_task can store the arrays in GridFS.
+"""
+
+import numpy as np
+from pymatgen.core import Molecule
+
+# per step arrays of the trajectory, besides the site properties
+TRAJECTORY_ARRAYS = ("coordinates",)
+
+
+def get_opt_trajectory(calcs):
+    """
+    Compact optimization trajectory of a QChem run.
+
+    Args:
+        calcs ([dict]): the parsed calculations, in chronological order (i.e.
+            reversed calcs_reversed). They are not modified.
+
+    Returns:
+        (dict) compact trajectory, or None if there is no optimization
+    """
+    opt_calcs = [calc for calc in calcs
+                 if calc["input"]["rem"]["job_type"] in ["opt", "optimization"]
+                 and calc.get("geometries")]
+    if not opt_calcs:
+        return None
+    species = opt_calcs[0]["species"]
+    for calc in opt_calcs[1:]:
+        if calc["species"] != species:
+            raise ValueError("The species of the optimizations of a trajectory differ")
+
+    # the site properties missing from some optimizations are NaN at their steps
+    prop_keys = [k for k in ["Mulliken", "RESP"] if any(k in c for c in opt_calcs)]
+    missing = {k: np.full_like(np.asarray(next(c[k][0] for c in opt_calcs if k in c),
+                                          dtype=float), np.nan)
+               for k in prop_keys}
+    coords, energies, calc_steps = [], [], []
+    props = {k: [] for k in prop_keys}
+    for calc in opt_calcs:
+        n_steps = len(calc["geometries"])
+        calc_steps.append(n_steps)
+        coords.extend(calc["geometries"])
+        energies.extend(calc["energy_trajectory"][:n_steps])
+        for k in prop_keys:
+            props[k].extend(calc[k][:n_steps] if k in calc else [missing[k]] * n_steps)
+
+    return {
+        "species": species,
+        "charge": opt_calcs[0]["charge"],
+        "spin_multiplicity": opt_calcs[0]["multiplicity"],
+        "n_steps": len(coords),
+        "calc_steps": calc_steps,
+        "energies": energies,
+        "coordinates": np.array(coords, dtype=float).tolist(),
+        "site_properties": {k: np.array(v, dtype=float).tolist() for k, v in props.items()},
+    }
+
+
+def get_trajectory_molecules(opt_trajectory, steps=None):
+    """
+    Reconstruct the Molecules of a compact optimization trajectory.
+
+    Args:
+        opt_trajectory (dict): compact trajectory, with the arrays inline
+            (e.g. from the task doc) or loaded from GridFS (see
+            QChemCalcDb.get_opt_trajectory)
+        steps ([int]): indices of the steps. Defaults to all the steps.
+
+    Returns:
+        ([Molecule]) molecules, with the site properties available at their step
+    """
+    coords = np.asarray(opt_trajectory["coordinates"])
+    props = {k: np.asarray(v) for k, v in opt_trajectory["site_properties"].items()}
+    steps = range(opt_trajectory["n_steps"]) if steps is None else steps
+    return [Molecule(opt_trajectory["species"], coords[i],
+                     charge=opt_trajectory["charge"],
+                     spin_multiplicity=opt_trajectory["spin_multiplicity"],
+                     site_properties={k: v[i].tolist() for k, v in props.items()
+                                      if not np.isnan(v[i]).all()})
+            for i in steps]
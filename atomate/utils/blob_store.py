@@ -0,0 +1,199 @@
+# coding: utf-8
+
+
+"""
+This module defines a simple blob store for large fw_spec payloads (e.g. the
+normal modes of the Raman workflow or the deformation data of the elastic
+workflow). Rather than passing such data to the children through the
+fw_spec, where the LaunchPad stores and reserializes it for every child
+launch, firetasks store it once, in GridFS or in a local (shared) directory,
+and pass a small handle:
+
+    {"@blob": "5f3c...", "store": "gridfs", "db_file": ">>db_file<<",
+     "collection": "blobs", "nbytes": 1234567}
+
+Consumers call resolve_blobs on the part of the fw_spec they use, which
+transparently replaces the handles with the data and leaves anything else
+as is, so tasks work the same with and without the blob store.
+
+Structures can also be interned (see intern_structure): they are stored
+content addressed, so the identical structures of the Fireworks of a
+workflow (or of several workflows) are stored only once, and the firetask
+params only hold the handles.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import uuid
+import zlib
+
+import gridfs
+from bson import ObjectId
+from monty.json import MontyDecoder, MontyEncoder
+
+from atomate.utils.utils import env_chk, get_database, get_logger
+
+logger = get_logger(__name__)
+
+BLOB_KEY = "@blob"
+BLOB_COLLECTION = "blobs"
+# values smaller than this (in bytes, serialized) are passed inline
+DEFAULT_MIN_SIZE = 10000
+
+
+def is_blob_handle(obj):
+    """
+    Whether obj is a blob handle.
+    """
+    return isinstance(obj, dict) and BLOB_KEY in obj
+
+
+def _serialize(data):
+    return json.dumps(data, cls=MontyEncoder).encode("utf-8")
+
+
+def put_blob(data, db_file=None, blob_dir=None, collection=BLOB_COLLECTION,
+             fw_spec=None, blob_id=None):
+    """
+    Store data in the blob store and get a handle to it.
+
+    Args:
+        data: any MSONable or JSON serializable data
+        db_file (str): path to the db file. The data is stored in the GridFS
+            collection of the database. Supports env_chk; the unresolved
+            value is kept in the handle, so that it is resolved on the
+            worker of the consumer.
+        blob_dir (str): directory in which to store the data if no db_file
+            is given. Must be shared by the workers. Supports env_chk.
+        collection (str): GridFS collection name
+        fw_spec (dict): fw_spec, for env_chk
+        blob_id (str): id of the blob, e.g. a hash of the data for content
+            addressed storage. If a blob with this id already exists, it is
+            not stored again. Defaults to a new unique id.
+
+    Returns:
+        (dict) blob handle
+    """
+    raw = _serialize(data)
+    db_path = env_chk(db_file, fw_spec or {}) if db_file else None
+    if db_path:
+        fs = gridfs.GridFS(get_database(db_path, admin=True), collection)
+        if blob_id is None:
+            blob_id = str(fs.put(zlib.compress(raw), metadata={"compression": "zlib"}))
+        elif not fs.exists(blob_id):
+            fs.put(zlib.compress(raw), _id=blob_id, metadata={"compression": "zlib"})
+        return {BLOB_KEY: blob_id, "store": "gridfs", "db_file": db_file,
+                "collection": collection, "nbytes": len(raw)}
+
+    blob_dir = env_chk(blob_dir, fw_spec or {}) if blob_dir else None
+    if not blob_dir:
+        raise ValueError("Either db_file or blob_dir must be set to use the blob store")
+    blob_dir = os.path.abspath(blob_dir)
+    os.makedirs(blob_dir, exist_ok=True)
+    blob_id = blob_id or uuid.uuid4().hex
+    path = os.path.join(blob_dir, blob_id + ".json.gz")
+    if not os.path.exists(path):
+        tmp_path = "{}.{}.tmp".format(path, uuid.uuid4().hex)
+        with gzip.open(tmp_path, "wb") as f:
+            f.write(raw)
+        os.replace(tmp_path, path)
+    return {BLOB_KEY: blob_id, "store": "local", "path": path, "nbytes": len(raw)}
+
+
+def get_blob(handle, fw_spec=None, _dbs=None):
+    """
+    Load the data of a blob handle.
+
+    Args:
+        handle (dict): blob handle
+        fw_spec (dict): fw_spec, for env_chk of the db_file of the handle
+
+    Returns:
+        the data, with MSONable objects deserialized
+    """
+    if handle["store"] == "gridfs":
+        db_path = env_chk(handle["db_file"], fw_spec or {})
+        dbs = {} if _dbs is None else _dbs
+        if db_path not in dbs:
+            dbs[db_path] = get_database(db_path, admin=True)
+        fs_id = handle[BLOB_KEY]
+        if ObjectId.is_valid(fs_id):
+            fs_id = ObjectId(fs_id)
+        f = gridfs.GridFS(dbs[db_path], handle["collection"]).get(fs_id)
+        raw = f.read()
+        if (f.metadata or {}).get("compression") == "zlib":
+            raw = zlib.decompress(raw)
+    elif handle["store"] == "local":
+        with gzip.open(handle["path"], "rb") as f:
+            raw = f.read()
+    else:
+        raise ValueError("Unknown blob store: {}".format(handle["store"]))
+    return json.loads(raw.decode("utf-8"), cls=MontyDecoder)
+
+
+def offload_large_values(d, min_size=DEFAULT_MIN_SIZE, **kwargs):
+    """
+    Replace the values of a dict whose serialized size exceeds min_size with
+    blob handles.
+
+    Args:
+        d (dict): dict, e.g. the pass_dict of PassResult
+        min_size (int): minimum size in bytes of the offloaded values
+        kwargs: passed to put_blob (db_file, blob_dir, collection, fw_spec)
+
+    Returns:
+        (dict) copy of d with the large values offloaded
+    """
+    new_d = {}
+    for k, v in d.items():
+        if not is_blob_handle(v) and len(_serialize(v)) >= min_size:
+            v = put_blob(v, **kwargs)
+            logger.info("Stored {} ({} bytes) in the blob store".format(k, v["nbytes"]))
+        new_d[k] = v
+    return new_d
+
+
+def resolve_blobs(obj, fw_spec=None):
+    """
+    Recursively replace the blob handles in obj by their data. Anything
+    else is returned as is.
+
+    Args:
+        obj: dict, list or any value, e.g. a part of the fw_spec
+        fw_spec (dict): fw_spec, for env_chk of the db_file of the handles
+
+    Returns:
+        obj with the handles resolved
+    """
+    dbs = {}
+
+    def _resolve(o):
+        if is_blob_handle(o):
+            return get_blob(o, fw_spec, _dbs=dbs)
+        if isinstance(o, dict):
+            return {k: _resolve(v) for k, v in o.items()}
+        if isinstance(o, (list, tuple)):
+            return type(o)(_resolve(v) for v in o)
+        return o
+
+    return _resolve(obj)
+
+
+def intern_structure(structure, **kwargs):
+    """
+    Store a structure in the blob store, content addressed: the blob id is
+    the hash of the serialized structure, so identical structures are
+    stored only once.
+
+    Args:
+        structure (Structure or dict): structure, or its as_dict()
+        kwargs: passed to put_blob (db_file, blob_dir, collection, fw_spec)
+
+    Returns:
+        (dict) blob handle
+    """
+    d = structure if isinstance(structure, dict) else structure.as_dict()
+    raw = json.dumps(d, sort_keys=True, cls=MontyEncoder).encode("utf-8")
+    return put_blob(d, blob_id=hashlib.sha1(raw).hexdigest(), **kwargs)
@@ -6,13 +6,15 @@ This module defines a base class for derived database classes that store calcula
 """
 
 import datetime
+import zlib
 from abc import ABCMeta, abstractmethod
 
-from maggma.stores import MongoStore
-from maggma.stores import S3Store, MongoURIStore
+import gridfs
+import numpy as np
+from bson import Binary
 from monty.json import jsanitize
 from monty.serialization import loadfn
-from pymongo import MongoClient, ReturnDocument
+from pymongo import MongoClient, ReturnDocument, UpdateOne
 from pymongo.uri_parser import parse_uri
 
 from atomate.utils.utils import get_logger
@@ -24,6 +26,40 @@ __email__ = "kmathew@lbl.gov"
 logger = get_logger(__name__)
 
 
+def encode_array(array):
+    """
+    Encode a numerical array as a compact document (zlib compressed raw
+    bytes), to be stored inline in a task document. Use decode_array to read
+    it back.
+
+    Args:
+        array (array-like): the array
+
+    Returns:
+        (dict) with the dtype, shape and compressed data of the array
+    """
+    array = np.ascontiguousarray(array)
+    return {"@array": "zlib", "dtype": array.dtype.str, "shape": list(array.shape),
+            "data": Binary(zlib.compress(array.tobytes()))}
+
+
+def decode_array(d):
+    """
+    Decode an array encoded with encode_array. Plain (nested) lists are
+    also accepted.
+
+    Args:
+        d (dict or list): the encoded array
+
+    Returns:
+        numpy array
+    """
+    if isinstance(d, dict) and "@array" in d:
+        data = zlib.decompress(d["data"])
+        return np.frombuffer(data, dtype=d["dtype"]).reshape(d["shape"])
+    return np.array(d)
+
+
 class CalcDb(metaclass=ABCMeta):
     def __init__(
         self,
@@ -173,6 +209,90 @@ class CalcDb(metaclass=ABCMeta):
             logger.info("Skipping duplicate {}".format(d["dir_name"]))
             return None
 
+    def insert_many(self, docs, update_duplicates=True):
+        """
+        Insert several task documents in a single bulk write. Equivalent to
+        calling insert on each document, but with one query for the duplicates
+        and one update of the task_id counter per batch.
+
+        Args:
+            docs ([dict]): task documents
+            update_duplicates (bool): whether to update the duplicates
+
+        Returns:
+            ([int]) task_ids of the documents, None for the skipped duplicates
+        """
+        existing = {
+            r["dir_name"]: r["task_id"]
+            for r in self.collection.find(
+                {"dir_name": {"$in": [d["dir_name"] for d in docs]}}, ["dir_name", "task_id"]
+            )
+        }
+        new_docs = [d for d in docs if d["dir_name"] not in existing and not d.get("task_id")]
+        if new_docs:
+            last_id = self.db.counter.find_one_and_update(
+                {"_id": "taskid"},
+                {"$inc": {"c": len(new_docs)}},
+                return_document=ReturnDocument.AFTER,
+            )["c"]
+            for i, d in enumerate(new_docs):
+                d["task_id"] = last_id - len(new_docs) + 1 + i
+
+        task_ids, requests = [], []
+        now = datetime.datetime.utcnow()
+        for d in docs:
+            if d["dir_name"] in existing:
+                if not update_duplicates:
+                    logger.info("Skipping duplicate {}".format(d["dir_name"]))
+                    task_ids.append(None)
+                    continue
+                d["task_id"] = existing[d["dir_name"]]
+            d["last_updated"] = now
+            d = jsanitize(d, allow_bson=True)
+            requests.append(UpdateOne({"dir_name": d["dir_name"]}, {"$set": d}, upsert=True))
+            task_ids.append(d["task_id"])
+        if requests:
+            self.collection.bulk_write(requests, ordered=False)
+        logger.info("Inserted {} documents".format(len(requests)))
+        return task_ids
+
+    def insert_array(self, array, collection="fs", task_id=None):
+        """
+        Insert a numerical array into GridFS as zlib-compressed raw bytes,
+        which is much more compact than a nested list in a document.
+
+        Args:
+            array (array-like): the array
+            collection (string): the GridFS collection name
+            task_id(int or str): the task_id to store into the gridfs metadata
+        Returns:
+            file id
+        """
+        array = np.ascontiguousarray(array)
+        m_data = {"compression": "zlib", "dtype": array.dtype.str,
+                  "shape": list(array.shape)}
+        if task_id:
+            m_data["task_id"] = task_id
+        fs = gridfs.GridFS(self.db, collection)
+        return fs.put(zlib.compress(array.tobytes()), metadata=m_data)
+
+    def get_array(self, fs_id, collection="fs"):
+        """
+        Read an array inserted with insert_array.
+
+        Args:
+            fs_id (ObjectId): the GridFS file id
+            collection (string): the GridFS collection name
+        Returns:
+            numpy array
+        """
+        fs = gridfs.GridFS(self.db, collection)
+        f = fs.get(fs_id)
+        data = f.read()
+        if f.metadata.get("compression") == "zlib":
+            data = zlib.decompress(data)
+        return np.frombuffer(data, dtype=f.metadata["dtype"]).reshape(f.metadata["shape"])
+
     @abstractmethod
     def reset(self):
         pass
@@ -272,6 +392,8 @@ class CalcDb(metaclass=ABCMeta):
         Args:
             store_name: correspond to the the key within calcs_reversed.0 that will be stored
         """
+        from maggma.stores import MongoStore, MongoURIStore, S3Store
+
         if self.host_uri is not None:
             index_store_ = MongoURIStore(
                 uri=self.host_uri,
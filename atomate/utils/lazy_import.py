@@ -0,0 +1,71 @@
+# coding: utf-8
+
+
+"""
+Lazy loading of the submodules of a package (PEP 562).
+
+Several atomate packages used to star import all their submodules in their
+__init__, so that e.g. deserializing a single VaspToDb task imported every
+firetask, and `import atomate.vasp.workflows` every workflow. With
+
+    __getattr__, __dir__ = lazy_star_imports(__name__, ["core", "nmr"])
+
+in the __init__, the names of the submodules are still available from the
+package (`from atomate.vasp.fireworks import OptimizeFW`, and star imports),
+but a submodule is only imported when one of its names is first used.
+
+This module must stay free of heavy imports.
+"""
+
+import importlib
+
+
+def _public_names(module):
+    # the names a star import of the module would bind
+    names = getattr(module, "__all__", None)
+    if names is None:
+        names = [k for k in vars(module) if not k.startswith("_")]
+    return list(names)
+
+
+def lazy_star_imports(package, submodules):
+    """
+    Module __getattr__ and __dir__ functions for a package whose __init__
+    would otherwise be `from .submodule import *` for each of submodules.
+
+    Args:
+        package (str): name of the package, i.e. __name__ in its __init__
+        submodules ([str]): names of the submodules, relative to the package,
+            in the order in which they would be star imported (later ones
+            take precedence)
+
+    Returns:
+        (__getattr__, __dir__) functions
+    """
+    package_module = importlib.import_module(package)
+
+    def _import(submodule):
+        return importlib.import_module("." + submodule, package)
+
+    def __getattr__(name):
+        if name == "__all__":
+            names = {}
+            for submodule in submodules:
+                names.update(dict.fromkeys(_public_names(_import(submodule))))
+            return list(names)
+        if name in submodules:
+            return _import(name)
+        if name.startswith("__"):
+            raise AttributeError(name)
+        for submodule in reversed(submodules):
+            module = _import(submodule)
+            if name in _public_names(module):
+                value = getattr(module, name)
+                setattr(package_module, name, value)
+                return value
+        raise AttributeError("module {!r} has no attribute {!r}".format(package, name))
+
+    def __dir__():
+        return sorted(set(vars(package_module)) | set(__getattr__("__all__")))
+
+    return __getattr__, __dir__
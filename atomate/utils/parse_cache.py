@@ -0,0 +1,249 @@
+# coding: utf-8
+
+
+"""
+This module defines an on-disk cache for parsed calculation outputs. Several
+firetasks in a firework (e.g., VaspToDb, CheckBandgap, pass_vasp_result)
+parse the same output files; with the cache, only the first consumer pays
+the parsing cost and later consumers load a pickled copy of the result.
+
+Entries are keyed by the parser, its arguments and a signature of the output
+file (size + mtime + inode, or optionally a hash of the file contents), so a
+file that is rewritten is never served from a stale entry.
+"""
+
+import glob
+import gzip
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+
+from atomate.utils.utils import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_DIRNAME = ".parse_cache"
+CACHE_EXT = ".pkl.gz"
+
+
+def get_file_signature(filename, hash_contents=False):
+    """
+    Get a signature that changes whenever the contents of a file change.
+
+    Args:
+        filename (str): path to the file
+        hash_contents (bool): if True, use the SHA1 hash of the file contents.
+            Otherwise (default), use the size, modification time and inode
+            of the file, which is much cheaper for large files.
+
+    Returns:
+        (str) file signature
+    """
+    if hash_contents:
+        sha = hashlib.sha1()
+        with open(filename, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+    st = os.stat(filename)
+    return "{}-{}-{}".format(st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+class ParseCache:
+    """
+    Size-bounded on-disk cache of parsed output files.
+
+    Boolean arguments whose name starts with "parse_" (e.g. parse_dos,
+    parse_eigen) are treated as optional extra parsing: an entry parsed with
+    a superset of those flags switched on is also used to serve requests
+    with fewer flags. All other arguments must match exactly.
+    """
+
+    def __init__(self, cache_dir=None, max_size=2 * 1024 ** 3, hash_contents=False):
+        """
+        Args:
+            cache_dir (str): directory holding the cache entries. If None
+                (default), entries are stored in a hidden ".parse_cache"
+                directory next to the parsed file.
+            max_size (int): maximum total size in bytes of a cache directory.
+                Least recently used entries are evicted first.
+            hash_contents (bool): key entries on a hash of the file contents
+                rather than on its size, modification time and inode.
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hash_contents = hash_contents
+
+    def parse(self, parser, filename, **kwargs):
+        """
+        Return parser(filename, **kwargs), loading it from the cache if
+        possible and storing it in the cache otherwise.
+
+        Args:
+            parser (callable): class or function used to parse the file,
+                taking the filename as first argument. The result must be
+                picklable.
+            filename (str): path to the file to parse
+            **kwargs: additional arguments for the parser
+
+        Returns:
+            the parsed object
+        """
+        try:
+            key, flags = self._get_key(parser, filename, kwargs)
+            cache_dir = self._get_cache_dir(filename)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Parse cache disabled for {}: {}".format(filename, e))
+            return parser(filename, **kwargs)
+
+        for entry in self._find_entries(cache_dir, key, flags):
+            try:
+                with gzip.open(entry, "rb") as f:
+                    result = pickle.load(f)
+                os.utime(entry)
+                logger.info("Loaded {} from parse cache".format(filename))
+                return result
+            except Exception as e:
+                logger.warning("Removing unreadable parse cache entry {}: {}".format(entry, e))
+                self._remove(entry)
+
+        result = parser(filename, **kwargs)
+        self._store(result, cache_dir, key, flags)
+        return result
+
+    def _get_key(self, parser, filename, kwargs):
+        """
+        Get the cache key and the set of enabled "parse_*" flags for a call.
+        Default arguments of the parser are filled in so that explicit and
+        implicit defaults map to the same entry.
+        """
+        arguments = dict(kwargs)
+        try:
+            sig = inspect.signature(parser)
+            bound = sig.bind(filename, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            arguments.pop(list(sig.parameters)[0])
+            for name, param in sig.parameters.items():
+                if param.kind == param.VAR_KEYWORD:
+                    arguments.update(arguments.pop(name, {}))
+                elif param.kind == param.VAR_POSITIONAL:
+                    arguments.pop(name, None)
+        except (TypeError, ValueError):
+            pass
+
+        flags = {k for k, v in arguments.items() if k.startswith("parse_") and v is True}
+        fixed = {k: repr(v) for k, v in arguments.items()
+                 if not (k.startswith("parse_") and isinstance(v, bool))}
+        key_doc = {
+            "parser": "{}.{}".format(parser.__module__, parser.__qualname__),
+            "file": os.path.basename(filename),
+            "signature": get_file_signature(filename, self.hash_contents),
+            "kwargs": fixed,
+        }
+        key = hashlib.sha1(json.dumps(key_doc, sort_keys=True).encode()).hexdigest()
+        return key, flags
+
+    def _get_cache_dir(self, filename):
+        if self.cache_dir:
+            return self.cache_dir
+        return os.path.join(os.path.dirname(os.path.abspath(filename)), CACHE_DIRNAME)
+
+    @staticmethod
+    def _entry_flags(entry):
+        flag_str = os.path.basename(entry)[:-len(CACHE_EXT)].split("-", 1)[1]
+        return set(flag_str.split(".")) - {"none"}
+
+    def _find_entries(self, cache_dir, key, flags):
+        """
+        Entries for this key whose flags are a superset of the requested
+        ones, fewest flags (i.e., smallest entry) first.
+        """
+        entries = [e for e in glob.glob(os.path.join(cache_dir, key + "-*" + CACHE_EXT))
+                   if flags <= self._entry_flags(e)]
+        return sorted(entries, key=lambda e: len(self._entry_flags(e)))
+
+    def _store(self, result, cache_dir, key, flags):
+        entry = os.path.join(cache_dir, "{}-{}{}".format(
+            key, ".".join(sorted(flags)) or "none", CACHE_EXT))
+        tmp_name = None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb",
+                                                            compresslevel=1) as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # atomic, so that concurrent readers never see a partial entry
+            os.replace(tmp_name, entry)
+            tmp_name = None
+        except Exception as e:
+            logger.warning("Could not write parse cache entry {}: {}".format(entry, e))
+            return
+        finally:
+            if tmp_name:
+                self._remove(tmp_name)
+        self.evict(cache_dir)
+
+    def evict(self, cache_dir=None):
+        """
+        Remove the least recently used entries of a cache directory until
+        its total size is below max_size.
+
+        Args:
+            cache_dir (str): cache directory. Defaults to self.cache_dir.
+        """
+        cache_dir = cache_dir or self.cache_dir
+        entries = []
+        for e in glob.glob(os.path.join(cache_dir, "*" + CACHE_EXT)):
+            try:
+                st = os.stat(e)
+                entries.append((st.st_mtime, st.st_size, e))
+            except OSError:
+                pass
+        total = sum(size for _, size, _ in entries)
+        for _, size, e in sorted(entries):
+            if total <= self.max_size:
+                break
+            self._remove(e)
+            total -= size
+
+    def clear(self, cache_dir=None):
+        """
+        Remove all entries of a cache directory.
+
+        Args:
+            cache_dir (str): cache directory. Defaults to self.cache_dir.
+        """
+        cache_dir = cache_dir or self.cache_dir
+        for e in glob.glob(os.path.join(cache_dir, "*" + CACHE_EXT)):
+            self._remove(e)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def cached_parse(parser, filename, cache_dir=None, max_size=2 * 1024 ** 3,
+                 hash_contents=False, **kwargs):
+    """
+    Convenience function for ParseCache(...).parse(parser, filename, **kwargs).
+
+    Args:
+        parser (callable): class or function used to parse the file
+        filename (str): path to the file to parse
+        cache_dir (str): cache directory, see ParseCache
+        max_size (int): maximum cache size in bytes, see ParseCache
+        hash_contents (bool): key on file contents, see ParseCache
+        **kwargs: additional arguments for the parser
+
+    Returns:
+        the parsed object
+    """
+    cache = ParseCache(cache_dir=cache_dir, max_size=max_size, hash_contents=hash_contents)
+    return cache.parse(parser, filename, **kwargs)
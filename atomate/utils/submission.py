@@ -0,0 +1,184 @@
+# coding: utf-8
+
+
+"""
+This module defines functions to submit workflows for many structures at
+once, e.g. for screening campaigns: structures are read from directories,
+multi-structure files or JSON lines files, the workflows are constructed
+in a process pool and inserted into the LaunchPad in chunks.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from monty.io import zopen
+from monty.serialization import loadfn
+
+from fireworks import Firework, Workflow
+from pymatgen import Structure
+from pymatgen.io.cif import CifParser
+
+from atomate.utils.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def load_structures(paths):
+    """
+    Load structures from files and directories.
+
+    Args:
+        paths (str or [str]): paths to structure files or directories of
+            structure files. Supported are any file that can be read by
+            Structure.from_file, CIF files with several data blocks, JSON or
+            YAML files holding a list of structures, and JSON lines files
+            (extension .jsonl, optionally compressed) with one structure dict
+            per line. Files in a directory that cannot be read are skipped.
+
+    Returns:
+        list of Structures
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    structures = []
+    for path in paths:
+        if os.path.isdir(path):
+            for fname in sorted(os.listdir(path)):
+                fname = os.path.join(path, fname)
+                if not os.path.isfile(fname):
+                    continue
+                try:
+                    structures.extend(_load_structure_file(fname))
+                except Exception as e:
+                    logger.warning("Skipping {}: {}".format(fname, e))
+        else:
+            structures.extend(_load_structure_file(path))
+    return structures
+
+
+def _load_structure_file(fname):
+    basename = os.path.basename(fname).lower()
+    if ".jsonl" in basename:
+        structures = []
+        with zopen(fname, "rt") as f:
+            for line in f:
+                if line.strip():
+                    structures.append(_to_structure(json.loads(line)))
+        return structures
+    if ".cif" in basename:
+        return CifParser(fname).get_structures()
+    if ".json" in basename or ".yaml" in basename:
+        obj = loadfn(fname)
+        objs = obj if isinstance(obj, list) else [obj]
+        return [_to_structure(o) for o in objs]
+    return [Structure.from_file(fname)]
+
+
+def _to_structure(obj):
+    if isinstance(obj, Structure):
+        return obj
+    if "structure" in obj:
+        obj = obj["structure"]
+    return obj if isinstance(obj, Structure) else Structure.from_dict(obj)
+
+
+def _get_wf(args):
+    """
+    Construct a workflow and apply the powerups to it, in a worker process
+    """
+    structure, wf_func, powerups = args
+    wf = wf_func(structure)
+    for powerup, kwargs in powerups:
+        wf = powerup(wf, **kwargs)
+    return wf
+
+
+def get_wfs(structures, wf_func, powerups=None, nprocs=1, chunksize=16):
+    """
+    Construct workflows for a list of structures, optionally in a process pool.
+
+    Args:
+        structures ([Structure]): input structures
+        wf_func (callable): function taking a structure and returning a
+            Workflow, e.g. a preset workflow or a functools.partial of
+            get_wf_from_spec_dict. Must be picklable if nprocs != 1.
+        powerups ([(callable, dict)]): powerups and their kwargs, applied in
+            order to each workflow
+        nprocs (int): number of processes. None uses all available cores.
+        chunksize (int): number of structures sent to a worker at a time
+
+    Returns:
+        iterator over the Workflows, in the order of the structures
+    """
+    jobs = [(s, wf_func, powerups or []) for s in structures]
+    if nprocs == 1:
+        for job in jobs:
+            yield _get_wf(job)
+    else:
+        with ProcessPoolExecutor(max_workers=nprocs) as executor:
+            for wf in executor.map(_get_wf, jobs, chunksize=chunksize):
+                yield wf
+
+
+def add_wfs(lpad, wfs, chunk_size=500):
+    """
+    Add workflows to the LaunchPad in chunks, using a bulk insert if the
+    LaunchPad supports it.
+
+    Args:
+        lpad (LaunchPad): the LaunchPad
+        wfs (iterable of Workflows): workflows to add
+        chunk_size (int): number of workflows inserted at a time
+
+    Returns:
+        (int) number of workflows added
+    """
+    n_wfs = 0
+    chunk = []
+    t0 = time.time()
+
+    def flush():
+        if hasattr(lpad, "bulk_add_wfs"):
+            lpad.bulk_add_wfs(chunk)
+        else:
+            for wf in chunk:
+                lpad.add_wf(wf)
+        logger.info("Added {} workflows ({:.1f} workflows/s)".format(
+            n_wfs, n_wfs / max(time.time() - t0, 1e-9)))
+
+    for wf in wfs:
+        chunk.append(Workflow([wf]) if isinstance(wf, Firework) else wf)
+        n_wfs += 1
+        if len(chunk) >= chunk_size:
+            flush()
+            chunk = []
+    if chunk:
+        flush()
+    return n_wfs
+
+
+def submit_structures(lpad, structures, wf_func, powerups=None, nprocs=1,
+                      chunk_size=500):
+    """
+    Construct workflows for many structures and add them to the LaunchPad.
+
+    Args:
+        lpad (LaunchPad): the LaunchPad
+        structures ([Structure]): input structures
+        wf_func (callable): function taking a structure and returning a Workflow
+        powerups ([(callable, dict)]): powerups and their kwargs
+        nprocs (int): number of processes used to construct the workflows
+        chunk_size (int): number of workflows inserted at a time
+
+    Returns:
+        (int, float) number of workflows added and throughput in workflows/s
+    """
+    t0 = time.time()
+    n_wfs = add_wfs(lpad, get_wfs(structures, wf_func, powerups=powerups, nprocs=nprocs),
+                    chunk_size=chunk_size)
+    rate = n_wfs / max(time.time() - t0, 1e-9)
+    logger.info("Submitted {} workflows in {:.1f} s ({:.1f} workflows/s)".format(
+        n_wfs, time.time() - t0, rate))
+    return n_wfs, rate
@@ -0,0 +1,57 @@
+# coding: utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pymatgen.util.testing import PymatgenTest
+
+from atomate.utils.blob_store import get_blob, intern_structure, is_blob_handle, \
+    offload_large_values, put_blob, resolve_blobs
+
+
+class BlobStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch_dir)
+
+    def test_local_store(self):
+        data = {"eigenvecs": np.arange(24.).reshape(2, 4, 3).tolist()}
+        handle = put_blob(data, blob_dir=self.scratch_dir)
+        self.assertTrue(is_blob_handle(handle))
+        self.assertTrue(os.path.exists(handle["path"]))
+        self.assertEqual(get_blob(handle), data)
+        self.assertRaises(ValueError, put_blob, data)
+
+    def test_offload_and_resolve(self):
+        pass_dict = {"eigenvals": [-1.0, -2.0],
+                     "eigenvecs": np.ones((30, 10, 3)).tolist()}
+        offloaded = offload_large_values(pass_dict, min_size=1000,
+                                         blob_dir=">>blob_dir<<",
+                                         fw_spec={"_fw_env": {"blob_dir": self.scratch_dir}})
+        self.assertEqual(offloaded["eigenvals"], pass_dict["eigenvals"])
+        self.assertTrue(is_blob_handle(offloaded["eigenvecs"]))
+        self.assertLess(len(str(offloaded)), 1000)
+
+        spec = {"normalmodes": offloaded, "raman_epsilon": {"0_0d005": {"mode": 0}}}
+        self.assertEqual(resolve_blobs(spec["normalmodes"]), pass_dict)
+        self.assertEqual(resolve_blobs(spec["raman_epsilon"]), spec["raman_epsilon"])
+
+    def test_intern_structure(self):
+        si = PymatgenTest.get_structure("Si")
+        handle = intern_structure(si, blob_dir=self.scratch_dir)
+        self.assertEqual(intern_structure(si.copy(), blob_dir=self.scratch_dir), handle)
+        self.assertEqual(len(os.listdir(self.scratch_dir)), 1)
+        self.assertEqual(resolve_blobs({"structure": handle})["structure"], si)
+        self.assertNotEqual(intern_structure(PymatgenTest.get_structure("CsCl"),
+                                             blob_dir=self.scratch_dir), handle)
+
+
+if __name__ == "__main__":
+    unittest.main()
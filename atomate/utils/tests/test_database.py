@@ -6,13 +6,14 @@ import os
 import unittest
 
 import boto3
+import numpy as np
 from maggma.stores import MemoryStore
 from moto import mock_s3
 
 
 __author__ = "Jimmy Shen <jmmshn@gmail.com>"
 
-from atomate.utils.database import CalcDb
+from atomate.utils.database import CalcDb, decode_array, encode_array
 from atomate.utils.utils import get_logger
 
 MODULE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)))
@@ -98,3 +99,13 @@ class DatabaseTests(unittest.TestCase):
             res = store.query_one({"fs_id": "mp-1"})
             self.assertEqual(res["fs_id"], "mp-1")
             self.assertEqual(res["data"], "111111111110111111")
+
+
+class ArrayEncodingTests(unittest.TestCase):
+    def test_encode_decode(self):
+        spectrum = np.random.rand(300, 6)
+        d = encode_array(spectrum)
+        self.assertEqual(d["shape"], [300, 6])
+        self.assertTrue(np.array_equal(decode_array(d), spectrum))
+        # plain lists are still supported
+        self.assertTrue(np.array_equal(decode_array(spectrum.tolist()), spectrum))
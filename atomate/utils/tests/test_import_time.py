@@ -0,0 +1,70 @@
+# coding: utf-8
+
+import os
+import subprocess
+import sys
+import unittest
+
+# import time budget in seconds of the modules rlaunch imports to run a single
+# task, e.g. to deserialize VaspToDb. Can be overridden for slow machines.
+IMPORT_TIME_BUDGET = float(os.environ.get("ATOMATE_IMPORT_TIME_BUDGET", 5.0))
+
+
+def get_import_times(statement, n_runs=2):
+    """
+    Import times of the modules imported by a statement, from
+    `python -X importtime`, in a fresh interpreter.
+
+    Returns:
+        (float, dict) total import time in seconds (best of n_runs), and the
+            cumulative time in seconds of each imported module
+    """
+    best = None
+    for _ in range(n_runs):
+        output = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                                stderr=subprocess.PIPE, universal_newlines=True,
+                                check=True).stderr
+        total, modules = 0, {}
+        for line in output.splitlines():
+            if not line.startswith("import time:") or "[us]" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            modules[name.strip()] = int(cumulative) / 1e6
+            # top-level imports are not indented
+            if not name[1:].startswith(" "):
+                total += int(cumulative) / 1e6
+        if best is None or total < best[0]:
+            best = (total, modules)
+    return best
+
+
+class ImportTimeTest(unittest.TestCase):
+
+    def test_task_import(self):
+        total, modules = get_import_times(
+            "from atomate.vasp.firetasks.parse_outputs import VaspToDb")
+        for name in ["atomate.vasp.workflows.presets.core", "atomate.vasp.fireworks.core",
+                     "atomate.vasp.firetasks.run_calc", "atomate.vasp.firetasks.neb_tasks",
+                     "pymatgen.analysis.elasticity.elastic", "pymatgen_diffusion", "maggma",
+                     "phonopy", "pymatgen.command_line.bader_caller"]:
+            self.assertNotIn(name, modules)
+        self.assertLess(total, IMPORT_TIME_BUDGET,
+                        "Importing VaspToDb took {:.2f} s".format(total))
+
+    def test_lazy_packages(self):
+        total, modules = get_import_times(
+            "import atomate.vasp.workflows, atomate.vasp.fireworks, atomate.vasp.firetasks")
+        self.assertNotIn("atomate.vasp.workflows.presets.core", modules)
+        self.assertNotIn("atomate.vasp.fireworks.core", modules)
+        self.assertNotIn("atomate.vasp.firetasks.parse_outputs", modules)
+
+        # the names of the submodules are loaded on first use
+        _, modules = get_import_times(
+            "from atomate.vasp.firetasks import ModifyIncar; "
+            "from atomate.vasp.workflows import wf_bandstructure")
+        self.assertIn("atomate.vasp.firetasks.write_inputs", modules)
+        self.assertIn("atomate.vasp.workflows.presets.core", modules)
+
+
+if __name__ == "__main__":
+    unittest.main()
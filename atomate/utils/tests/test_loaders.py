@@ -3,7 +3,7 @@ import unittest
 
 import os
 
-from atomate.utils.utils import get_wf_from_spec_dict
+from atomate.utils.utils import get_wf_from_spec_dict, get_wf_template, WorkflowTemplate
 from pymatgen.util.testing import PymatgenTest
 
 from monty.serialization import loadfn
@@ -38,5 +38,42 @@ class FuncTest(PymatgenTest):
         self.assertEqual(len(wf.fws), 3)
         self.assertEqual(sorted([len(v) for v in wf.links.values()]), [0, 1, 1])
 
+    def test_wf_template(self):
+        d = loadfn(os.path.join(os.path.abspath(os.path.dirname(__file__)), "spec.yaml"))
+        template = get_wf_template(d)
+        self.assertIs(get_wf_template(d), template)
+        self.assertIsNot(get_wf_template(d, {"db_file": "other.json"}), template)
+
+        wf1 = template.get_wf(self.structure)
+        wf2 = template.get_wf(PymatgenTest.get_structure("CsCl"))
+        self.assertEqual(wf1.name, "Si:band structure")
+        self.assertEqual(wf2.name, "CsCl:band structure")
+        self.assertEqual(sorted([len(v) for v in wf2.links.values()]), [0, 0, 1, 2])
+        self.assertIsNot(wf1.fws[0].tasks[-1], wf2.fws[0].tasks[-1])
+
+        # params of a single workflow
+        wf3 = template.get_wf(self.structure, fw_param_updates={0: {"name": "custom"}})
+        self.assertEqual(wf3.fws[0].name, "Si-custom")
+        self.assertEqual(template.get_wf(self.structure).fws[0].name, wf1.fws[0].name)
+
+        d["fireworks"][0]["params"] = {"parents": 1}
+        self.assertRaises(ValueError, WorkflowTemplate, d)
+
+    def test_wf_template_env(self):
+        d = loadfn(os.path.join(os.path.abspath(os.path.dirname(__file__)), "spec.yaml"))
+        d["common_params"]["$vasp_cmd"] = "$ATOMATE_TEST_VASP_CMD"
+        os.environ["ATOMATE_TEST_VASP_CMD"] = "vasp_std"
+        try:
+            template = get_wf_template(d)
+            self.assertIs(get_wf_template(d), template)
+            # the "$" params are expanded again when the environment changes
+            os.environ["ATOMATE_TEST_VASP_CMD"] = "vasp_gam"
+            template2 = get_wf_template(d)
+            self.assertIsNot(template2, template)
+            self.assertEqual(template2.fw_specs[0][1]["vasp_cmd"], "vasp_gam")
+        finally:
+            del os.environ["ATOMATE_TEST_VASP_CMD"]
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,104 @@
+# coding: utf-8
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from atomate.utils.parse_cache import ParseCache, get_file_signature
+
+
+class CountingParser:
+    """
+    Toy parser that records how many times a file was actually parsed.
+    """
+    calls = 0
+
+    def __init__(self, filename, parse_extra=False, scale=1):
+        CountingParser.calls += 1
+        with open(filename) as f:
+            self.value = float(f.read()) * scale
+        self.extra = self.value * 2 if parse_extra else None
+
+
+class ParseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.scratch_dir, "output.dat")
+        with open(self.filename, "w") as f:
+            f.write("1.5")
+        CountingParser.calls = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch_dir)
+
+    def test_hit_and_miss(self):
+        cache = ParseCache()
+        p1 = cache.parse(CountingParser, self.filename)
+        p2 = cache.parse(CountingParser, self.filename)
+        self.assertEqual(CountingParser.calls, 1)
+        self.assertEqual(p1.value, p2.value)
+        self.assertTrue(os.path.isdir(os.path.join(self.scratch_dir, ".parse_cache")))
+
+        # explicit defaults map to the same entry
+        cache.parse(CountingParser, self.filename, scale=1)
+        self.assertEqual(CountingParser.calls, 1)
+
+        # non-flag arguments are part of the key
+        p3 = cache.parse(CountingParser, self.filename, scale=2)
+        self.assertEqual(CountingParser.calls, 2)
+        self.assertEqual(p3.value, 3.0)
+
+    def test_flag_superset(self):
+        cache = ParseCache()
+        cache.parse(CountingParser, self.filename, parse_extra=True)
+        p = cache.parse(CountingParser, self.filename, parse_extra=False)
+        self.assertEqual(CountingParser.calls, 1)
+        self.assertEqual(p.extra, 3.0)
+
+        # an entry without the flag cannot serve a request with the flag
+        os.utime(self.filename, ns=(0, 0))
+        cache.parse(CountingParser, self.filename)
+        cache.parse(CountingParser, self.filename, parse_extra=True)
+        self.assertEqual(CountingParser.calls, 3)
+
+    def test_invalidation(self):
+        cache = ParseCache(cache_dir=os.path.join(self.scratch_dir, "cache"))
+        sig = get_file_signature(self.filename)
+        cache.parse(CountingParser, self.filename)
+        with open(self.filename, "w") as f:
+            f.write("2.50")
+        self.assertNotEqual(sig, get_file_signature(self.filename))
+        p = cache.parse(CountingParser, self.filename)
+        self.assertEqual(CountingParser.calls, 2)
+        self.assertEqual(p.value, 2.5)
+
+        content_cache = ParseCache(hash_contents=True)
+        content_cache.parse(CountingParser, self.filename)
+        os.utime(self.filename, ns=(0, 0))
+        content_cache.parse(CountingParser, self.filename)
+        self.assertEqual(CountingParser.calls, 3)
+
+    def test_eviction(self):
+        cache_dir = os.path.join(self.scratch_dir, "cache")
+        cache = ParseCache(cache_dir=cache_dir, max_size=0)
+        cache.parse(CountingParser, self.filename)
+        self.assertEqual(os.listdir(cache_dir), [])
+        cache.parse(CountingParser, self.filename)
+        self.assertEqual(CountingParser.calls, 2)
+
+    def test_corrupted_entry(self):
+        cache = ParseCache()
+        cache.parse(CountingParser, self.filename)
+        cache_dir = os.path.join(self.scratch_dir, ".parse_cache")
+        for f in os.listdir(cache_dir):
+            with open(os.path.join(cache_dir, f), "wb") as fh:
+                fh.write(b"garbage")
+        p = cache.parse(CountingParser, self.filename)
+        self.assertEqual(CountingParser.calls, 2)
+        self.assertEqual(p.value, 1.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# coding: utf-8
+
+import json
+import os
+import unittest
+from functools import partial
+
+from pymatgen.util.testing import PymatgenTest
+
+from atomate.utils.submission import load_structures, get_wfs, submit_structures
+from atomate.utils.testing import AtomateTest
+from atomate.utils.utils import get_wf_from_spec_dict
+from atomate.vasp.powerups import add_tags
+
+SPEC = {"fireworks": [{"fw": "atomate.vasp.fireworks.core.OptimizeFW"},
+                      {"fw": "atomate.vasp.fireworks.core.StaticFW",
+                       "params": {"parents": 0}}],
+        "name": "test"}
+
+
+class SubmissionTest(AtomateTest):
+
+    def setUp(self):
+        super(SubmissionTest, self).setUp()
+        self.structures = [PymatgenTest.get_structure(f) for f in ["Si", "CsCl", "Li2O"]]
+
+    def test_load_structures(self):
+        os.makedirs("structures")
+        self.structures[0].to(filename=os.path.join("structures", "POSCAR"))
+        self.structures[1].to(filename=os.path.join("structures", "CsCl.cif"))
+        with open(os.path.join("structures", "README"), "w") as f:
+            f.write("not a structure")
+        with open("structures.jsonl", "w") as f:
+            for s in self.structures:
+                f.write(json.dumps(s.as_dict()) + "\n")
+
+        structures = load_structures("structures")
+        self.assertEqual(len(structures), 2)
+        self.assertEqual({s.composition.reduced_formula for s in structures}, {"Si", "CsCl"})
+
+        structures = load_structures(["structures", "structures.jsonl"])
+        self.assertEqual(len(structures), 5)
+        self.assertEqual(structures[-1], self.structures[-1])
+
+    def test_submit_structures(self):
+        wf_func = partial(get_wf_from_spec_dict, wfspec=SPEC)
+        powerups = [(add_tags, {"tags": ["screening"]})]
+        wfs = list(get_wfs(self.structures, wf_func, powerups=powerups, nprocs=2))
+        self.assertEqual([wf.name for wf in wfs],
+                         [s.composition.reduced_formula + ":test" for s in self.structures])
+        self.assertTrue(all(wf.metadata["tags"] == ["screening"] for wf in wfs))
+
+        n_wfs, rate = submit_structures(self.lp, self.structures, wf_func,
+                                        powerups=powerups, nprocs=2, chunk_size=2)
+        self.assertEqual(n_wfs, 3)
+        self.assertGreater(rate, 0)
+        self.assertEqual(self.lp.workflows.count_documents({"metadata.tags": "screening"}), 3)
+        self.assertEqual(self.lp.fireworks.count_documents({}), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
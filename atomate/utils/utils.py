@@ -1,15 +1,18 @@
 # coding: utf-8
 
 
+import json
 import logging
 import os
 import sys
 import socket
+from collections import OrderedDict
+from copy import deepcopy
 from random import randint
 from time import time
 
 from pymongo import MongoClient
-from monty.json import MontyDecoder
+from monty.json import MontyDecoder, MontyEncoder
 from monty.serialization import loadfn
 from pymatgen import Composition
 
@@ -234,46 +237,137 @@ def get_wf_from_spec_dict(structure, wfspec, common_param_updates=None):
         Workflow
     """
 
-    dec = MontyDecoder()
+    return get_wf_template(wfspec, common_param_updates).get_wf(structure)
 
-    def process_params(d):
-        decoded = {}
-        for k, v in d.items():
-            if k.startswith("$"):
-                if isinstance(v, list):
-                    v = [os.path.expandvars(i) for i in v]
-                elif isinstance(v, dict):
-                    v = {k2: os.path.expandvars(v2) for k2, v2 in v.items()}
+
+class WorkflowTemplate:
+    """
+    A workflow spec dict (see get_wf_from_spec_dict) compiled for repeated
+    instantiation: the spec is validated, the Firework classes are resolved
+    and all params are expanded and decoded once. Only the construction of
+    the Fireworks themselves is done per structure.
+    """
+
+    def __init__(self, wfspec, common_param_updates=None):
+        """
+        Args:
+            wfspec (dict): workflow spec dict, see get_wf_from_spec_dict
+            common_param_updates (dict): user-specified updates to common_params
+        """
+        dec = MontyDecoder()
+
+        def process_params(d):
+            decoded = {}
+            for k, v in d.items():
+                if k.startswith("$"):
+                    if isinstance(v, list):
+                        v = [os.path.expandvars(i) for i in v]
+                    elif isinstance(v, dict):
+                        v = {k2: os.path.expandvars(v2) for k2, v2 in v.items()}
+                    else:
+                        v = os.path.expandvars(v)
+                decoded[k.strip("$")] = dec.process_decoded(v)
+            return decoded
+
+        common_params = process_params(wfspec.get("common_params", {}))
+        if common_param_updates:
+            common_params.update(common_param_updates)
+
+        self.fw_specs = []
+        for idx, d in enumerate(wfspec["fireworks"]):
+            modname, classname = d["fw"].rsplit(".", 1)
+            cls_ = load_class(modname, classname)
+            params = process_params(d.get("params", {}))
+            for k in common_params:
+                if k not in params:  # common params don't override local params
+                    params[k] = common_params[k]
+            parents = params.pop("parents", None)
+            if parents is not None:
+                parent_idxs = [parents] if isinstance(parents, int) else list(parents)
+                if any(not -idx <= i < idx for i in parent_idxs):
+                    raise ValueError("Invalid parents {} for Firework {}: parents must refer "
+                                     "to preceding Fireworks".format(parents, idx))
+                parents = parents if isinstance(parents, int) else parent_idxs
+            self.fw_specs.append((cls_, params, parents))
+
+        self.name = wfspec.get("name")
+        self.metadata = wfspec.get("metadata")
+
+    def get_wf(self, structure, fw_param_updates=None):
+        """
+        Instantiate the workflow for a structure.
+
+        Args:
+            structure (Structure): An input structure object.
+            fw_param_updates (dict): updates to the params of some Fireworks
+                of this workflow only, by Firework index, e.g.
+                {0: {"vasp_input_set": vis}} for a structure specific input set
+
+        Returns:
+            Workflow
+        """
+        fw_param_updates = fw_param_updates or {}
+        fws = []
+        for idx, (cls_, params, parents) in enumerate(self.fw_specs):
+            # decoded objects (e.g. input sets) must not be shared between workflows
+            params = deepcopy(params)
+            params.update(deepcopy(fw_param_updates.get(idx, {})))
+            if parents is not None:
+                if isinstance(parents, int):
+                    params["parents"] = fws[parents]
                 else:
-                    v = os.path.expandvars(v)
-            decoded[k.strip("$")] = dec.process_decoded(v)
-        return decoded
-
-    fws = []
-    common_params = process_params(wfspec.get("common_params", {}))
-    if common_param_updates:
-        common_params.update(common_param_updates)
-    for d in wfspec["fireworks"]:
-        modname, classname = d["fw"].rsplit(".", 1)
-        cls_ = load_class(modname, classname)
-        params = process_params(d.get("params", {}))
-        for k in common_params:
-            if k not in params:  # common params don't override local params
-                params[k] = common_params[k]
-        if "parents" in params:
-            if isinstance(params["parents"], int):
-                params["parents"] = fws[params["parents"]]
-            else:
-                p = []
-                for parent_idx in params["parents"]:
-                    p.append(fws[parent_idx])
-                params["parents"] = p
-        fws.append(cls_(structure=structure, **params))
+                    params["parents"] = [fws[i] for i in parents]
+            fws.append(cls_(structure=structure, **params))
+
+        wfname = "{}:{}".format(structure.composition.reduced_formula, self.name) if \
+            self.name else structure.composition.reduced_formula
+
+        return Workflow(fws, name=wfname, metadata=deepcopy(self.metadata))
 
-    wfname = "{}:{}".format(structure.composition.reduced_formula, wfspec["name"]) if \
-        wfspec.get("name") else structure.composition.reduced_formula
 
-    return Workflow(fws, name=wfname, metadata=wfspec.get("metadata"))
+_WF_TEMPLATES = OrderedDict()
+_WF_TEMPLATES_MAXSIZE = 128
+
+
+def _get_env_params(wfspec):
+    """
+    Values of the "$" params of a workflow spec, expanded from the environment
+    """
+    params = [wfspec.get("common_params", {})] + \
+        [d.get("params", {}) for d in wfspec["fireworks"]]
+    return [os.path.expandvars(json.dumps(v, sort_keys=True))
+            for p in params for k, v in sorted(p.items()) if k.startswith("$")]
+
+
+def get_wf_template(wfspec, common_param_updates=None):
+    """
+    Get the compiled WorkflowTemplate of a workflow spec dict, memoized on
+    the contents of the spec and the expanded values of its "$" params. The
+    spec should not hold structure specific params (e.g. an input set made
+    for a structure): pass them to WorkflowTemplate.get_wf instead, or the
+    memo never hits.
+
+    Args:
+        wfspec (dict): workflow spec dict, see get_wf_from_spec_dict
+        common_param_updates (dict): user-specified updates to common_params
+
+    Returns:
+        WorkflowTemplate
+    """
+    try:
+        key = json.dumps([wfspec, common_param_updates, _get_env_params(wfspec)],
+                         sort_keys=True, cls=MontyEncoder)
+    except (TypeError, ValueError):
+        return WorkflowTemplate(wfspec, common_param_updates)
+    template = _WF_TEMPLATES.get(key)
+    if template is None:
+        template = WorkflowTemplate(wfspec, common_param_updates)
+        _WF_TEMPLATES[key] = template
+        if len(_WF_TEMPLATES) > _WF_TEMPLATES_MAXSIZE:
+            _WF_TEMPLATES.popitem(last=False)
+    else:
+        _WF_TEMPLATES.move_to_end(key)
+    return template
 
 
 def load_class(modulepath, classname):
@@ -333,6 +427,21 @@ def get_uri(dir_name):
     return "{}:{}".format(hostname, fullpath)
 
 
+def get_allocation_cores():
+    """
+    Number of cores of the current allocation, read from the SLURM_NTASKS,
+    PBS_NP or NSLOTS environment variables of the queue system, or the number
+    of cores of the node.
+
+    Returns:
+        (int) number of cores
+    """
+    for var in ("SLURM_NTASKS", "PBS_NP", "NSLOTS"):
+        if os.environ.get(var):
+            return int(os.environ[var])
+    return os.cpu_count()
+
+
 def get_database(config_file=None, settings=None, admin=False, **kwargs):
     d = loadfn(config_file) if settings is None else settings
 
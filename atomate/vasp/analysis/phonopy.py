@@ -1,6 +1,8 @@
 # coding: utf-8
 
 
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
 __author__ = 'Kiran Mathew'
@@ -9,7 +11,7 @@ __email__ = 'kmathew@lbl.gov'
 # TODO: @matk86 - unit tests?
 
 def get_phonopy_gibbs(energies, volumes, force_constants, structure, t_min, t_step, t_max, mesh,
-                      eos, pressure=0):
+                      eos, pressure=0, nprocs=1):
     """
     Compute QHA gibbs free energy using the phonopy interface.
 
@@ -25,6 +27,8 @@ def get_phonopy_gibbs(energies, volumes, force_constants, structure, t_min, t_st
         eos (str): equation of state used for fitting the energies and the volumes.
             options supported by phonopy: vinet, murnaghan, birch_murnaghan
         pressure (float): in GPa, optional.
+        nprocs (int): number of processes computing the thermal properties of
+            the volumes in parallel. None uses all available cores.
 
     Returns:
         (numpy.ndarray, numpy.ndarray): Gibbs free energy, Temperature
@@ -32,7 +36,7 @@ def get_phonopy_gibbs(energies, volumes, force_constants, structure, t_min, t_st
 
     # quasi-harmonic approx
     phonopy_qha = get_phonopy_qha(energies, volumes, force_constants, structure, t_min, t_step,
-                                  t_max, mesh, eos, pressure=pressure)
+                                  t_max, mesh, eos, pressure=pressure, nprocs=nprocs)
 
     # gibbs free energy and temperature
     max_t_index = phonopy_qha._qha._max_t_index
@@ -42,7 +46,7 @@ def get_phonopy_gibbs(energies, volumes, force_constants, structure, t_min, t_st
 
 
 def get_phonopy_qha(energies, volumes, force_constants, structure, t_min, t_step, t_max, mesh, eos,
-                      pressure=0):
+                      pressure=0, nprocs=1):
     """
     Return phonopy QHA interface.
 
@@ -58,34 +62,24 @@ def get_phonopy_qha(energies, volumes, force_constants, structure, t_min, t_step
         eos (str): equation of state used for fitting the energies and the volumes.
             options supported by phonopy: vinet, murnaghan, birch_murnaghan
         pressure (float): in GPa, optional.
+        nprocs (int): number of processes computing the thermal properties of
+            the volumes in parallel. None uses all available cores.
 
     Returns:
         PhonopyQHA
     """
-    from phonopy import Phonopy
-    from phonopy.structure.atoms import Atoms as PhonopyAtoms
     from phonopy import PhonopyQHA
     from phonopy.units import EVAngstromToGPa
 
-    phon_atoms = PhonopyAtoms(symbols=[str(s.specie) for s in structure],
-                              scaled_positions=structure.frac_coords,
-                              cell=structure.lattice.matrix)
-    scell = [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
-    phonon = Phonopy(phon_atoms, scell)
-    # compute the required phonon thermal properties
-    temperatures = []
-    free_energy = []
-    entropy = []
-    cv = []
-    for f in force_constants:
-        phonon.set_force_constants(-np.array(f))
-        phonon.set_mesh(list(mesh))
-        phonon.set_thermal_properties(t_step=t_step, t_min=t_min, t_max=t_max)
-        t, g, e, c = phonon.get_thermal_properties()
-        temperatures.append(t)
-        free_energy.append(g)
-        entropy.append(e)
-        cv.append(c)
+    # compute the required phonon thermal properties of each volume
+    cell = ([str(s.specie) for s in structure], structure.frac_coords, structure.lattice.matrix)
+    jobs = [(cell, f, mesh, t_min, t_step, t_max) for f in force_constants]
+    if nprocs == 1:
+        thermal_properties = list(map(_get_thermal_properties, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=nprocs) as executor:
+            thermal_properties = list(executor.map(_get_thermal_properties, jobs))
+    temperatures, free_energy, entropy, cv = zip(*thermal_properties)
 
     # add pressure contribution
     energies = np.array(energies) + np.array(volumes) * pressure / EVAngstromToGPa
@@ -95,8 +89,33 @@ def get_phonopy_qha(energies, volumes, force_constants, structure, t_min, t_step
                       entropy=np.array(entropy).T, t_max=np.max(temperatures[0]))
 
 
+def _get_thermal_properties(args):
+    """
+    Phonon thermal properties of one volume. Module-level so that it can be
+    run in a process pool.
+
+    Args:
+        args (tuple): (symbols, fractional coordinates, lattice matrix),
+            force constants, mesh, t_min, t_step, t_max
+
+    Returns:
+        (temperatures, free energy, entropy, heat capacity)
+    """
+    from phonopy import Phonopy
+    from phonopy.structure.atoms import Atoms as PhonopyAtoms
+
+    (symbols, frac_coords, lattice), f, mesh, t_min, t_step, t_max = args
+    phon_atoms = PhonopyAtoms(symbols=symbols, scaled_positions=frac_coords, cell=lattice)
+    scell = [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
+    phonon = Phonopy(phon_atoms, scell)
+    phonon.set_force_constants(-np.array(f))
+    phonon.set_mesh(list(mesh))
+    phonon.set_thermal_properties(t_step=t_step, t_min=t_min, t_max=t_max)
+    return phonon.get_thermal_properties()
+
+
 def get_phonopy_thermal_expansion(energies, volumes, force_constants, structure, t_min, t_step,
-                                  t_max, mesh, eos, pressure=0):
+                                  t_max, mesh, eos, pressure=0, nprocs=1):
     """
     Compute QHA thermal expansion coefficient using the phonopy interface.
 
@@ -112,6 +131,8 @@ def get_phonopy_thermal_expansion(energies, volumes, force_constants, structure,
         eos (str): equation of state used for fitting the energies and the volumes.
             options supported by phonopy: vinet, murnaghan, birch_murnaghan
         pressure (float): in GPa, optional.
+        nprocs (int): number of processes computing the thermal properties of
+            the volumes in parallel. None uses all available cores.
 
     Returns:
         (numpy.ndarray, numpy.ndarray): thermal expansion coefficient, Temperature
@@ -119,7 +140,7 @@ def get_phonopy_thermal_expansion(energies, volumes, force_constants, structure,
 
     # quasi-harmonic approx
     phonopy_qha = get_phonopy_qha(energies, volumes, force_constants, structure, t_min, t_step,
-                                  t_max, mesh, eos, pressure=pressure)
+                                  t_max, mesh, eos, pressure=pressure, nprocs=nprocs)
 
     # thermal expansion coefficient and temperature
     max_t_index = phonopy_qha._qha._max_t_index
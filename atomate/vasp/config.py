@@ -71,3 +71,15 @@ LOBSTEROUTPUT_FILES = [
     "lobster.out",
     "projectionData.lobster",
 ]
+
+# cache parsed vasprun.xml/OUTCAR objects on disk, so that the firetasks of a
+# firework (VaspToDb, CheckBandgap, pass_vasp_result, ...) parse them only once
+PARSE_CACHE = False
+
+# directory for the parse cache. If None, entries are stored in a hidden
+# ".parse_cache" directory inside each calculation directory
+PARSE_CACHE_DIR = None
+
+# maximum size (in bytes) of each parse cache directory; least recently used
+# entries are evicted first
+PARSE_CACHE_MAX_SIZE = 2 * 1024 ** 3
@@ -5,6 +5,7 @@ This module defines the database classes.
 
 from typing import Any
 
+import numpy as np
 from monty.json import MontyEncoder
 from pymatgen.io.vasp import Chgcar
 
@@ -23,7 +24,6 @@ from pymongo import ASCENDING, DESCENDING
 
 from atomate.utils.database import CalcDb
 from atomate.utils.utils import get_logger
-from maggma.stores.aws import S3Store
 from monty.dev import deprecated
 
 __author__ = "Kiran Mathew"
@@ -42,6 +42,65 @@ OBJ_NAMES = (
     "aeccar2",
     "elfcar",
 )
+# large arrays in calcs_reversed.N.output that can be stored as binary arrays in GridFS
+ARRAY_NAMES = ("force_constants",)
+
+# Compound indexes covering the query shapes used by atomate, keyed by collection name.
+# "tasks" refers to the task collection of the VaspCalcDb, whatever its actual name.
+INDEX_CATALOG = {
+    "tasks": [
+        # analysis tasks scoped to a workflow (magnetism, magnetic deformation)
+        [("wf_meta.wf_uuid", ASCENDING), ("task_label", ASCENDING)],
+        # analysis tasks scoped to a tag (Gibbs, EOS, thermal expansion, elastic)
+        [("formula_pretty", ASCENDING), ("task_label", ASCENDING)],
+        # label-only lookups (EOS, thermal expansion) and the materials builder
+        [("task_label", ASCENDING), ("state", ASCENDING)],
+        # polarization
+        [("tags", ASCENDING), ("task_label", ASCENDING)],
+    ],
+    "materials": [
+        [("formula_reduced_abc", ASCENDING), ("sg_number", ASCENDING)],
+        [("formula_reduced_abc", ASCENDING),
+         ("parent_structure.spacegroup.number", ASCENDING)],
+    ],
+    "exchange": [
+        [("wf_meta.wf_uuid", ASCENDING)],
+    ],
+}
+
+# Representative query shapes issued by atomate, replayed by VaspCalcDb.explain_queries.
+# The values are placeholders: only the shape of the query matters to the planner.
+QUERY_SHAPES = [
+    {"name": "insert (duplicate check)", "collection": "tasks",
+     "filter": {"dir_name": "host:/path/to/calc"}},
+    {"name": "task by task_id", "collection": "tasks",
+     "filter": {"task_id": 1}},
+    {"name": "elastic (optimization task)", "collection": "tasks",
+     "filter": {"formula_pretty": "Si", "dir_name": {"$regex": "(^|:)/path/to/calc$"}},
+     "sort": [("last_updated", DESCENDING)]},
+    {"name": "magnetism (orderings)", "collection": "tasks",
+     "filter": {"wf_meta.wf_uuid": "uuid", "task_label": {"$regex": "static|optimize"}}},
+    {"name": "magnetic deformation", "collection": "tasks",
+     "filter": {"wf_meta.wf_uuid": "uuid",
+                "task_label": "magnetic deformation optimize magnetic"}},
+    {"name": "gibbs (deformations)", "collection": "tasks",
+     "filter": {"task_label": {"$regex": "tag gibbs*"}, "formula_pretty": "Si"}},
+    {"name": "eos/thermal expansion (deformations)", "collection": "tasks",
+     "filter": {"task_label": {"$regex": "tag bulk_modulus*"}}},
+    {"name": "optimization by tag", "collection": "tasks",
+     "filter": {"task_label": "tag structure optimization"}},
+    {"name": "polarization", "collection": "tasks",
+     "filter": {"tags": "wfid", "task_label": {"$regex": ".*polarization"}}},
+    {"name": "lowest energy by formula", "collection": "tasks",
+     "filter": {"formula_pretty": "Si"}, "sort": [("output.energy_per_atom", DESCENDING)]},
+    {"name": "materials builder (new tasks)", "collection": "tasks",
+     "filter": {"state": "successful",
+                "task_label": {"$in": ["structure optimization", "static"]}}},
+    {"name": "materials builder (matching material)", "collection": "materials",
+     "filter": {"formula_reduced_abc": "Si", "sg_number": 227}},
+    {"name": "exchange (heisenberg models)", "collection": "exchange",
+     "filter": {"wf_meta.wf_uuid": "uuid"}},
+]
 
 
 class VaspCalcDb(CalcDb):
@@ -63,13 +122,16 @@ class VaspCalcDb(CalcDb):
             host, port, database, collection, user, password, **kwargs
         )
 
-    def build_indexes(self, indexes=None, background=True):
+    def build_indexes(self, indexes=None, background=True, catalog=True):
         """
         Build the indexes.
 
         Args:
             indexes (list): list of single field indexes to be built.
             background (bool): Run in the background or not.
+            catalog (bool): also build the compound indexes of INDEX_CATALOG.
+                Indexes of auxiliary collections (e.g. materials) are only
+                built if the collection exists.
 
         TODO: make sure that the index building is sensible and check for
             existing indexes.
@@ -107,9 +169,73 @@ class VaspCalcDb(CalcDb):
                 ],
                 background=background,
             )
+        if catalog:
+            existing = self.db.list_collection_names()
+            for coll_name, coll_indexes in INDEX_CATALOG.items():
+                if coll_name == "tasks":
+                    coll = self.collection
+                elif coll_name in existing:
+                    coll = self.db[coll_name]
+                else:
+                    continue
+                for keys in coll_indexes:
+                    coll.create_index(keys, background=background)
         # TODO consider sensible index building for the maggma stores
 
-    def insert_task(self, task_doc, use_gridfs=False):
+    def explain_queries(self, query_shapes=None):
+        """
+        Replay query shapes with explain() and report how the server
+        executes them. Useful to check that the indexes cover the queries
+        before the collection grows large.
+
+        Args:
+            query_shapes (list): list of dicts with keys "name", "collection"
+                ("tasks" means the task collection), "filter" and optionally
+                "sort". Defaults to QUERY_SHAPES.
+
+        Returns:
+            (list) one dict per query shape with the keys "name",
+                "collection", "stages" (plan stages of the winning plan),
+                "indexes" (indexes used), "collscan" (True if the collection
+                is scanned), "docs_examined" and "keys_examined".
+        """
+        report = []
+        for shape in query_shapes or QUERY_SHAPES:
+            coll_name = shape.get("collection", "tasks")
+            coll = self.collection if coll_name == "tasks" else self.db[coll_name]
+            cursor = coll.find(shape["filter"])
+            if shape.get("sort"):
+                cursor = cursor.sort(shape["sort"])
+            explain = cursor.explain()
+            stages, index_names = _get_plan_stages(explain["queryPlanner"]["winningPlan"])
+            stats = explain.get("executionStats", {})
+            report.append({
+                "name": shape["name"],
+                "collection": coll.name,
+                "stages": stages,
+                "indexes": index_names,
+                "collscan": "COLLSCAN" in stages,
+                "docs_examined": stats.get("totalDocsExamined"),
+                "keys_examined": stats.get("totalKeysExamined"),
+            })
+        return report
+
+    def advise_indexes(self, query_shapes=None):
+        """
+        Report the query shapes that are executed with a collection scan.
+
+        Args:
+            query_shapes (list): see explain_queries. Defaults to QUERY_SHAPES.
+
+        Returns:
+            (list) entries of explain_queries that do a COLLSCAN.
+        """
+        collscans = [r for r in self.explain_queries(query_shapes) if r["collscan"]]
+        for r in collscans:
+            logger.warning("COLLSCAN on {} for query '{}'".format(r["collection"], r["name"]))
+        return collscans
+
+    def insert_task(self, task_doc, use_gridfs=False, binary_arrays=False):
         """
         Inserts a task document (e.g., as returned by Drone.assimilate()) into the database.
         Handles putting DOS, band structure and charge density into GridFS as needed.
@@ -121,11 +247,21 @@ class VaspCalcDb(CalcDb):
             task_doc (dict): the task document
             use_gridfs (bool): store the data matching OBJ_NAMES to gridfs.
                     if maggma_store_type is set (ex. "s3") this flag will be ignored
+            binary_arrays (bool): store the output arrays matching ARRAY_NAMES (e.g.
+                force constants) as compressed binary arrays in gridfs. The task doc
+                keeps a reference in calcs_reversed.N.output.<name>_fs_id; use
+                get_calc_array to read them back.
         Returns:
             (int) - task_id of inserted document
         """
 
         big_data_to_store = {}
+        arrays_to_store = {}
+        if binary_arrays and "calcs_reversed" in task_doc:
+            for i_calc, calc in enumerate(task_doc["calcs_reversed"]):
+                for array_key in ARRAY_NAMES:
+                    if calc.get("output", {}).get(array_key) is not None:
+                        arrays_to_store[(i_calc, array_key)] = calc["output"].pop(array_key)
 
         def extract_from_calcs_reversed(obj_key):
             """
@@ -173,6 +309,13 @@ class VaspCalcDb(CalcDb):
                     {"task_id": t_id},
                     {"$set": {f"calcs_reversed.0.{data_key}_fs_id": fs_di_}},
                 )
+
+        array_fs_ids = {}
+        for (i_calc, array_key), array in arrays_to_store.items():
+            array_fs_ids[f"calcs_reversed.{i_calc}.output.{array_key}_fs_id"] = \
+                self.insert_array(array, collection=f"{array_key}_fs", task_id=t_id)
+        if array_fs_ids:
+            self.collection.update_one({"task_id": t_id}, {"$set": array_fs_ids})
         return t_id
 
     def retrieve_task(self, task_id):
@@ -251,6 +394,21 @@ class VaspCalcDb(CalcDb):
 
         return fs_id, compression_type
 
+    def get_calc_array(self, calc_output, key):
+        """
+        Get an output array of a calculation that may be stored inline or,
+        for the keys in ARRAY_NAMES, as a binary array in GridFS.
+
+        Args:
+            calc_output (dict): the calcs_reversed.N.output (sub-)document
+            key (str): array name, e.g. "force_constants"
+        Returns:
+            numpy array
+        """
+        if calc_output.get(f"{key}_fs_id") is not None:
+            return self.get_array(calc_output[f"{key}_fs_id"], collection=f"{key}_fs")
+        return np.array(calc_output[key])
+
     def insert_maggma_store(
         self, d: Any, collection: str, oid: ObjectId = None, task_id: Any = None
     ):
@@ -286,6 +444,8 @@ class VaspCalcDb(CalcDb):
             search_keys.append("task_id")
             doc["task_id"] = str(d["task_id"])
 
+        from maggma.stores.aws import S3Store
+
         # make sure the store is availible
         with self.get_store(collection) as store:
             ping_ = store.index._collection.database.command("ping")
@@ -405,12 +565,36 @@ class VaspCalcDb(CalcDb):
         self.db.dos_boltztrap_fs.chunks.delete_many({})
         self.db.bandstructure_fs.files.delete_many({})
         self.db.bandstructure_fs.chunks.delete_many({})
+        for array_key in ARRAY_NAMES:
+            self.db[f"{array_key}_fs.files"].delete_many({})
+            self.db[f"{array_key}_fs.chunks"].delete_many({})
         self.build_indexes()
 
 
 # TODO: @albalu, @matk86, @computron - add BoltztrapCalcDB management here -computron, matk86
 
 
+def _get_plan_stages(plan):
+    """
+    Collect the stages and index names of a (possibly nested) query plan.
+    """
+    stages, index_names = [], []
+    if "queryPlan" in plan:
+        # slot based execution engine
+        plan = plan["queryPlan"]
+    stages.append(plan.get("stage"))
+    if "indexName" in plan:
+        index_names.append(plan["indexName"])
+    children = plan.get("inputStages", [])
+    if "inputStage" in plan:
+        children = children + [plan["inputStage"]]
+    for child in children:
+        child_stages, child_indexes = _get_plan_stages(child)
+        stages.extend(child_stages)
+        index_names.extend(child_indexes)
+    return stages, index_names
+
+
 def put_file_in_gridfs(
     file_path, db, collection_name=None, compress=False, compression_type=None
 ):
@@ -32,13 +32,15 @@ from pymatgen.io.vasp import BSVasprun, Vasprun, Outcar, Locpot
 from pymatgen.io.vasp.inputs import Poscar, Potcar, Incar, Kpoints
 from pymatgen.io.vasp.outputs import Chgcar
 from pymatgen.apps.borg.hive import AbstractDrone
-from pymatgen.command_line.bader_caller import bader_analysis_from_path
 
 from atomate.utils.utils import get_uri
 
 from atomate.utils.utils import get_logger
+from atomate.utils.parse_cache import ParseCache
+from atomate.vasp.parallelization import get_time_per_scf_step
 from atomate import __version__ as atomate_version
-from atomate.vasp.config import STORE_VOLUMETRIC_DATA, STORE_ADDITIONAL_JSON
+from atomate.vasp.config import STORE_VOLUMETRIC_DATA, STORE_ADDITIONAL_JSON, \
+    PARSE_CACHE, PARSE_CACHE_DIR, PARSE_CACHE_MAX_SIZE
 
 __author__ = "Kiran Mathew, Shyue Ping Ong, Shyam Dwaraknath, Anubhav Jain"
 __email__ = "kmathew@lbl.gov"
@@ -144,6 +146,7 @@ class VaspDrone(AbstractDrone):
         parse_potcar_file=True,
         store_volumetric_data=STORE_VOLUMETRIC_DATA,
         store_additional_json=STORE_ADDITIONAL_JSON,
+        use_parse_cache=PARSE_CACHE,
     ):
         """
         Initialize a Vasp drone to parse vasp outputs
@@ -172,6 +175,8 @@ class VaspDrone(AbstractDrone):
             'AECCAR0', 'AECCAR1', 'AECCAR2', 'ELFCAR'), case insensitive
             store_additional_json (bool): If True, parse any .json files present and store as
             sub-doc including the FW.json if present
+            use_parse_cache (bool): If True, load/store the parsed vasprun.xml and OUTCAR
+            from/in the on-disk parse cache (see atomate.utils.parse_cache)
         """
         self.parse_dos = parse_dos
         self.additional_fields = additional_fields or {}
@@ -185,6 +190,8 @@ class VaspDrone(AbstractDrone):
         self.store_volumetric_data = [f.lower() for f in store_volumetric_data]
         self.store_additional_json = store_additional_json
         self.parse_potcar_file = parse_potcar_file
+        self.use_parse_cache = use_parse_cache
+        self._merging_segments = False
 
         if parse_chgcar or parse_aeccar:
             warnings.warn(
@@ -275,7 +282,8 @@ class VaspDrone(AbstractDrone):
                 for taskname, filename in vasprun_files.items()
             ]
             outcar_data = [
-                Outcar(os.path.join(dir_name, filename)).as_dict()
+                parse_vasp_output(Outcar, os.path.join(dir_name, filename),
+                                  use_cache=self.use_parse_cache).as_dict()
                 for taskname, filename in outcar_files.items()
             ]
             run_stats = {}
@@ -446,7 +454,8 @@ class VaspDrone(AbstractDrone):
         """
         vasprun_file = os.path.join(dir_name, filename)
 
-        vrun = Vasprun(vasprun_file, parse_potcar_file=self.parse_potcar_file)
+        vrun = parse_vasp_output(Vasprun, vasprun_file, use_cache=self.use_parse_cache,
+                                 parse_potcar_file=self.parse_potcar_file)
 
         d = vrun.as_dict()
 
@@ -575,6 +584,8 @@ class VaspDrone(AbstractDrone):
 
         # perform Bader analysis using Henkelman bader
         if self.parse_bader and "chgcar" in d["output_file_paths"]:
+            from pymatgen.command_line.bader_caller import bader_analysis_from_path
+
             suffix = "" if taskname == "standard" else ".{}".format(taskname)
             bader = bader_analysis_from_path(dir_name, suffix=suffix)
             d["bader"] = bader
@@ -727,8 +738,9 @@ class VaspDrone(AbstractDrone):
     def post_process(self, dir_name, d):
         """
         Post-processing for various files other than the vasprun.xml and OUTCAR.
-        Looks for files: transformations.json and custodian.json. Modify this if other
-        output files need to be processed.
+        Looks for files: transformations.json, custodian.json, seeding.json,
+        continuation.json, parallelization.json and packing.json.
+        Modify this if other output files need to be processed.
 
         Args:
             dir_name:
@@ -781,6 +793,29 @@ class VaspDrone(AbstractDrone):
                 with zopen(fname, "rt") as f:
                     custodian.append(json.load(f)[0])
             d["custodian"] = custodian
+
+        # Calculations warm-started by SeedFromPreviousCalc have a seeding.json,
+        # which records the calculation (and files) they were seeded from
+        filenames = glob.glob(os.path.join(fullpath, "seeding.json*"))
+        if len(filenames) >= 1:
+            with zopen(filenames[0], "rt") as f:
+                d["seeding"] = json.load(f)
+
+        # Calculations tuned by TuneParallelization have a parallelization.json
+        # with the NCORE/KPAR/NSIM used; the achieved time per SCF step is
+        # stored with it so that later recommendations can use it
+        filenames = glob.glob(os.path.join(fullpath, "parallelization.json*"))
+        if len(filenames) >= 1:
+            with zopen(filenames[0], "rt") as f:
+                d["parallelization"] = json.load(f)
+            d["parallelization"]["time_per_scf_step"] = get_time_per_scf_step(d)
+
+        # Calculations run by RunVaspPacked have a packing.json, which records
+        # whether the job succeeded and the share of the allocation it used
+        filenames = glob.glob(os.path.join(fullpath, "packing.json*"))
+        if len(filenames) >= 1:
+            with zopen(filenames[0], "rt") as f:
+                d["packing"] = json.load(f)
         # Convert to full uri path.
         if self.use_full_uri:
             d["dir_name"] = get_uri(dir_name)
@@ -804,16 +839,63 @@ class VaspDrone(AbstractDrone):
                 if "POSCAR.orig" in f:
                     d["orig_inputs"]["poscar"] = Poscar.from_file(f).as_dict()
 
+        # Calculations continued after reaching the walltime (see the
+        # continuation option of RunVaspCustodian) have a continuation.json
+        # listing the directories of the previous segments, which are merged
+        # into this task doc
+        filenames = glob.glob(os.path.join(fullpath, "continuation.json*"))
+        if len(filenames) >= 1:
+            with zopen(filenames[0], "rt") as f:
+                d["continuation"] = json.load(f)
+            if not self._merging_segments:
+                self.merge_segments(d, d["continuation"]["prev_dirs"])
+
         filenames = glob.glob(os.path.join(fullpath, "*.json*"))
         if self.store_additional_json and filenames:
             for filename in filenames:
                 key = os.path.basename(filename).split(".")[0]
-                if key != "custodian" and key != "transformations":
+                if key not in ("custodian", "transformations", "seeding", "parallelization",
+                               "packing", "continuation"):
                     with zopen(filename, "rt") as f:
                         d[key] = json.load(f)
 
         logger.info("Post-processed " + fullpath)
 
+    def merge_segments(self, d, prev_dirs):
+        """
+        Merge the calculations of the previous segments of a run continued
+        after reaching the walltime into its task doc: their calcs_reversed
+        are appended, their run_stats added with a segment suffix, and the
+        input is taken from the first segment.
+
+        Args:
+            d (dict): task doc of the last segment
+            prev_dirs ([str]): directories of the previous segments, first
+                segment first
+        """
+        self._merging_segments = True
+        try:
+            segments = [self.assimilate(prev_dir) for prev_dir in prev_dirs]
+        finally:
+            self._merging_segments = False
+
+        for i, segment in reversed(list(enumerate(segments))):
+            d["calcs_reversed"].extend(segment["calcs_reversed"])
+            for name, stats in segment.get("run_stats", {}).items():
+                if name != "overall":
+                    d["run_stats"]["{}_segment{}".format(name, i)] = stats
+        try:
+            run_stats = [v for k, v in d["run_stats"].items() if k != "overall"]
+            d["run_stats"]["overall"] = {
+                key: sum(v[key] for v in run_stats)
+                for key in d["run_stats"]["overall"]}
+        except Exception:
+            logger.error("Bad run stats for {}.".format(d["dir_name"]))
+        d["input"] = segments[0]["input"]
+        if "orig_inputs" in segments[0]:
+            d["orig_inputs"] = segments[0]["orig_inputs"]
+        d["continuation"]["dir_names"] = [s["dir_name"] for s in segments]
+
     def validate_doc(self, d):
         """
         Sanity check.
@@ -858,6 +940,7 @@ class VaspDrone(AbstractDrone):
             "additional_fields": self.additional_fields,
             "use_full_uri": self.use_full_uri,
             "runs": self.runs,
+            "use_parse_cache": self.use_parse_cache,
         }
         return {
             "@module": self.__class__.__module__,
@@ -869,3 +952,52 @@ class VaspDrone(AbstractDrone):
     @classmethod
     def from_dict(cls, d):
         return cls(**d["init_args"])
+
+
+def parse_vasp_output(parser, filename, use_cache=PARSE_CACHE, **kwargs):
+    """
+    Parse a VASP output file, e.g. parse_vasp_output(Vasprun, "vasprun.xml.gz",
+    parse_dos=False). If use_cache is True, the result is loaded from (or
+    stored in) the on-disk parse cache configured in atomate.vasp.config.
+
+    Args:
+        parser (callable): the parser class, e.g. Vasprun or Outcar
+        filename (str): path to the file to parse
+        use_cache (bool): whether to use the parse cache
+        **kwargs: additional arguments for the parser
+
+    Returns:
+        the parsed object
+    """
+    if not use_cache:
+        return parser(filename, **kwargs)
+    cache = ParseCache(cache_dir=PARSE_CACHE_DIR, max_size=PARSE_CACHE_MAX_SIZE)
+    return cache.parse(parser, filename, **kwargs)
+
+
+def get_vasprun_outcar(path, parse_dos=True, parse_eigen=True, use_cache=PARSE_CACHE):
+    """
+    Same as pymatgen.io.vasp.sets.get_vasprun_outcar, but goes through the
+    parse cache if use_cache is True.
+
+    Args:
+        path (str): directory containing the VASP outputs
+        parse_dos (bool): whether to parse the DOS
+        parse_eigen (bool): whether to parse the eigenvalues
+        use_cache (bool): whether to use the parse cache
+
+    Returns:
+        (Vasprun, Outcar)
+    """
+    vruns = glob.glob(os.path.join(path, "vasprun.xml*"))
+    outcars = glob.glob(os.path.join(path, "OUTCAR*"))
+    if len(vruns) == 0 or len(outcars) == 0:
+        raise ValueError("Unable to get vasprun.xml/OUTCAR from prev calculation in {}".format(path))
+    vsfile = os.path.join(path, "vasprun.xml")
+    vsfile = vsfile if vsfile in vruns else sorted(vruns)[-1]
+    outcarfile = os.path.join(path, "OUTCAR")
+    outcarfile = outcarfile if outcarfile in outcars else sorted(outcars)[-1]
+    vasprun = parse_vasp_output(Vasprun, vsfile, use_cache=use_cache,
+                                parse_dos=parse_dos, parse_eigen=parse_eigen)
+    outcar = parse_vasp_output(Outcar, outcarfile, use_cache=use_cache)
+    return vasprun, outcar
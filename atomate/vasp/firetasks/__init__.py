@@ -1,6 +1,6 @@
 
-from .glue_tasks import *
-from .neb_tasks import *
-from .parse_outputs import *
-from .run_calc import *
-from .write_inputs import *
+from atomate.utils.lazy_import import lazy_star_imports
+
+# the firetasks are imported on first use
+__getattr__, __dir__ = lazy_star_imports(
+    __name__, ["glue_tasks", "neb_tasks", "parse_outputs", "run_calc", "write_inputs"])
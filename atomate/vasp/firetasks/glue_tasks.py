@@ -12,18 +12,26 @@ between different Firetasks and Fireworks. This module also contains tasks that
 flow of the workflow, e.g. tasks to check stability or the gap is within a certain range.
 """
 
+import json
 import shutil
 import gzip
 import os
 import re
 
+import numpy as np
+
 from pymatgen import MPRester
-from pymatgen.io.vasp.sets import get_vasprun_outcar
+from pymatgen.analysis.magnetism import CollinearMagneticStructureAnalyzer
+from pymatgen.analysis.structure_matcher import StructureMatcher
 from pymatgen.core.structure import Structure
+from pymatgen.io.vasp import Incar, Kpoints
 
 from fireworks import explicit_serialize, FiretaskBase, FWAction
 
 from atomate.utils.utils import env_chk, get_logger
+from atomate.vasp.config import PARSE_CACHE, PARSE_CACHE_DIR, PARSE_CACHE_MAX_SIZE
+from atomate.vasp.database import VaspCalcDb
+from atomate.vasp.drones import get_vasprun_outcar, parse_vasp_output
 from atomate.common.firetasks.glue_tasks import get_calc_loc, PassResult, \
     CopyFiles, CopyFilesFromCalcLoc
 
@@ -160,16 +168,19 @@ class CheckStability(FiretaskBase):
             is 0.05 eV/atom.
         MAPI_KEY: (str) set MAPI key directly. Supports env_chk.
         calc_dir: (str) string to path containing vasprun.xml (default currdir)
+        use_parse_cache (bool): whether to use the on-disk parse cache.
+            Defaults to PARSE_CACHE in atomate.vasp.config.
     """
 
     required_params = []
-    optional_params = ["ehull_cutoff", "MAPI_KEY", "calc_dir"]
+    optional_params = ["ehull_cutoff", "MAPI_KEY", "calc_dir", "use_parse_cache"]
 
     def run_task(self, fw_spec):
         mpr = MPRester(env_chk(self.get("MAPI_KEY"), fw_spec))
         vasprun, outcar = get_vasprun_outcar(self.get("calc_dir", "."),
                                              parse_dos=False,
-                                             parse_eigen=False)
+                                             parse_eigen=False,
+                                             use_cache=self.get("use_parse_cache", PARSE_CACHE))
 
         my_entry = vasprun.get_computed_entry(inc_structure=False)
         stored_data = mpr.get_stability([my_entry])[0]
@@ -196,10 +207,12 @@ class CheckBandgap(FiretaskBase):
         min_gap: (float) minimum gap energy in eV to proceed
         max_gap: (float) maximum gap energy in eV to proceed
         vasprun_path: (str) path to vasprun.xml file
+        use_parse_cache (bool): whether to use the on-disk parse cache.
+            Defaults to PARSE_CACHE in atomate.vasp.config.
     """
 
     required_params = []
-    optional_params = ["min_gap", "max_gap", "vasprun_path"]
+    optional_params = ["min_gap", "max_gap", "vasprun_path", "use_parse_cache"]
 
     def run_task(self, fw_spec):
         vr_path = zpath(self.get("vasprun_path", "vasprun.xml"))
@@ -215,7 +228,8 @@ class CheckBandgap(FiretaskBase):
                 vr_path = relax_paths[-1]
 
         logger.info("Checking the gap of file: {}".format(vr_path))
-        vr = Vasprun(vr_path, parse_potcar_file=False)
+        vr = parse_vasp_output(Vasprun, vr_path, use_cache=self.get("use_parse_cache", PARSE_CACHE),
+                               parse_potcar_file=False)
         gap = vr.get_band_structure().get_band_gap()["energy"]
         stored_data = {"band_gap": gap}
         logger.info(
@@ -292,9 +306,201 @@ class GetInterpolatedPOSCAR(FiretaskBase):
         return structs[i]
 
 
+@explicit_serialize
+class SeedFromPreviousCalc(FiretaskBase):
+    """
+    Warm-start a VASP calculation from the closest completed calculation in
+    the tasks collection. Meant to run after the inputs are written and
+    before RunVaspCustodian.
+
+    The candidates are successful tasks with the same reduced formula and
+    number of sites, the same ENCUT, ISPIN, LSORBIT and k-point mesh, and a
+    structure matching the POSCAR within the StructureMatcher tolerances.
+    Spin-polarized candidates must also have the magnetic ordering of the
+    MAGMOM of the INCAR (up to a global spin flip): VASP keeps the moments of
+    the WAVECAR/CHGCAR it reads rather than MAGMOM, so a seed from another
+    magnetic ordering would converge to that ordering. The match with the
+    smallest RMS displacement is used. Its CHGCAR/WAVECAR are copied
+    (decompressed if needed) and ISTART/ICHARG are set to read them.
+    Optionally, its relaxed geometry replaces the POSCAR.
+
+    Whether and from where the calculation was seeded is written to
+    seeding.json, which the VaspDrone stores in the task doc under
+    "seeding", so the SCF/ionic step savings can be measured.
+
+    Required params:
+        db_file (str): path to file containing the database credentials.
+            Supports env_chk.
+
+    Optional params:
+        files_to_seed ([str]): output files to reuse. Default: ["CHGCAR", "WAVECAR"]
+        seed_geometry (bool): whether to start a relaxation (NSW > 0) from the
+            relaxed geometry of the matched calculation. Default: False
+        ltol (float): StructureMatcher tuning parameter. Default: 0.2
+        stol (float): StructureMatcher tuning parameter. Default: 0.3
+        angle_tol (float): StructureMatcher tuning parameter. Default: 5
+        max_candidates (int): maximum number of (most recent) candidate tasks
+            compared to the POSCAR. Default: 50
+    """
+    required_params = ["db_file"]
+    optional_params = ["files_to_seed", "seed_geometry", "ltol", "stol", "angle_tol",
+                       "max_candidates"]
+
+    def run_task(self, fw_spec):
+        seeding = self.seed(env_chk(self["db_file"], fw_spec))
+        with open("seeding.json", "w") as f:
+            json.dump(seeding, f)
+        return FWAction(stored_data={"seeding": seeding})
+
+    def seed(self, db_file):
+        """
+        Seed the calculation in the current directory.
+
+        Args:
+            db_file (str): path to file containing the database credentials
+
+        Returns:
+            (dict) seeding record
+        """
+        seeding = {"seeded": False}
+        incar = Incar.from_file("INCAR")
+        if incar.get("ICHARG", 0) >= 10 or incar.get("ISTART", 0) > 0:
+            seeding["reason"] = "calculation already starts from previous outputs"
+            return seeding
+        if not db_file:
+            seeding["reason"] = "no database"
+            return seeding
+
+        structure = Structure.from_file("POSCAR")
+        mmdb = VaspCalcDb.from_db_file(db_file, admin=True)
+        candidates = mmdb.collection.find(
+            {"state": "successful",
+             "formula_pretty": structure.composition.reduced_formula,
+             "nsites": len(structure)},
+            {"task_id": 1, "dir_name": 1, "output.structure": 1,
+             "input.incar.ENCUT": 1, "input.incar.ISPIN": 1, "input.incar.LSORBIT": 1,
+             "input.incar.KSPACING": 1, "input.incar.MAGMOM": 1, "input.kpoints.kpoints": 1,
+             "input.kpoints.generation_style": 1},
+            sort=[("last_updated", -1)], limit=self.get("max_candidates", 50))
+
+        matcher = StructureMatcher(ltol=self.get("ltol", 0.2), stol=self.get("stol", 0.3),
+                                   angle_tol=self.get("angle_tol", 5), primitive_cell=False,
+                                   scale=True, attempt_supercell=False)
+        kpoints = Kpoints.from_file("KPOINTS") if os.path.exists("KPOINTS") else None
+        magmoms = _get_magmoms(incar, len(structure))
+        best, best_rms = None, None
+        for doc in candidates:
+            prev_incar = doc.get("input", {}).get("incar", {})
+            if any(prev_incar.get(k, default) != incar.get(k, default)
+                   for k, default in [("ENCUT", None), ("ISPIN", 1), ("LSORBIT", False),
+                                      ("KSPACING", None)]):
+                continue
+            if kpoints and not _same_kpoints(kpoints, doc.get("input", {}).get("kpoints")):
+                continue
+            prev_structure = Structure.from_dict(doc["output"]["structure"])
+            rms = matcher.get_rms_dist(structure, prev_structure)
+            if rms is None or (best_rms is not None and rms[0] >= best_rms):
+                continue
+            if incar.get("ISPIN", 1) == 2 and not _same_magnetic_ordering(
+                    structure, magmoms, prev_structure,
+                    _get_magmoms(prev_incar, len(prev_structure))):
+                continue
+            best, best_rms = (doc, prev_structure), rms[0]
+        if best is None:
+            seeding["reason"] = "no matching calculation"
+            return seeding
+
+        doc, prev_structure = best
+        prev_dir = doc["dir_name"].split(":", 1)[-1]
+        seeded_files = []
+        for f in self.get("files_to_seed", ["CHGCAR", "WAVECAR"]):
+            prev_file = _get_output_file(prev_dir, f)
+            if prev_file and os.path.getsize(prev_file) > 0:
+                if prev_file.lower().endswith(".gz"):
+                    with gzip.open(prev_file, "rb") as f_in, open(f, "wb") as f_out:
+                        shutil.copyfileobj(f_in, f_out)
+                else:
+                    shutil.copy(prev_file, f)
+                seeded_files.append(f)
+
+        seed_geometry = self.get("seed_geometry", False) and incar.get("NSW", 0) > 0
+        if seed_geometry:
+            # relaxed geometry of the previous calc, with the sites ordered
+            # and decorated as in the current POSCAR
+            mapped = matcher.get_s2_like_s1(structure, prev_structure)
+            seeded = Structure(mapped.lattice, structure.species, mapped.frac_coords,
+                               site_properties=structure.site_properties)
+            seeded.to(fmt="POSCAR", filename="POSCAR")
+
+        if "WAVECAR" in seeded_files:
+            incar["ISTART"] = 1
+        elif "CHGCAR" in seeded_files:
+            incar["ICHARG"] = 1
+        incar.write_file("INCAR")
+
+        seeding.update({"seeded": bool(seeded_files or seed_geometry),
+                        "task_id": doc["task_id"], "dir_name": doc["dir_name"],
+                        "rms_dist": best_rms, "files": seeded_files,
+                        "geometry": seed_geometry})
+        logger.info("Seeded calculation from task {}: {}".format(
+            doc["task_id"], seeded_files + (["geometry"] if seed_geometry else [])))
+        return seeding
+
+
+def _get_magmoms(incar, nsites):
+    """
+    The initial magnetic moments of an INCAR, one row per site (3 columns
+    for non-collinear calculations), with the VASP default of 1 per site.
+    """
+    magmoms = np.array(incar.get("MAGMOM") or [1.0] * nsites, dtype=float)
+    return magmoms.reshape(nsites, -1)
+
+
+def _same_magnetic_ordering(structure, magmoms, prev_structure, prev_magmoms):
+    """
+    Whether two structures with the given initial magnetic moments have the
+    same magnetic ordering. Collinear orderings are compared up to a global
+    spin flip, non-collinear ones must be identical site by site.
+    """
+    if magmoms.shape != prev_magmoms.shape:
+        return False
+    if magmoms.shape[1] != 1:
+        return np.allclose(magmoms, prev_magmoms)
+    structure = structure.copy(site_properties={"magmom": magmoms[:, 0].tolist()})
+    prev_structure = prev_structure.copy(
+        site_properties={"magmom": prev_magmoms[:, 0].tolist()})
+    return CollinearMagneticStructureAnalyzer(structure).matches_ordering(prev_structure)
+
+
+def _same_kpoints(kpoints, prev_kpoints):
+    """
+    Whether a Kpoints and the kpoints of a task doc define the same mesh.
+    """
+    if not prev_kpoints or "kpoints" not in prev_kpoints:
+        return False
+    style = prev_kpoints.get("generation_style") or ""
+    return np.array_equal(np.array(kpoints.kpts, dtype=float),
+                          np.array(prev_kpoints["kpoints"], dtype=float)) and \
+        kpoints.style.name.lower()[0] == str(style).lower()[:1]
+
+
+def _get_output_file(calc_dir, filename):
+    """
+    Path to an output file of a VASP run, taking the last relaxation and
+    compression into account. None if the file does not exist.
+    """
+    paths = sorted(glob.glob(os.path.join(calc_dir, filename + ".relax*")))
+    if paths:
+        return paths[-1]
+    for ext in ["", ".gz", ".GZ"]:
+        if os.path.exists(os.path.join(calc_dir, filename + ext)):
+            return os.path.join(calc_dir, filename + ext)
+    return None
+
+
 def pass_vasp_result(pass_dict=None, calc_dir='.', filename="vasprun.xml.gz",
                      parse_eigen=False,
-                     parse_dos=False, **kwargs):
+                     parse_dos=False, use_parse_cache=PARSE_CACHE, **kwargs):
     """
     Function that gets a PassResult firework corresponding to output from a Vasprun.  Covers
     most use cases in which user needs to pass results from a vasp run to child FWs
@@ -321,6 +527,8 @@ def pass_vasp_result(pass_dict=None, calc_dir='.', filename="vasprun.xml.gz",
             defaults to false
         parse_eigen (bool): flag on whether or not to parse dos,
             defaults to false
+        use_parse_cache (bool): whether to load the Vasprun from the on-disk
+            parse cache. Defaults to PARSE_CACHE in atomate.vasp.config.
         **kwargs (keyword args): other keyword arguments passed to PassResult
             e.g. mod_spec_key or mod_spec_cmd
 
@@ -328,6 +536,9 @@ def pass_vasp_result(pass_dict=None, calc_dir='.', filename="vasprun.xml.gz",
     pass_dict = pass_dict or {"computed_entry": "a>>get_computed_entry"}
     parse_kwargs = {"filename": filename, "parse_eigen": parse_eigen,
                     "parse_dos": parse_dos}
+    if use_parse_cache and "parse_cache" not in kwargs:
+        kwargs["parse_cache"] = {"cache_dir": PARSE_CACHE_DIR,
+                                 "max_size": PARSE_CACHE_MAX_SIZE}
     return PassResult(pass_dict=pass_dict, calc_dir=calc_dir,
                       parse_kwargs=parse_kwargs,
                       parse_class="pymatgen.io.vasp.outputs.Vasprun", **kwargs)
@@ -7,7 +7,6 @@ import shutil
 
 from pymatgen.core import Structure
 from pymatgen.io.vasp import Incar, Kpoints, Poscar, Potcar
-from pymatgen_diffusion.neb.io import MVLCINEBSet, get_endpoint_dist, get_endpoints_from_index
 
 from fireworks.core.firework import FiretaskBase, FWAction
 from fireworks.utilities.fw_utilities import explicit_serialize
@@ -45,6 +44,7 @@ class TransferNEBTask(FiretaskBase):
     optional_params = ["d_img"]
 
     def run_task(self, fw_spec):
+        from pymatgen_diffusion.neb.io import get_endpoint_dist, get_endpoints_from_index
 
         label = self["label"]
         assert label in ["parent", "ep0", "ep1"] or "neb" in label, "Unknown label!"
@@ -245,6 +245,8 @@ class WriteNEBFromImages(FiretaskBase):
     optional_params = ["user_incar_settings", "user_kpoints_settings"]
 
     def run_task(self, fw_spec):
+        from pymatgen_diffusion.neb.io import MVLCINEBSet
+
         user_incar_settings = self.get("user_incar_settings", {})
         user_kpoints_settings = self.get("user_kpoints_settings", {})
         neb_label = self.get("neb_label")
@@ -16,24 +16,21 @@ from atomate.vasp.config import DEFUSE_UNSUCCESSFUL
 from fireworks import FiretaskBase, FWAction, explicit_serialize
 from fireworks.utilities.fw_serializers import DATETIME_HANDLER
 
-from pymatgen import Structure
-from pymatgen.analysis.elasticity.elastic import ElasticTensor, ElasticTensorExpansion
-from pymatgen.analysis.elasticity.strain import Strain, Deformation
-from pymatgen.analysis.elasticity.stress import Stress
-from pymatgen.electronic_structure.boltztrap import BoltztrapAnalyzer
-from pymatgen.io.vasp.sets import get_vasprun_outcar
+from pymatgen import Structure, Lattice
+from pymatgen.core.operations import SymmOp
 from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
-from pymatgen.analysis.ferroelectricity.polarization import Polarization, get_total_ionic_dipole, \
-    EnergyTrend
-from pymatgen.analysis.magnetism import CollinearMagneticStructureAnalyzer, Ordering, magnetic_deformation
-from pymatgen.command_line.bader_caller import bader_analysis_from_path
+
+# the analysis modules only used by some of the tasks (elasticity, boltztrap,
+# magnetism, ferroelectricity, bader) are imported in their run_task, so that
+# deserializing e.g. VaspToDb does not import them
 
 from atomate.common.firetasks.glue_tasks import get_calc_loc
+from atomate.utils.blob_store import resolve_blobs
 from atomate.utils.utils import env_chk, get_meta_from_structure
 from atomate.utils.utils import get_logger
 from atomate.vasp.database import VaspCalcDb
-from atomate.vasp.drones import VaspDrone, BADER_EXE_EXISTS
-from atomate.vasp.config import STORE_VOLUMETRIC_DATA
+from atomate.vasp.drones import VaspDrone, BADER_EXE_EXISTS, get_vasprun_outcar
+from atomate.vasp.config import STORE_VOLUMETRIC_DATA, PARSE_CACHE
 
 __author__ = 'Anubhav Jain, Kiran Mathew, Shyam Dwaraknath'
 __email__ = 'ajain@lbl.gov, kmathew@lbl.gov, shyamd@lbl.gov'
@@ -77,12 +74,18 @@ class VaspToDb(FiretaskBase):
             The path is a full mongo-style path so subdocuments can be referneced
             using dot notation and array keys can be referenced using the index.
             E.g "calcs_reversed.0.output.outar.run_stats"
+        use_parse_cache (bool): whether to store the parsed vasprun.xml/OUTCAR in the
+            on-disk parse cache for later firetasks. Defaults to PARSE_CACHE in
+            atomate.vasp.config.
+        binary_arrays (bool): store large output arrays (force constants) as
+            compressed binary arrays in GridFS instead of nested lists in the
+            task doc. Defaults to False.
     """
     optional_params = ["calc_dir", "calc_loc", "parse_dos", "bandstructure_mode",
                        "additional_fields", "db_file", "fw_spec_field", "defuse_unsuccessful",
                        "task_fields_to_push", "parse_chgcar", "parse_aeccar",
                        "parse_potcar_file", "parse_bader",
-                       "store_volumetric_data"]
+                       "store_volumetric_data", "use_parse_cache", "binary_arrays"]
 
     def run_task(self, fw_spec):
         # get the directory that contains the VASP dir to parse
@@ -102,7 +105,8 @@ class VaspToDb(FiretaskBase):
                           parse_bader=self.get("parse_bader", BADER_EXE_EXISTS),
                           parse_chgcar=self.get("parse_chgcar", False),  # deprecated
                           parse_aeccar=self.get("parse_aeccar", False),  # deprecated
-                          store_volumetric_data=self.get("store_volumetric_data", STORE_VOLUMETRIC_DATA))
+                          store_volumetric_data=self.get("store_volumetric_data", STORE_VOLUMETRIC_DATA),
+                          use_parse_cache=self.get("use_parse_cache", PARSE_CACHE))
 
         # assimilate (i.e., parse)
         task_doc = drone.assimilate(calc_dir)
@@ -125,7 +129,8 @@ class VaspToDb(FiretaskBase):
                 or bool(self.get("bandstructure_mode", False))
                 or self.get("parse_chgcar", False)  # deprecated
                 or self.get("parse_aeccar", False)  # deprecated
-                or bool(self.get("store_volumetric_data", STORE_VOLUMETRIC_DATA)))
+                or bool(self.get("store_volumetric_data", STORE_VOLUMETRIC_DATA)),
+                binary_arrays=self.get("binary_arrays", False))
             logger.info("Finished parsing with task_id: {}".format(t_id))
 
         defuse_children = False
@@ -207,11 +212,15 @@ class BoltztrapToDb(FiretaskBase):
             Supports env_chk. Default: write data to JSON file.
         hall_doping (bool): set True to retain hall_doping in dict
         additional_fields (dict): fields added to the document such as user-defined tags or name, ids, etc
+        use_parse_cache (bool): whether to use the on-disk parse cache.
+            Defaults to PARSE_CACHE in atomate.vasp.config.
     """
 
-    optional_params = ["db_file", "hall_doping", "additional_fields"]
+    optional_params = ["db_file", "hall_doping", "additional_fields", "use_parse_cache"]
 
     def run_task(self, fw_spec):
+        from pymatgen.electronic_structure.boltztrap import BoltztrapAnalyzer
+
         additional_fields = self.get("additional_fields", {})
 
         # pass the additional_fields first to avoid overriding BoltztrapAnalyzer items
@@ -235,7 +244,8 @@ class BoltztrapToDb(FiretaskBase):
         d["bandstructure_dir"] = bandstructure_dir
 
         # add the structure
-        v, o = get_vasprun_outcar(bandstructure_dir, parse_eigen=False, parse_dos=False)
+        v, o = get_vasprun_outcar(bandstructure_dir, parse_eigen=False, parse_dos=False,
+                                  use_cache=self.get("use_parse_cache", PARSE_CACHE))
         structure = v.final_structure
         d["structure"] = structure.as_dict()
         d["formula_pretty"] = structure.composition.reduced_formula
@@ -293,29 +303,39 @@ class ElasticTensorToDb(FiretaskBase):
             "independent", "pseudoinverse", and "finite_difference."
             Note that order 3 and higher required finite difference
             fitting, and will override.
+        use_parse_cache (bool): whether to use the on-disk parse cache when
+            parsing the optimization run. Defaults to PARSE_CACHE in
+            atomate.vasp.config.
+
+    The relaxed structure and stress of the optimization run are read from
+    its task document if db_file is set; the optimization directory is only
+    parsed if that document cannot be found.
     """
 
     required_params = ['structure']
-    optional_params = ['db_file', 'order', 'fw_spec_field', 'fitting_method']
+    optional_params = ['db_file', 'order', 'fw_spec_field', 'fitting_method', 'use_parse_cache']
 
     def run_task(self, fw_spec):
-        ref_struct = self['structure']
+        from pymatgen.analysis.elasticity.elastic import ElasticTensor, \
+            ElasticTensorExpansion
+        from pymatgen.analysis.elasticity.stress import Stress
+
+        ref_struct = resolve_blobs(self['structure'], fw_spec)
         d = {
             "analysis": {},
-            "initial_structure": self['structure'].as_dict()
+            "initial_structure": ref_struct.as_dict()
         }
 
         # Get optimized structure
         calc_locs_opt = [cl for cl in fw_spec.get('calc_locs', []) if 'optimiz' in cl['name']]
         if calc_locs_opt:
             optimize_loc = calc_locs_opt[-1]['path']
-            logger.info("Parsing initial optimization directory: {}".format(optimize_loc))
-            drone = VaspDrone()
-            optimize_doc = drone.assimilate(optimize_loc)
-            opt_struct = Structure.from_dict(optimize_doc["calcs_reversed"][0]["output"]["structure"])
+            opt_struct, opt_stress = self._get_optimization_output(
+                optimize_loc, env_chk(self.get('db_file'), fw_spec),
+                ref_struct.composition.reduced_formula)
             d.update({"optimized_structure": opt_struct.as_dict()})
             ref_struct = opt_struct
-            eq_stress = -0.1*Stress(optimize_doc["calcs_reversed"][0]["output"]["ionic_steps"][-1]["stress"])
+            eq_stress = -0.1*Stress(opt_stress)
         else:
             eq_stress = None
 
@@ -323,21 +343,8 @@ class ElasticTensorToDb(FiretaskBase):
             d.update({self.get("fw_spec_field"): fw_spec.get(self.get("fw_spec_field"))})
 
         # Get the stresses, strains, deformations from deformation tasks
-        defo_dicts = fw_spec["deformation_tasks"].values()
-        stresses, strains, deformations = [], [], []
-        for defo_dict in defo_dicts:
-            stresses.append(Stress(defo_dict["stress"]))
-            strains.append(Strain(defo_dict["strain"]))
-            deformations.append(Deformation(defo_dict["deformation_matrix"]))
-            # Add derived stresses and strains if symmops is present
-            for symmop in defo_dict.get("symmops", []):
-                stresses.append(Stress(defo_dict["stress"]).transform(symmop))
-                strains.append(Strain(defo_dict["strain"]).transform(symmop))
-                deformations.append(Deformation(defo_dict["deformation_matrix"]).transform(symmop))
-
-        stresses = [-0.1*s for s in stresses]
-        pk_stresses = [stress.piola_kirchoff_2(deformation)
-                       for stress, deformation in zip(stresses, deformations)]
+        stresses, strains, deformations, pk_stresses = get_elastic_fitting_data(
+            resolve_blobs(fw_spec["deformation_tasks"], fw_spec).values())
 
         d['fitting_data'] = {'cauchy_stresses': stresses,
                              'eq_stress': eq_stress,
@@ -401,6 +408,36 @@ class ElasticTensorToDb(FiretaskBase):
 
         return FWAction()
 
+    def _get_optimization_output(self, optimize_loc, db_file, formula_pretty):
+        """
+        Get the relaxed structure and final stress of the optimization run.
+        The (already inserted) task document of the optimization is used if
+        possible, fetching only the required fields; the optimization
+        directory is parsed with the VaspDrone as a fallback.
+
+        Returns:
+            (Structure, stress as 3x3 list)
+        """
+        if db_file:
+            mmdb = VaspCalcDb.from_db_file(db_file, admin=True)
+            # dir_name may carry a "hostname:" prefix that depends on the worker
+            doc = mmdb.collection.find_one(
+                {"formula_pretty": formula_pretty,
+                 "dir_name": {"$regex": "(^|:){}$".format(re.escape(optimize_loc))}},
+                {"calcs_reversed.output.structure": 1, "output.stress": 1, "task_id": 1},
+                sort=[("last_updated", -1)])
+            if doc and doc.get("output", {}).get("stress") is not None:
+                logger.info("Using optimization task {} for {}".format(
+                    doc["task_id"], optimize_loc))
+                return (Structure.from_dict(doc["calcs_reversed"][0]["output"]["structure"]),
+                        doc["output"]["stress"])
+
+        logger.info("Parsing initial optimization directory: {}".format(optimize_loc))
+        drone = VaspDrone(use_parse_cache=self.get("use_parse_cache", PARSE_CACHE))
+        optimize_doc = drone.assimilate(optimize_loc)
+        return (Structure.from_dict(optimize_doc["calcs_reversed"][0]["output"]["structure"]),
+                optimize_doc["calcs_reversed"][0]["output"]["ionic_steps"][-1]["stress"])
+
 
 @explicit_serialize
 class RamanTensorToDb(FiretaskBase):
@@ -418,10 +455,12 @@ class RamanTensorToDb(FiretaskBase):
     optional_params = ["db_file"]
 
     def run_task(self, fw_spec):
-        nm_eigenvecs = np.array(fw_spec["normalmodes"]["eigenvecs"])
-        nm_eigenvals = np.array(fw_spec["normalmodes"]["eigenvals"])
+        normalmodes = resolve_blobs(fw_spec["normalmodes"], fw_spec)
+        raman_epsilon = resolve_blobs(fw_spec["raman_epsilon"], fw_spec)
+        nm_eigenvecs = np.array(normalmodes["eigenvecs"])
+        nm_eigenvals = np.array(normalmodes["eigenvals"])
         nm_norms = np.linalg.norm(nm_eigenvecs, axis=2)
-        structure = fw_spec["normalmodes"]["structure"]
+        structure = normalmodes["structure"]
         masses = np.array([site.specie.data['Atomic mass'] for site in structure])
         nm_norms = nm_norms / np.sqrt(masses)  # eigenvectors in vasprun.xml are not divided by sqrt(M_i)
         # To get the actual eigenvals, the values read from vasprun.xml must be multiplied by -1.
@@ -432,18 +471,18 @@ class RamanTensorToDb(FiretaskBase):
 
         d = {"structure": structure.as_dict(),
              "formula_pretty": structure.composition.reduced_formula,
-             "normalmodes": {"eigenvals": fw_spec["normalmodes"]["eigenvals"],
-                             "eigenvecs": fw_spec["normalmodes"]["eigenvecs"]
+             "normalmodes": {"eigenvals": nm_eigenvals.tolist(),
+                             "eigenvecs": nm_eigenvecs.tolist()
                              },
              "frequencies": nm_frequencies.tolist()}
 
         # store the displacement & epsilon for each mode in a dictionary
-        mode_disps = fw_spec["raman_epsilon"].keys()
+        mode_disps = raman_epsilon.keys()
         modes_eps_dict = defaultdict(list)
         for md in mode_disps:
-            modes_eps_dict[fw_spec["raman_epsilon"][md]["mode"]].append(
-                [fw_spec["raman_epsilon"][md]["displacement"],
-                 fw_spec["raman_epsilon"][md]["epsilon"]])
+            modes_eps_dict[raman_epsilon[md]["mode"]].append(
+                [raman_epsilon[md]["displacement"],
+                 raman_epsilon[md]["epsilon"]])
 
         # raman tensor = finite difference derivative of epsilon wrt displacement.
         raman_tensor_dict = {}
@@ -473,6 +512,85 @@ class RamanTensorToDb(FiretaskBase):
         return FWAction()
 
 
+def get_calc_fields(collection, query, fields, calc_index=-1, extra_fields=None):
+    """
+    Fetch only the given fields of one calculation in calcs_reversed for all the
+    task docs matching the query. Uses an aggregation pipeline, so the rest of the
+    calculation history (ionic steps, DOS, etc.) never leaves the database.
+
+    Args:
+        collection (Collection): the tasks collection
+        query (dict): query for the task docs
+        fields (dict): {name: path inside calcs_reversed.N}, e.g.
+            {"energy": "output.energy"}
+        calc_index (int): index of the calculation in calcs_reversed
+        extra_fields (list): top-level fields of the task docs to include,
+            e.g. ["task_id", "task_label"]
+
+    Returns:
+        list of dicts with the keys of fields and extra_fields. The fields
+            missing from the calculation are left out.
+    """
+    project = {"_id": 0}
+    for f in extra_fields or []:
+        project[f] = 1
+    # the calculation is picked before the path is read: "$calcs_reversed.<path>"
+    # only holds the calculations that have the path, so calc_index could select
+    # another calculation
+    for name, path in fields.items():
+        project[name] = {"$let": {
+            "vars": {"calc": {"$arrayElemAt": ["$calcs_reversed", calc_index]}},
+            "in": "$$calc.{}".format(path)}}
+    return list(collection.aggregate([{"$match": query}, {"$project": project}]))
+
+
+def get_elastic_fitting_data(defo_dicts):
+    """
+    Stack the stresses, strains and deformations of the deformation tasks of
+    an elastic workflow, including the ones derived by the symmetry
+    operations of each task (from sym_reduce), and convert the stresses to
+    second Piola-Kirchhoff stresses. All symmetry transforms and PK2
+    conversions are done at once with einsum, in the same order as one
+    Stress/Strain/Deformation at a time.
+
+    Args:
+        defo_dicts ([dict]): "stress", "strain", "deformation_matrix" and,
+            optionally, "symmops" of each deformation task
+
+    Returns:
+        (cauchy stresses in GPa, strains, deformations, pk2 stresses), each an
+            Nx3x3 array
+    """
+    defo_dicts = list(defo_dicts)
+    index, rotations = [], []
+    for i, defo_dict in enumerate(defo_dicts):
+        index.append(i)
+        rotations.append(np.eye(3))
+        for symmop in defo_dict.get("symmops", []):
+            if isinstance(symmop, dict):
+                symmop = SymmOp.from_dict(symmop)
+            index.append(i)
+            rotations.append(symmop.rotation_matrix)
+    rotations = np.array(rotations)
+
+    def transform(key):
+        tensors = np.array([d[key] for d in defo_dicts], dtype=float)[index]
+        return np.einsum("nac,nbd,ncd->nab", rotations, rotations, tensors)
+
+    stresses = -0.1 * transform("stress")
+    strains = transform("strain")
+    deformations = transform("deformation_matrix")
+
+    sym_stresses = (stresses + stresses.transpose(0, 2, 1)) / 2
+    if not (stresses - sym_stresses < 1e-5).all():
+        raise ValueError("The stress tensor is not symmetric, PK stress is based "
+                         "on a symmetric stress tensor.")
+    inv = np.linalg.inv(deformations)
+    pk_stresses = np.linalg.det(deformations)[:, None, None] * \
+        np.einsum("nij,njk,nlk->nil", inv, stresses, inv)
+    return stresses, strains, deformations, pk_stresses
+
+
 # TODO: @computron: this requires a "tasks" collection to proceed. Merits of changing to FW passing
 # method? -computron
 # TODO: @computron: even if you use the db-centric method, embed information in tags rather than
@@ -507,12 +625,15 @@ class GibbsAnalysisToDb(FiretaskBase):
             Gibbs energy from the Debye model. Defaults to False.
         pressure (float): in GPa, optional.
         metadata (dict): meta data
+        nprocs (int): number of processes computing the phonon thermal properties
+            of the volumes in parallel with qha_type "phonopy". Defaults to 1;
+            None uses all available cores.
 
     """
 
     required_params = ["tag", "db_file"]
     optional_params = ["qha_type", "t_min", "t_step", "t_max", "mesh", "eos",
-                       "pressure", "poisson", "anharmonic_contribution", "metadata"]
+                       "pressure", "poisson", "anharmonic_contribution", "metadata", "nprocs"]
 
     def run_task(self, fw_spec):
 
@@ -534,24 +655,28 @@ class GibbsAnalysisToDb(FiretaskBase):
         mmdb = VaspCalcDb.from_db_file(db_file, admin=True)
         # get the optimized structure
         d = mmdb.collection.find_one({"task_label": "{} structure optimization".format(tag)},
-                                     {"calcs_reversed": 1})
+                                     {"calcs_reversed.output.structure": 1})
         structure = Structure.from_dict(d["calcs_reversed"][-1]["output"]['structure'])
         gibbs_dict["structure"] = structure.as_dict()
         gibbs_dict["formula_pretty"] = structure.composition.reduced_formula
 
         # get the data(energy, volume, force constant) from the deformation runs
-        docs = mmdb.collection.find({"task_label": {"$regex": "{} gibbs*".format(tag)},
-                                     "formula_pretty": structure.composition.reduced_formula},
-                                    {"calcs_reversed": 1})
+        fields = {"energy": "output.energy", "lattice": "output.structure.lattice.matrix"}
+        if qha_type not in ["debye_model"]:
+            fields.update({"force_constants": "output.force_constants",
+                           "force_constants_fs_id": "output.force_constants_fs_id"})
+        docs = get_calc_fields(mmdb.collection,
+                               {"task_label": {"$regex": "{} gibbs*".format(tag)},
+                                "formula_pretty": structure.composition.reduced_formula},
+                               fields)
         energies = []
         volumes = []
         force_constants = []
         for d in docs:
-            s = Structure.from_dict(d["calcs_reversed"][-1]["output"]['structure'])
-            energies.append(d["calcs_reversed"][-1]["output"]['energy'])
+            energies.append(d['energy'])
             if qha_type not in ["debye_model"]:
-                force_constants.append(d["calcs_reversed"][-1]["output"]['force_constants'])
-            volumes.append(s.volume)
+                force_constants.append(mmdb.get_calc_array(d, "force_constants"))
+            volumes.append(Lattice(d['lattice']).volume)
         gibbs_dict["energies"] = energies
         gibbs_dict["volumes"] = volumes
         if qha_type not in ["debye_model"]:
@@ -576,7 +701,8 @@ class GibbsAnalysisToDb(FiretaskBase):
                 from atomate.vasp.analysis.phonopy import get_phonopy_gibbs
 
                 G, T = get_phonopy_gibbs(energies, volumes, force_constants, structure, t_min,
-                                         t_step, t_max, mesh, eos, pressure)
+                                         t_step, t_max, mesh, eos, pressure,
+                                         nprocs=self.get("nprocs", 1))
                 gibbs_dict["gibbs_free_energy"] = G
                 gibbs_dict["temperatures"] = T
                 gibbs_dict["success"] = True
@@ -648,8 +774,9 @@ class FitEOSToDb(FiretaskBase):
 
         mmdb = VaspCalcDb.from_db_file(db_file, admin=True)
 
-        d = mmdb.collection.find_one({"task_label": "{} structure optimization".format(tag)})
-        docs = mmdb.collection.find({"task_label": {"$regex": "{} bulk_modulus*".format(tag)}})
+        d = mmdb.collection.find_one({"task_label": "{} structure optimization".format(tag)},
+                                     {"task_id": 1, "calcs_reversed.output.structure": 1})
+        query = {"task_label": {"$regex": "{} bulk_modulus*".format(tag)}}
 
         if d:
             # get the optimized structure and optimization task_id
@@ -658,19 +785,23 @@ class FitEOSToDb(FiretaskBase):
         else:
             # no structure optimization in the workflow
             # get the original structure from the transformation information
-            structure_dict = docs[0]["transformations"]["history"][0]["input_structure"]
+            d = mmdb.collection.find_one(query, {"transformations.history.input_structure": 1})
+            structure_dict = d["transformations"]["history"][0]["input_structure"]
 
         structure = Structure.from_dict(structure_dict)
         summary_dict["structure"] = structure.as_dict()
         summary_dict["formula_pretty"] = structure.composition.reduced_formula
 
         # get the data (energy, volume, force constant) from the deformation runs
+        docs = get_calc_fields(mmdb.collection, query,
+                               {"energy": "output.energy",
+                                "lattice": "output.structure.lattice.matrix"},
+                               extra_fields=["task_id"])
         energies = []
         volumes = []
         for d in docs:
-            s = Structure.from_dict(d["calcs_reversed"][-1]["output"]['structure'])
-            energies.append(d["calcs_reversed"][-1]["output"]['energy'])
-            volumes.append(s.volume)
+            energies.append(d['energy'])
+            volumes.append(Lattice(d['lattice']).volume)
             all_task_ids.append(d["task_id"])
         summary_dict["energies"] = energies
         summary_dict["volumes"] = volumes
@@ -720,10 +851,12 @@ class ThermalExpansionCoeffToDb(FiretaskBase):
         eos (str): equation of state used for fitting the energies and the volumes.
             options supported by phonopy: "vinet" (default), "murnaghan", "birch_murnaghan".
         pressure (float): in GPa, optional.
+        nprocs (int): number of processes computing the phonon thermal properties of
+            the volumes in parallel. Defaults to 1; None uses all available cores.
     """
 
     required_params = ["tag", "db_file"]
-    optional_params = ["t_min", "t_step", "t_max", "mesh", "eos", "pressure"]
+    optional_params = ["t_min", "t_step", "t_max", "mesh", "eos", "pressure", "nprocs"]
 
     def run_task(self, fw_spec):
 
@@ -741,32 +874,40 @@ class ThermalExpansionCoeffToDb(FiretaskBase):
 
         mmdb = VaspCalcDb.from_db_file(db_file, admin=True)
 
-        docs = mmdb.collection.find({"task_label": {"$regex": "{} thermal_expansion*".format(tag)}})
+        query = {"task_label": {"$regex": "{} thermal_expansion*".format(tag)}}
 
         # get the original structure from the transformation information
-        structure_dict = docs[0]["transformations"]["history"][0]["input_structure"]
+        d = mmdb.collection.find_one(query, {"transformations.history.input_structure": 1})
+        structure_dict = d["transformations"]["history"][0]["input_structure"]
         structure = Structure.from_dict(structure_dict)
         summary_dict["structure"] = structure.as_dict()
         summary_dict["formula_pretty"] = structure.composition.reduced_formula
 
         # get the data(energy, volume, force constant) from the deformation runs
+        docs = get_calc_fields(mmdb.collection, query,
+                               {"energy": "output.energy",
+                                "lattice": "output.structure.lattice.matrix",
+                                "force_constants": "output.force_constants",
+                                "force_constants_fs_id": "output.force_constants_fs_id"})
         energies = []
         volumes = []
         force_constants = []
         for d in docs:
-            s = Structure.from_dict(d["calcs_reversed"][-1]["output"]['structure'])
-            energies.append(d["calcs_reversed"][-1]["output"]['energy'])
-            volumes.append(s.volume)
-            force_constants.append(d["calcs_reversed"][-1]["output"]['force_constants'])
+            energies.append(d['energy'])
+            volumes.append(Lattice(d['lattice']).volume)
+            force_constants.append(mmdb.get_calc_array(d, "force_constants"))
         summary_dict["energies"] = energies
         summary_dict["volumes"] = volumes
         summary_dict["force_constants"] = force_constants
 
         alpha, T = get_phonopy_thermal_expansion(energies, volumes, force_constants, structure,
-                                                 t_min, t_step, t_max, mesh, eos, pressure)
+                                                 t_min, t_step, t_max, mesh, eos, pressure,
+                                                 nprocs=self.get("nprocs", 1))
 
         summary_dict["alpha"] = alpha
         summary_dict["T"] = T
+        # the force constants (and alpha, T) are numpy arrays
+        summary_dict = jsanitize(summary_dict)
 
         with open("thermal_expansion.json", "w") as f:
             f.write(json.dumps(summary_dict, default=DATETIME_HANDLER))
@@ -813,6 +954,9 @@ class MagneticOrderingsToDb(FiretaskBase):
     optional_params = ["origins", "input_index", "to_db", "additional_fields"]
 
     def run_task(self, fw_spec):
+        from pymatgen.analysis.magnetism import CollinearMagneticStructureAnalyzer
+        from pymatgen.command_line.bader_caller import bader_analysis_from_path
+
         additional_fields = self.get("additional_fields", {})
 
         uuid = self["wf_uuid"]
@@ -824,12 +968,28 @@ class MagneticOrderingsToDb(FiretaskBase):
         formula = self["parent_structure"].formula
         formula_pretty = self["parent_structure"].composition.reduced_formula
 
-        # get ground state energy
+        # get the optimize and static tasks of all orderings in one query,
+        # fetching only the fields needed for the analysis
+        fields = ["task_id", "task_label", "dir_name", "wf_meta", "bader.magmom",
+                  "input.structure", "input.incar.MAGMOM",
+                  "output.energy_per_atom", "output.structure",
+                  "calcs_reversed.output.outcar.total_magnetization",
+                  "calcs_reversed.composition_reduced",
+                  "calcs_reversed.composition_unit_cell"]
+        all_docs = list(mmdb.collection.find({"wf_meta.wf_uuid": uuid,
+                                              "task_label": {"$regex": "static|optimize"}},
+                                             fields))
+
+        def get_ordering_index(task_label):
+            task_label = task_label.split(' ')
+            return int(task_label[task_label.index('ordering') + 1])
+
         task_label_regex = 'static' if not self['scan'] else 'optimize'
-        docs = list(mmdb.collection.find({"wf_meta.wf_uuid": uuid,
-                                          "task_label": {"$regex": task_label_regex}},
-                                         ["task_id", "output.energy_per_atom"]))
+        docs = [d for d in all_docs if re.search(task_label_regex, d["task_label"])]
+        optimize_docs = {get_ordering_index(d["task_label"]): d for d in all_docs
+                         if re.search("optimize", d["task_label"])}
 
+        # get ground state energy
         energies = [d["output"]["energy_per_atom"] for d in docs]
         ground_state_energy = min(energies)
         idx = energies.index(ground_state_energy)
@@ -839,33 +999,32 @@ class MagneticOrderingsToDb(FiretaskBase):
                         "duplicate calculations for {}?".format(formula))
 
         # get results for different orderings
-        docs = list(mmdb.collection.find({
-            "task_label": {"$regex": task_label_regex},
-            "wf_meta.wf_uuid": uuid
-        }))
-
         summaries = []
 
         for d in docs:
 
+            # tells us the order in which structure was guessed
+            # 1 is FM, then AFM..., -1 means it was entered manually
+            # useful to give us statistics about how many orderings
+            # we actually need to calculate
+            ordering_index = get_ordering_index(d["task_label"])
+
             # Check if optimizations were done
-            if additional_fields.get("relax", True):
-                optimize_task_label = d["task_label"].replace("static", "optimize")
-                optimize_task = dict(mmdb.collection.find_one({
-                            "wf_meta.wf_uuid": uuid,
-                            "task_label": optimize_task_label
-                        }))
+            optimize_task = optimize_docs.get(ordering_index)
+            if additional_fields.get("relax", True) and optimize_task:
                 # used to determine if ordering changed during relaxation
                 original_task = optimize_task
                 # stored for checking suitable convergence is reached
                 energy_diff_relax_static = optimize_task["output"]["energy_per_atom"] \
                                                        - d["output"]["energy_per_atom"]
             else:
+                if additional_fields.get("relax", True):
+                    logger.warning("No optimization found for {}".format(d["task_label"]))
                 original_task = d
                 energy_diff_relax_static = None
 
-            input_structure = Structure.from_dict(optimize_task['input']['structure'])
-            input_magmoms = optimize_task['input']['incar']['MAGMOM']
+            input_structure = Structure.from_dict(original_task['input']['structure'])
+            input_magmoms = original_task['input']['incar']['MAGMOM']
             input_structure.add_site_property('magmom', input_magmoms)
 
             final_structure = Structure.from_dict(d["output"]["structure"])
@@ -885,13 +1044,6 @@ class MagneticOrderingsToDb(FiretaskBase):
             energy_above_ground_state_per_atom = d["output"]["energy_per_atom"] \
                                                  - ground_state_energy
 
-            # tells us the order in which structure was guessed
-            # 1 is FM, then AFM..., -1 means it was entered manually
-            # useful to give us statistics about how many orderings
-            # we actually need to calculate
-            task_label = d["task_label"].split(' ')
-            ordering_index = task_label.index('ordering')
-            ordering_index = int(task_label[ordering_index + 1])
             if self.get("origins", None):
                 ordering_origin = self["origins"][ordering_index]
             else:
@@ -1001,6 +1153,8 @@ class MagneticDeformationToDb(FiretaskBase):
     optional_params = ["to_db"]
 
     def run_task(self, fw_spec):
+        from pymatgen.analysis.magnetism import CollinearMagneticStructureAnalyzer, \
+            Ordering, magnetic_deformation
 
         uuid = self["wf_uuid"]
         db_file = env_chk(self.get("db_file"), fw_spec)
@@ -1078,13 +1232,20 @@ class PolarizationToDb(FiretaskBase):
     optional_params = ["db_file"]
 
     def run_task(self, fw_spec):
+        from pymatgen.analysis.ferroelectricity.polarization import Polarization, \
+            get_total_ionic_dipole, EnergyTrend
 
         wfid = list(filter(lambda x: 'wfid' in x, fw_spec['tags'])).pop()
         db_file = env_chk(self.get("db_file"), fw_spec)
         vaspdb = VaspCalcDb.from_db_file(db_file, admin=True)
 
         # ferroelectric workflow groups calculations by generated wfid tag
-        polarization_tasks = vaspdb.collection.find({"tags": wfid, "task_label": {"$regex": ".*polarization"}})
+        polarization_tasks = get_calc_fields(
+            vaspdb.collection, {"tags": wfid, "task_label": {"$regex": ".*polarization"}},
+            {"energy_per_atom": "output.energy_per_atom", "energy": "output.energy",
+             "p_elec": "output.outcar.p_elec", "zval_dict": "output.outcar.zval_dict",
+             "structure": "input.structure"},
+            calc_index=0, extra_fields=["task_label"])
 
         tasks = []
         outcars = []
@@ -1096,12 +1257,13 @@ class PolarizationToDb(FiretaskBase):
 
         for p in polarization_tasks:
             # Grab data from each polarization task
-            energies_per_atom.append(p['calcs_reversed'][0]['output']['energy_per_atom'])
-            energies.append(p['calcs_reversed'][0]['output']['energy'])
+            energies_per_atom.append(p['energy_per_atom'])
+            energies.append(p['energy'])
             tasks.append(p['task_label'])
-            outcars.append(p['calcs_reversed'][0]['output']['outcar'])
-            structure_dicts.append(p['calcs_reversed'][0]['input']['structure'])
-            zval_dicts.append(p['calcs_reversed'][0]['output']['outcar']['zval_dict'])
+            # only the parts of the outcar used for the polarization
+            outcars.append({'p_elec': p['p_elec'], 'zval_dict': p['zval_dict']})
+            structure_dicts.append(p['structure'])
+            zval_dicts.append(p['zval_dict'])
 
             # Add weight for sorting
             # Want polarization calculations in order of nonpolar to polar for Polarization object
@@ -13,10 +13,17 @@ This module defines tasks that support running vasp in various ways.
 import shutil
 import shlex
 import os
+import re
 import subprocess
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
 
-from pymatgen.io.vasp import Incar, Kpoints, Poscar, Potcar
-from pymatgen.io.vasp.sets import get_vasprun_outcar
+from monty.os import cd
+from monty.serialization import dumpfn
+
+from pymatgen.io.vasp import Incar, Kpoints, Poscar, Potcar, Vasprun
 from pymatgen.electronic_structure.boltztrap import BoltztrapRunner
 
 from custodian import Custodian
@@ -27,10 +34,15 @@ from custodian.vasp.handlers import VaspErrorHandler, AliasingErrorHandler, \
 from custodian.vasp.jobs import VaspJob, VaspNEBJob
 from custodian.vasp.validators import VasprunXMLValidator, VaspFilesValidator
 
-from fireworks import explicit_serialize, FiretaskBase, FWAction
+from fireworks import explicit_serialize, FiretaskBase, FWAction, Firework
+from fireworks.utilities.dict_mods import apply_mod
+from fireworks.utilities.fw_serializers import load_object
 
-from atomate.utils.utils import env_chk, get_logger
-from atomate.vasp.config import CUSTODIAN_MAX_ERRORS
+from atomate.utils.utils import env_chk, get_logger, get_allocation_cores
+from atomate.vasp.config import CUSTODIAN_MAX_ERRORS, PARSE_CACHE, VASP_OUTPUT_FILES
+from atomate.vasp.drones import get_vasprun_outcar
+from atomate.vasp.firetasks.glue_tasks import CopyVaspOutputs, _get_output_file
+from atomate.vasp.firetasks.write_inputs import ModifyIncar
 
 __author__ = 'Anubhav Jain <ajain@lbl.gov>'
 __credits__ = 'Shyue Ping Ong <ong.sp>'
@@ -89,11 +101,21 @@ class RunVaspCustodian(FiretaskBase):
             Supports env_chk.
         wall_time (int): Total wall time in seconds. Activates WalltimeHandler if set.
         half_kpts_first_relax (bool): Use half the k-points for the first relaxation
+        continuation (dict): if set, a run stopped by the WalltimeHandler is
+            continued in a new Firework, added as a detour, that resumes from
+            its CONTCAR (and WAVECAR/CHGCAR), runs VASP and then the tasks
+            given in continuation["tasks"] (usually the rest of the current
+            Firework, which is skipped). The continuation segments are merged
+            in a single task doc by the VaspDrone. Other keys: "name" (name of
+            the continuation FireWorks) and "max_segments" (default: 5). The
+            WalltimeHandler is added even without wall_time, in which case it
+            reads the wall time from the queue system. See
+            add_walltime_continuation in atomate.vasp.powerups.
     """
     required_params = ["vasp_cmd"]
     optional_params = ["job_type", "handler_group", "max_force_threshold", "scratch_dir",
                        "gzip_output", "max_errors", "ediffg", "auto_npar", "gamma_vasp_cmd",
-                       "wall_time","half_kpts_first_relax"]
+                       "wall_time","half_kpts_first_relax", "continuation"]
 
     def run_task(self, fw_spec):
 
@@ -196,23 +218,310 @@ class RunVaspCustodian(FiretaskBase):
         if self.get("max_force_threshold"):
             handlers.append(MaxForceErrorHandler(max_force_threshold=self["max_force_threshold"]))
 
-        if self.get("wall_time"):
-            handlers.append(WalltimeHandler(wall_time=self["wall_time"]))
+        if self.get("wall_time") or self.get("continuation"):
+            handlers.append(WalltimeHandler(wall_time=self.get("wall_time")))
 
         if job_type == "neb":
             validators = []  # CINEB vasprun.xml sometimes incomplete, file structure different
         else:
             validators = [VasprunXMLValidator(), VaspFilesValidator()]
 
+        continuation = self.get("continuation")
+        if continuation and continuation.get("prev_dirs"):
+            dumpfn({k: continuation[k] for k in ("segment", "prev_dirs")},
+                   "continuation.json")
+
         c = Custodian(handlers, jobs, validators=validators, max_errors=max_errors,
                       scratch_dir=scratch_dir, gzipped_output=gzip_output)
 
         c.run()
 
         if os.path.exists(zpath("custodian.json")):
-            stored_custodian_data = {"custodian": loadfn(zpath("custodian.json"))}
+            custodian_log = loadfn(zpath("custodian.json"))
+            stored_custodian_data = {"custodian": custodian_log}
+            job_index = get_interrupted_job(custodian_log) if continuation else None
+            if job_index is not None:
+                # the outputs of the interrupted job are not suffixed by
+                # custodian, but the earlier jobs of the sequence are
+                suffix = custodian_log[job_index]["job"].get("suffix", "")
+                if suffix:
+                    for f in VASP_OUTPUT_FILES:
+                        for ext in ["", ".gz", ".GZ"]:
+                            if os.path.exists(f + ext):
+                                shutil.move(f + ext, f + suffix + ext)
+                # the number of jobs of full_opt_run is not known in advance
+                last_job = isinstance(jobs, list) and job_index == len(jobs) - 1
+                return FWAction(stored_data=stored_custodian_data,
+                                detours=[self.get_continuation_fw(fw_spec, last_job)],
+                                exit=True)
             return FWAction(stored_data=stored_custodian_data)
 
+    def get_continuation_fw(self, fw_spec, last_job=True):
+        """
+        Firework resuming the current run, stopped by the WalltimeHandler.
+
+        Args:
+            fw_spec (dict): spec of the current Firework
+            last_job (bool): whether the run was stopped in the last job of a
+                multi-job job_type. If so, the continuation runs a single
+                "normal" job, otherwise the whole sequence is restarted from
+                the checkpoint.
+
+        Returns:
+            Firework
+        """
+        continuation = dict(self["continuation"])
+        segment = continuation.get("segment", 0) + 1
+        if segment >= continuation.get("max_segments", 5):
+            raise RuntimeError("Walltime reached after {} continuation segments".format(segment))
+        continuation.update({"segment": segment,
+                             "prev_dirs": continuation.get("prev_dirs", []) + [os.getcwd()]})
+        tasks = continuation.pop("tasks", [])
+
+        additional_files = [f for f in ("WAVECAR", "CHGCAR")
+                            if _get_output_file(".", f) and
+                            os.path.getsize(_get_output_file(".", f)) > 0]
+        incar_update = {"ISTART": 1} if "WAVECAR" in additional_files else {}
+        incar = Incar.from_file(_get_output_file(".", "INCAR"))
+        if incar.get("IBRION") == 0:
+            # molecular dynamics: only run the remaining steps, continuing the
+            # temperature ramp. CONTCAR holds the velocities.
+            n_steps = len(Vasprun(_get_output_file(".", "vasprun.xml"), parse_dos=False,
+                                  parse_eigen=False, parse_potcar_file=False,
+                                  exception_on_bad_xml=False).ionic_steps)
+            nsw = incar["NSW"]
+            incar_update["NSW"] = max(nsw - n_steps, 1)
+            if "TEBEG" in incar:
+                teend = incar.get("TEEND", incar["TEBEG"])
+                incar_update["TEBEG"] = incar["TEBEG"] + (teend - incar["TEBEG"]) * n_steps / nsw
+
+        run_params = {k: v for k, v in self.items() if k != "_fw_name"}
+        run_params["continuation"] = dict(continuation, tasks=tasks)
+        if last_job:
+            run_params["job_type"] = "normal"
+
+        fw_tasks = [CopyVaspOutputs(calc_dir=os.getcwd(), contcar_to_poscar=True,
+                                    additional_files=additional_files)]
+        if incar_update:
+            fw_tasks.append(ModifyIncar(incar_update=incar_update))
+        fw_tasks.append(RunVaspCustodian(**run_params))
+        fw_tasks.extend(tasks)
+
+        spec = {k: v for k, v in fw_spec.items()
+                if not k.startswith("_") or k in ("_queueadapter", "_fworker", "_category",
+                                                  "_priority")}
+        name = "{} continuation {}".format(continuation.get("name", "vasp"), segment)
+        return Firework(fw_tasks, name=name, spec=spec)
+
+
+def get_interrupted_job(custodian_log):
+    """
+    The job of a custodian run stopped by the WalltimeHandler. Custodian logs
+    each job it starts, in order, with the corrections made during it.
+
+    Args:
+        custodian_log (list): content of custodian.json
+
+    Returns:
+        (int) index of the job in the sequence of jobs of the job_type, or
+            None if the run was not stopped by the WalltimeHandler
+    """
+    for i, run in enumerate(custodian_log):
+        for correction in run.get("corrections", []):
+            if "Walltime reached" in correction.get("errors", []):
+                return i
+    return None
+
+
+def reached_walltime(custodian_log):
+    """
+    Whether a custodian run was stopped by the WalltimeHandler.
+
+    Args:
+        custodian_log (list): content of custodian.json
+
+    Returns:
+        bool
+    """
+    return get_interrupted_job(custodian_log) is not None
+
+
+def get_packed_vasp_cmd(vasp_cmd, ncores):
+    """
+    Adapt a VASP command to the number of cores of a packed job: a "{ncores}"
+    placeholder is replaced by the number of cores, otherwise the value of
+    the -n/-np/--ntasks option of the MPI launcher is.
+
+    Args:
+        vasp_cmd (str): VASP command, e.g. "mpirun -n {ncores} vasp_std"
+        ncores (int): number of cores of the job
+
+    Returns:
+        (str) VASP command
+    """
+    if "{ncores}" in vasp_cmd:
+        return vasp_cmd.replace("{ncores}", str(ncores))
+    new_cmd, n = re.subn(r"(\s(?:-n|-np|--ntasks)[\s=])\d+", r"\g<1>{}".format(ncores),
+                         vasp_cmd)
+    if not n:
+        logger.warning("Cannot set the number of cores in {}; jobs may "
+                       "oversubscribe the allocation".format(vasp_cmd))
+    return new_cmd
+
+
+def _run_packed_job(args):
+    """
+    Run the VASP task of a packed job in its directory. Module-level so that
+    it can be run in a process pool.
+    """
+    job_dir, task_dict, fw_spec = args
+    t0 = time.time()
+    result = {"successful": True, "error": None}
+    with cd(job_dir):
+        try:
+            action = load_object(task_dict).run_task(fw_spec)
+            result["action"] = action.to_dict() if action else None
+        except Exception:
+            result.update({"successful": False, "error": traceback.format_exc(),
+                           "action": None})
+    result["walltime"] = time.time() - t0
+    return result
+
+
+@explicit_serialize
+class RunVaspPacked(FiretaskBase):
+    """
+    Run several small VASP calculations concurrently in one allocation.
+
+    Each job is the list of firetasks of a VASP Firework (e.g. write inputs,
+    RunVaspCustodian, PassCalcLocs, VaspToDb), and runs in its own
+    subdirectory. The tasks before the RunVasp* task of each job are run
+    first, then all RunVasp* tasks are run concurrently in separate
+    processes, each under its own custodian with its own handlers and a share
+    of the cores of the allocation, and finally the tasks after it. Whether
+    each job succeeded is written to packing.json in its directory, which the
+    VaspDrone stores in the task doc under "packing". A failed job does not
+    fail the others, but the tasks after its RunVasp* task (e.g. VaspToDb)
+    are skipped, as they would be if its Firework fizzled; the task raises
+    only if all jobs failed. A job whose task returns exit=True (e.g. the
+    walltime continuation) also skips its remaining tasks. The FWActions of
+    all jobs are merged; since the packed jobs share their children,
+    defuse_children, defuse_workflow and exit are set if any job sets them.
+
+    The VASP command of the jobs must contain a "{ncores}" placeholder or an
+    -n/-np/--ntasks option so that it can be adapted to the cores of each job,
+    and the MPI launcher must not bind the concurrent jobs to the same cores
+    (e.g. "mpirun --bind-to none -n {ncores} vasp_std" or
+    "srun --exclusive -n {ncores} vasp_std").
+
+    Required params:
+        jobs ([[FiretaskBase]]): firetasks of each job
+
+    Optional params:
+        ncores (int): number of cores of the allocation. Supports env_chk.
+            Defaults to the allocation detected from the queue system.
+        cores_per_job (int): number of cores of each job. Defaults to an
+            equal share of the allocation among all jobs.
+        job_dirs ([str]): subdirectory of each job. Defaults to job_0,
+            job_1, ...
+    """
+
+    required_params = ["jobs"]
+    optional_params = ["ncores", "cores_per_job", "job_dirs"]
+
+    def run_task(self, fw_spec):
+        jobs = self["jobs"]
+        job_dirs = [os.path.abspath(d) for d in
+                    self.get("job_dirs", ["job_{}".format(i) for i in range(len(jobs))])]
+        ncores = int(env_chk(self.get("ncores"), fw_spec) or get_allocation_cores())
+        cores_per_job = self.get("cores_per_job") or max(1, ncores // len(jobs))
+        n_concurrent = max(1, min(len(jobs), ncores // cores_per_job))
+
+        # each job gets its own copy of the spec, updated by its own tasks
+        specs = [deepcopy(fw_spec) for _ in jobs]
+        actions = [[] for _ in jobs]
+        exited = [False] * len(jobs)
+
+        def add_action(i, action):
+            actions[i].append(action)
+            specs[i].update(action.update_spec)
+            for mod in action.mod_spec:
+                apply_mod(mod, specs[i])
+            if action.exit:
+                exited[i] = True
+
+        def run_tasks(i, tasks):
+            with cd(job_dirs[i]):
+                for task in tasks:
+                    if exited[i]:
+                        break
+                    action = task.run_task(specs[i])
+                    if action:
+                        add_action(i, action)
+
+        run_idx = []
+        for i, tasks in enumerate(jobs):
+            os.makedirs(job_dirs[i], exist_ok=True)
+            idx = [n for n, t in enumerate(tasks) if t.fw_name.split(".")[-1].startswith("RunVasp")]
+            if len(idx) != 1:
+                raise ValueError("Job {} must have exactly one RunVasp task".format(i))
+            run_idx.append(idx[0])
+            run_tasks(i, tasks[:idx[0]])
+
+        run_jobs, run_args = [i for i in range(len(jobs)) if not exited[i]], []
+        for i in run_jobs:
+            task_dict = jobs[i][run_idx[i]].to_dict()
+            if task_dict.get("vasp_cmd"):
+                vasp_cmd = env_chk(task_dict["vasp_cmd"], specs[i])
+                task_dict["vasp_cmd"] = get_packed_vasp_cmd(vasp_cmd, cores_per_job)
+            run_args.append((job_dirs[i], task_dict, specs[i]))
+        logger.info("Running {} packed jobs on {} cores each, {} at a time".format(
+            len(run_jobs), cores_per_job, n_concurrent))
+        with ProcessPoolExecutor(max_workers=n_concurrent) as executor:
+            results = dict(zip(run_jobs, executor.map(_run_packed_job, run_args)))
+
+        summary = []
+        for i, tasks in enumerate(jobs):
+            result = results.get(i, {"successful": True, "error": None, "walltime": 0,
+                                     "action": None})
+            if result["action"]:
+                add_action(i, FWAction.from_dict(result["action"]))
+            packing = {"job_index": i, "ncores": cores_per_job, "n_jobs": len(jobs),
+                       "n_concurrent": n_concurrent, "successful": result["successful"],
+                       "error": result["error"], "walltime": result["walltime"]}
+            dumpfn(packing, os.path.join(job_dirs[i], "packing.json"))
+            if packing["successful"]:
+                try:
+                    run_tasks(i, tasks[run_idx[i] + 1:])
+                except Exception:
+                    logger.warning("Post-processing of packed job {} failed".format(i))
+                    packing.update({"successful": False,
+                                    "post_process_error": traceback.format_exc()})
+            if not packing["successful"]:
+                logger.warning("Packed job {} in {} failed".format(i, job_dirs[i]))
+            summary.append(packing)
+
+        if not any(p["successful"] for p in summary):
+            raise RuntimeError("All {} packed jobs failed".format(len(jobs)))
+
+        stored_data, update_spec, mod_spec = {"packed_jobs": summary}, {}, []
+        additions, detours = [], []
+        flags = {"defuse_children": False, "defuse_workflow": False, "exit": False}
+        for i, job_actions in enumerate(actions):
+            for action in job_actions:
+                stored_data.setdefault("jobs", {}).setdefault(str(i), {}).update(
+                    action.stored_data)
+                update_spec.update(action.update_spec)
+                mod_spec.extend(action.mod_spec)
+                additions.extend(action.additions)
+                detours.extend(action.detours)
+                for flag in flags:
+                    if getattr(action, flag):
+                        logger.info("Packed job {} sets {}".format(i, flag))
+                        flags[flag] = True
+        return FWAction(stored_data=stored_data, update_spec=update_spec, mod_spec=mod_spec,
+                        additions=additions, detours=detours, **flags)
+
 
 @explicit_serialize
 class RunBoltztrap(FiretaskBase):
@@ -228,9 +537,11 @@ class RunBoltztrap(FiretaskBase):
         tgrid: (float) temperature interval (default = 50K)
         doping: ([float]) doping levels you want to compute
         soc: (bool) whether the band structure is calculated with spin-orbit coupling or not
+        use_parse_cache (bool): whether to use the on-disk parse cache.
+            Defaults to PARSE_CACHE in atomate.vasp.config.
     """
 
-    optional_params = ["scissor", "tmax", "tgrid", "doping", "soc"]
+    optional_params = ["scissor", "tmax", "tgrid", "doping", "soc", "use_parse_cache"]
 
     def run_task(self, fw_spec):
         scissor = self.get("scissor", 0.0)
@@ -239,7 +550,8 @@ class RunBoltztrap(FiretaskBase):
         doping = self.get("doping", None)
         soc = self.get("soc", False)
 
-        vasprun, outcar = get_vasprun_outcar(".", parse_dos=True, parse_eigen=True)
+        vasprun, outcar = get_vasprun_outcar(".", parse_dos=True, parse_eigen=True,
+                                             use_cache=self.get("use_parse_cache", PARSE_CACHE))
         bs = vasprun.get_band_structure()
         nelect = outcar.nelect
         runner = BoltztrapRunner(bs, nelect, scissor=scissor, doping=doping, tmax=tmax,
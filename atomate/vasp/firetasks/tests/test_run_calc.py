@@ -0,0 +1,171 @@
+# coding: utf-8
+
+
+import os
+import unittest
+
+from monty.serialization import loadfn
+
+from fireworks import explicit_serialize, FiretaskBase, FWAction
+
+from pymatgen.io.vasp import Incar
+
+from atomate.vasp.firetasks.run_calc import RunVaspCustodian, RunVaspPacked, \
+    get_interrupted_job, get_packed_vasp_cmd
+from atomate.utils.testing import AtomateTest
+
+module_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+
+@explicit_serialize
+class WriteFakeInputs(FiretaskBase):
+
+    optional_params = ["exit"]
+
+    def run_task(self, fw_spec):
+        with open("INCAR", "w") as f:
+            f.write("SYSTEM = fake\n")
+        return FWAction(update_spec={"_fake_inputs": os.getcwd()},
+                        exit=self.get("exit", False))
+
+
+@explicit_serialize
+class RunVaspFake(FiretaskBase):
+
+    optional_params = ["fail", "vasp_cmd"]
+
+    def run_task(self, fw_spec):
+        if self.get("fail"):
+            raise RuntimeError("VASP did not converge")
+        with open("vasp_cmd", "w") as f:
+            f.write(self.get("vasp_cmd", ""))
+
+
+@explicit_serialize
+class FakeToDb(FiretaskBase):
+
+    optional_params = ["defuse_children"]
+
+    def run_task(self, fw_spec):
+        with open("parsed", "w") as f:
+            f.write(fw_spec["_fake_inputs"])
+        return FWAction(stored_data={"task_id": os.path.basename(os.getcwd())},
+                        defuse_children=self.get("defuse_children", False))
+
+
+class TestRunVaspPacked(AtomateTest):
+
+    def setUp(self):
+        super(TestRunVaspPacked, self).setUp(lpad=False)
+
+    def _job(self, fail=False, defuse_children=False, exit=False):
+        return [WriteFakeInputs(exit=exit),
+                RunVaspFake(fail=fail, vasp_cmd="mpirun -n 16 vasp_std"),
+                FakeToDb(defuse_children=defuse_children)]
+
+    def test_run(self):
+        task = RunVaspPacked(jobs=[self._job(), self._job(fail=True), self._job()],
+                             ncores=8, cores_per_job=4)
+        action = task.run_task({})
+        for i in range(3):
+            self.assertTrue(os.path.exists(os.path.join("job_{}".format(i), "INCAR")))
+        with open(os.path.join("job_0", "vasp_cmd")) as f:
+            self.assertEqual(f.read(), "mpirun -n 4 vasp_std")
+
+        # the post-run tasks of the failed job are skipped
+        self.assertTrue(os.path.exists(os.path.join("job_0", "parsed")))
+        self.assertFalse(os.path.exists(os.path.join("job_1", "parsed")))
+        self.assertEqual(sorted(action.stored_data["jobs"]), ["0", "1", "2"])
+        self.assertNotIn("task_id", action.stored_data["jobs"]["1"])
+        self.assertEqual(action.stored_data["jobs"]["2"]["task_id"], "job_2")
+
+        packing = loadfn(os.path.join("job_1", "packing.json"))
+        self.assertFalse(packing["successful"])
+        self.assertIn("VASP did not converge", packing["error"])
+        self.assertEqual([p["successful"] for p in action.stored_data["packed_jobs"]],
+                         [True, False, True])
+        self.assertFalse(action.defuse_children)
+        self.assertFalse(action.exit)
+
+    def test_flags(self):
+        task = RunVaspPacked(jobs=[self._job(defuse_children=True), self._job(exit=True)],
+                             ncores=2)
+        action = task.run_task({})
+        self.assertTrue(action.defuse_children)
+        self.assertTrue(action.exit)
+        # the job that exited before its run is not run
+        self.assertFalse(os.path.exists(os.path.join("job_1", "vasp_cmd")))
+        self.assertFalse(os.path.exists(os.path.join("job_1", "parsed")))
+
+    def test_all_failed(self):
+        task = RunVaspPacked(jobs=[self._job(fail=True), self._job(fail=True)], ncores=2)
+        self.assertRaises(RuntimeError, task.run_task, {})
+
+    def test_get_packed_vasp_cmd(self):
+        self.assertEqual(get_packed_vasp_cmd("mpirun -n {ncores} vasp_std", 4),
+                         "mpirun -n 4 vasp_std")
+        self.assertEqual(get_packed_vasp_cmd("mpirun -n 16 vasp_std", 4),
+                         "mpirun -n 4 vasp_std")
+        self.assertEqual(get_packed_vasp_cmd("mpirun -np 16 vasp_std", 4),
+                         "mpirun -np 4 vasp_std")
+        self.assertEqual(get_packed_vasp_cmd("srun --ntasks=16 vasp_std", 4),
+                         "srun --ntasks=4 vasp_std")
+        self.assertEqual(get_packed_vasp_cmd("vasp_std", 4), "vasp_std")
+
+
+class TestWalltimeContinuation(AtomateTest):
+
+    def setUp(self):
+        super(TestWalltimeContinuation, self).setUp(lpad=False)
+        self.task = RunVaspCustodian(
+            vasp_cmd="vasp", job_type="double_relaxation_run",
+            continuation={"name": "structure optimization",
+                          "tasks": [FakeToDb(defuse_children=True)]})
+        # a double relaxation stopped in its second job
+        for suffix in [".relax1", ""]:
+            Incar({"NSW": 99, "ISPIN": 2}).write_file("INCAR" + suffix)
+            for f in ["CONTCAR", "WAVECAR"]:
+                with open(f + suffix, "w") as fout:
+                    fout.write("relax2" if not suffix else suffix)
+
+    def test_get_interrupted_job(self):
+        log = [{"job": {"suffix": ".relax1"}, "corrections": []},
+               {"job": {"suffix": ".relax2"},
+                "corrections": [{"errors": ["Walltime reached"], "actions": None}]}]
+        self.assertEqual(get_interrupted_job(log), 1)
+        log[0]["corrections"] = [{"errors": ["Walltime reached"], "actions": None}]
+        del log[1]
+        self.assertEqual(get_interrupted_job(log), 0)
+        log[0]["corrections"] = [{"errors": ["brmix"], "actions": [{"dict": "INCAR"}]}]
+        self.assertIsNone(get_interrupted_job(log))
+
+    def test_get_continuation_fw(self):
+        fw_spec = {"_queueadapter": {"walltime": "1:00:00"}, "_tasks": [], "tags": ["a"]}
+        fw = self.task.get_continuation_fw(fw_spec, last_job=True)
+        self.assertEqual(fw.name, "structure optimization continuation 1")
+        self.assertEqual(fw.spec, {"_queueadapter": {"walltime": "1:00:00"}, "tags": ["a"]})
+        copy, modify, run, post = fw.tasks
+        self.assertEqual(copy["calc_dir"], self.scratch_dir)
+        self.assertEqual(copy["additional_files"], ["WAVECAR"])
+        self.assertEqual(modify["incar_update"], {"ISTART": 1})
+        self.assertEqual(run["job_type"], "normal")
+        self.assertEqual(run["continuation"]["segment"], 1)
+        self.assertEqual(run["continuation"]["prev_dirs"], [self.scratch_dir])
+        self.assertEqual(run["continuation"]["tasks"][0].fw_name, post.fw_name)
+
+        # a run stopped before its last job restarts the whole sequence
+        fw = self.task.get_continuation_fw(fw_spec, last_job=False)
+        self.assertEqual(fw.tasks[2]["job_type"], "double_relaxation_run")
+
+        # the next segment records all the previous ones
+        fw = fw.tasks[2].get_continuation_fw(fw_spec)
+        self.assertEqual(fw.tasks[2]["continuation"]["segment"], 2)
+        self.assertEqual(fw.tasks[2]["continuation"]["prev_dirs"], [self.scratch_dir] * 2)
+
+        task = RunVaspCustodian(vasp_cmd="vasp",
+                                continuation={"segment": 4, "max_segments": 5})
+        self.assertRaises(RuntimeError, task.get_continuation_fw, fw_spec)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# coding: utf-8
+
+
+import os
+import unittest
+
+from pymatgen.core.lattice import Lattice
+from pymatgen.core.structure import Structure
+from pymatgen.io.vasp import Incar, Kpoints
+
+from atomate.vasp.firetasks.glue_tasks import SeedFromPreviousCalc
+from atomate.utils.testing import AtomateTest, DB_DIR
+
+module_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+
+DEBUG_MODE = False
+
+
+class TestSeedFromPreviousCalc(AtomateTest):
+
+    def setUp(self):
+        super(TestSeedFromPreviousCalc, self).setUp()
+        self.db_file = os.path.join(DB_DIR, "db.json")
+        # 2 Fe along c, so that the AFM ordering is well defined
+        self.structure = Structure(Lattice.tetragonal(3.0, 6.0), ["Fe", "Fe", "O", "O"],
+                                   [[0, 0, 0], [0, 0, 0.5], [0.5, 0.5, 0.25],
+                                    [0.5, 0.5, 0.75]])
+        self.afm = [5.0, -5.0, 0.6, 0.6]
+        self.kpoints = Kpoints.gamma_automatic((4, 4, 2))
+        self.run_dir = os.path.join(self.scratch_dir, "run")
+        os.makedirs(self.run_dir)
+        os.chdir(self.run_dir)
+        self.structure.to(fmt="POSCAR", filename="POSCAR")
+        self.kpoints.write_file("KPOINTS")
+        Incar({"ENCUT": 520, "ISPIN": 2, "MAGMOM": self.afm, "NSW": 0}).write_file("INCAR")
+
+    def _add_task(self, task_id, magmom, structure=None, kpoints=None):
+        structure = structure or self.structure
+        prev_dir = os.path.join(self.scratch_dir, "prev_{}".format(task_id))
+        os.makedirs(prev_dir)
+        with open(os.path.join(prev_dir, "WAVECAR"), "w") as f:
+            f.write(str(task_id))
+        self.get_task_collection().insert_one(
+            {"task_id": task_id, "state": "successful", "formula_pretty": "FeO",
+             "nsites": len(structure), "dir_name": "localhost:" + prev_dir,
+             "last_updated": task_id, "output": {"structure": structure.as_dict()},
+             "input": {"incar": {"ENCUT": 520, "ISPIN": 2, "MAGMOM": magmom},
+                       "kpoints": (kpoints or self.kpoints).as_dict()}})
+
+    def test_magnetic_ordering(self):
+        self._add_task(1, [5.0, 5.0, 0.6, 0.6])
+        seeding = SeedFromPreviousCalc(db_file=self.db_file).seed(self.db_file)
+        self.assertFalse(seeding["seeded"])
+        self.assertFalse(os.path.exists("WAVECAR"))
+
+        # the same AFM ordering, with the sites in another order and the spins flipped
+        self._add_task(2, [-0.6, 5.0, -0.6, -5.0],
+                       Structure.from_sites([self.structure[i] for i in [2, 1, 3, 0]]))
+        seeding = SeedFromPreviousCalc(db_file=self.db_file).seed(self.db_file)
+        self.assertTrue(seeding["seeded"])
+        self.assertEqual(seeding["task_id"], 2)
+        with open("WAVECAR") as f:
+            self.assertEqual(f.read(), "2")
+        self.assertEqual(Incar.from_file("INCAR")["ISTART"], 1)
+
+    def test_kpoints(self):
+        self._add_task(1, self.afm, kpoints=Kpoints.gamma_automatic((2, 2, 1)))
+        seeding = SeedFromPreviousCalc(db_file=self.db_file).seed(self.db_file)
+        self.assertFalse(seeding["seeded"])
+        self.assertEqual(seeding["reason"], "no matching calculation")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,7 @@ This module defines tasks for writing vasp input sets.
 """
 
 import os
+import socket
 from importlib import import_module
 
 import numpy as np
@@ -32,14 +33,26 @@ from pymatgen.io.vasp.sets import (
 )
 
 from pymatgen.io.vasp.outputs import Vasprun
+from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
 
-from atomate.utils.utils import env_chk, load_class
+from atomate.utils.blob_store import resolve_blobs
+from atomate.utils.utils import env_chk, load_class, get_allocation_cores
 from atomate.vasp.firetasks.glue_tasks import GetInterpolatedPOSCAR
 
 __author__ = "Anubhav Jain, Shyue Ping Ong, Kiran Mathew, Alex Ganose"
 __email__ = "ajain@lbl.gov"
 
 
+def load_vis_class(name):
+    """
+    Load a VASP input set class from its name in pymatgen.io.vasp.sets
+    (e.g. "MPRelaxSet") or its full path.
+    """
+    if "." in name:
+        return load_class(*name.rsplit(".", 1))
+    return load_class("pymatgen.io.vasp.sets", name)
+
+
 @explicit_serialize
 class WriteVaspFromIOSet(FiretaskBase):
     """
@@ -48,9 +61,11 @@ class WriteVaspFromIOSet(FiretaskBase):
     String/parameter combo.
 
     Required params:
-        structure (Structure): structure
+        structure (Structure): structure, or a blob store handle to it (see
+            the intern_structures powerup)
         vasp_input_set (AbstractVaspInputSet or str): Either a VaspInputSet
-            object or a string name for the VASP input set (e.g., "MPRelaxSet").
+            object or a string name for the VASP input set (e.g., "MPRelaxSet",
+            or the full path of an input set defined in another module).
 
     Optional params:
         vasp_input_params (dict): When using a string name for VASP input set,
@@ -75,11 +90,10 @@ class WriteVaspFromIOSet(FiretaskBase):
 
         # if VaspInputSet String + parameters was provided
         else:
-            vis_cls = load_class(
-                "pymatgen.io.vasp.sets", self["vasp_input_set"]
-            )
+            vis_cls = load_vis_class(self["vasp_input_set"])
             vis = vis_cls(
-                self["structure"], **self.get("vasp_input_params", {})
+                resolve_blobs(self["structure"], fw_spec),
+                **self.get("vasp_input_params", {})
             )
 
         potcar_spec = self.get("potcar_spec", False)
@@ -289,6 +303,74 @@ class ModifyPotcar(FiretaskBase):
         potcar.write_file(self.get("output_filename", "POTCAR"))
 
 
+@explicit_serialize
+class TuneParallelization(FiretaskBase):
+    """
+    Set NCORE, KPAR and NSIM in the INCAR to the values recommended by a
+    ParallelizationTuner, mined from the run statistics of similar completed
+    tasks in the tasks collection (falling back to a heuristic when there is
+    not enough history). NPAR is removed from the INCAR as NCORE supersedes
+    it. The recommendation is written to parallelization.json, with the
+    hostname of the worker, which the VaspDrone stores in the task doc under
+    "parallelization" together with the achieved time per SCF step, so that
+    later recommendations use it.
+
+    Required params:
+        db_file (str): path to file containing the database credentials.
+            Supports env_chk.
+
+    Optional params:
+        ncores (int): number of cores VASP runs on. Supports env_chk. Default
+            is read from the SLURM_NTASKS, PBS_NP or NSLOTS environment
+            variables, or the number of cores of the node.
+        query (dict): additional query restricting the tasks mined
+        min_samples (int): minimum number of similar tasks run with a setting
+            for it to be recommended (default: 3)
+    """
+
+    required_params = ["db_file"]
+    optional_params = ["ncores", "query", "min_samples"]
+
+    def run_task(self, fw_spec):
+        from atomate.vasp.database import VaspCalcDb
+        from atomate.vasp.parallelization import ParallelizationTuner, estimate_nbands
+
+        ncores = int(env_chk(self.get("ncores"), fw_spec) or get_allocation_cores())
+
+        incar = Incar.from_file("INCAR")
+        structure = Structure.from_file("POSCAR")
+        nkpoints = None
+        if os.path.exists("KPOINTS"):
+            kpoints = Kpoints.from_file("KPOINTS")
+            if kpoints.num_kpts:
+                nkpoints = kpoints.num_kpts
+            else:
+                try:
+                    nkpoints = len(SpacegroupAnalyzer(structure).get_ir_reciprocal_mesh(
+                        kpoints.kpts[0], is_shift=kpoints.kpts_shift))
+                except Exception:
+                    pass
+        nbands = incar.get("NBANDS")
+        if not nbands and os.path.exists("POTCAR"):
+            nbands = estimate_nbands(structure, Potcar.from_file("POTCAR"),
+                                     incar.get("ISPIN", 1))
+
+        mmdb = VaspCalcDb.from_db_file(env_chk(self["db_file"], fw_spec), admin=True)
+        tuner = ParallelizationTuner(mmdb.collection, query=self.get("query"),
+                                     min_samples=self.get("min_samples", 3))
+        hostname = socket.gethostname()
+        params, info = tuner.recommend(ncores, len(structure), nkpoints=nkpoints,
+                                       nbands=nbands, worker=hostname)
+
+        incar.pop("NPAR", None)
+        incar.update(params)
+        incar.write_file("INCAR")
+
+        info.update({"params": params, "ncores": ncores, "nkpoints": nkpoints,
+                     "nbands": nbands, "hostname": hostname})
+        dumpfn(info, "parallelization.json")
+
+
 @explicit_serialize
 class WriteScanRelaxFromPrev(FiretaskBase):
     """
@@ -600,12 +682,16 @@ class WriteTransmutedStructureIOSet(FiretaskBase):
     only the last structure in the list is used.
 
     Required params:
-        structure (Structure): input structure
+        structure (Structure): input structure, or a blob store handle to it
+            (see the intern_structures powerup)
         transformations (list): list of names of transformation classes as
             defined in the modules in pymatgen.transformations
-        vasp_input_set (VaspInputSet): VASP input set.
+        vasp_input_set (VaspInputSet or str): VASP input set, or its name
+            (see WriteVaspFromIOSet).
 
     Optional params:
+        vasp_input_params (dict): kwargs of the VASP input set, if given by
+            name. The structure is set to the transformed structure.
         transformation_params (list): list of dicts where each dict specifies
             the input parameters to instantiate the transformation class in the
             transformations list.
@@ -620,6 +706,7 @@ class WriteTransmutedStructureIOSet(FiretaskBase):
     required_params = ["structure", "transformations", "vasp_input_set"]
     optional_params = [
         "prev_calc_dir",
+        "vasp_input_params",
         "transformation_params",
         "override_default_vasp_params",
         "potcar_spec",
@@ -659,7 +746,7 @@ class WriteTransmutedStructureIOSet(FiretaskBase):
         # TODO: @matk86 - should prev_calc_dir use CONTCAR instead of POSCAR?
         #  Note that if current dir, maybe POSCAR is indeed best ... -computron
         structure = (
-            self["structure"]
+            resolve_blobs(self["structure"], fw_spec)
             if not self.get("prev_calc_dir", None)
             else Poscar.from_file(
                 os.path.join(self["prev_calc_dir"], "POSCAR")
@@ -671,10 +758,14 @@ class WriteTransmutedStructureIOSet(FiretaskBase):
             -1
         ].final_structure.copy()
         vis_orig = self["vasp_input_set"]
-        vis_dict = vis_orig.as_dict()
+        if hasattr(vis_orig, "as_dict"):
+            vis_cls, vis_dict = vis_orig.__class__, vis_orig.as_dict()
+        else:
+            vis_cls = load_vis_class(vis_orig)
+            vis_dict = dict(self.get("vasp_input_params", {}))
         vis_dict["structure"] = final_structure.as_dict()
         vis_dict.update(self.get("override_default_vasp_params", {}) or {})
-        vis = vis_orig.__class__.from_dict(vis_dict)
+        vis = vis_cls.from_dict(vis_dict)
 
         potcar_spec = self.get("potcar_spec", False)
         vis.write_input(".", potcar_spec=potcar_spec)
@@ -688,7 +779,7 @@ class WriteNormalmodeDisplacedPoscar(FiretaskBase):
     Displace the structure from the previous calculation along the provided
     normal mode by the given amount and write the corresponding Poscar file.
     The fw_spec must contain a "normalmodes" key with "eigenvecs" sub-key that
-    is likely produced by a previous calc.
+    is likely produced by a previous calc (inline, or as a blob store handle).
 
     Required params:
         mode (int): normal mode index
@@ -701,7 +792,7 @@ class WriteNormalmodeDisplacedPoscar(FiretaskBase):
         mode = self["mode"]
         disp = self["displacement"]
         structure = Structure.from_file("POSCAR")
-        nm_eigenvecs = np.array(fw_spec["normalmodes"]["eigenvecs"])
+        nm_eigenvecs = np.array(resolve_blobs(fw_spec["normalmodes"]["eigenvecs"], fw_spec))
         nm_norms = np.linalg.norm(nm_eigenvecs, axis=2)
 
         # displace the sites along the given normal mode: displacement vector
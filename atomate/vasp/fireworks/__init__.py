@@ -1,3 +1,5 @@
 
-from .core import *
-from .nmr import *
\ No newline at end of file
+from atomate.utils.lazy_import import lazy_star_imports
+
+# the fireworks are imported on first use
+__getattr__, __dir__ = lazy_star_imports(__name__, ["core", "nmr"])
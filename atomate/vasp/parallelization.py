@@ -0,0 +1,247 @@
+# coding: utf-8
+
+
+"""
+This module defines a simple tuner of the VASP parallelization parameters
+(NCORE, KPAR, NSIM). Completed tasks record their run time, core count and
+number of SCF steps; the tuner mines them for calculations similar to a new
+job (number of sites, k-points and bands) run on the same number of cores,
+and recommends the setting with the lowest time per SCF step. Tasks run
+with a recommendation store it together with the achieved time per SCF step
+(see TuneParallelization), so the recommendations improve over time.
+"""
+
+import math
+from collections import defaultdict
+
+import numpy as np
+
+from atomate.utils.utils import get_logger
+
+logger = get_logger(__name__)
+
+TUNED_PARAMS = ("NCORE", "KPAR", "NSIM")
+VASP_DEFAULTS = {"NCORE": 1, "KPAR": 1, "NSIM": 4}
+
+
+def get_divisors(n):
+    """
+    Sorted divisors of a positive integer.
+    """
+    return [d for d in range(1, n + 1) if n % d == 0]
+
+
+def get_heuristic_parallelization(ncores, nkpoints=None, min_cores_per_kgroup=8):
+    """
+    Rule of thumb parallelization, used when there is not enough history:
+    parallelize over k-points as long as each k-point group keeps at least
+    min_cores_per_kgroup cores, and set NCORE close to the square root of the
+    number of cores per k-point group.
+
+    Args:
+        ncores (int): number of cores of the job
+        nkpoints (int): number of irreducible k-points, if known
+        min_cores_per_kgroup (int): minimum number of cores per k-point group
+
+    Returns:
+        (dict) NCORE, KPAR and NSIM
+    """
+    kpar = 1
+    for d in get_divisors(ncores):
+        if ncores // d >= min_cores_per_kgroup and (nkpoints is None or d <= nkpoints):
+            kpar = d
+    cores_per_kgroup = ncores // kpar
+    ncore = max(d for d in get_divisors(cores_per_kgroup)
+                if d <= math.sqrt(cores_per_kgroup))
+    return {"NCORE": ncore, "KPAR": kpar, "NSIM": VASP_DEFAULTS["NSIM"]}
+
+
+def is_valid_parallelization(params, ncores, nkpoints=None):
+    """
+    Whether NCORE/KPAR are compatible with the number of cores and k-points.
+    """
+    kpar, ncore = params["KPAR"], params["NCORE"]
+    if ncores % kpar or (nkpoints and kpar > nkpoints):
+        return False
+    return (ncores // kpar) % ncore == 0
+
+
+def estimate_nbands(structure, potcar=None, ispin=1):
+    """
+    Estimate of the default number of bands of VASP.
+
+    Args:
+        structure (Structure): input structure
+        potcar (Potcar): POTCAR of the calculation, needed for the number of
+            valence electrons
+        ispin (int): ISPIN
+
+    Returns:
+        (int) number of bands, or None if the POTCAR is not available
+    """
+    if potcar is None:
+        return None
+    zvals = {p.element: p.zval for p in potcar}
+    nelect = sum(zvals.get(site.specie.symbol, 0) for site in structure)
+    nions = len(structure)
+    nbands = max(int(math.ceil(nelect / 2 + nions / 2)), int(math.ceil(0.6 * nelect)))
+    if ispin == 2:
+        nbands = int(math.ceil(nbands * 1.2))
+    return nbands
+
+
+def get_time_per_scf_step(task_doc):
+    """
+    Elapsed time per SCF step of a task doc, over all its calculations.
+
+    Returns:
+        (float) time per SCF step in seconds, or None
+    """
+    try:
+        elapsed = task_doc["run_stats"]["overall"]["Elapsed time (sec)"]
+        nscf = sum(len(step.get("electronic_steps", []))
+                   for calc in task_doc["calcs_reversed"]
+                   for step in calc["output"].get("ionic_steps", []))
+    except (KeyError, TypeError):
+        return None
+    return elapsed / nscf if nscf else None
+
+
+class ParallelizationTuner:
+    """
+    Recommends NCORE/KPAR/NSIM for a new job from the run statistics of
+    similar completed tasks.
+    """
+
+    def __init__(self, collection, query=None, max_records=2000, n_neighbors=20,
+                 min_samples=3):
+        """
+        Args:
+            collection (Collection): tasks collection
+            query (dict): additional query restricting the tasks to mine
+            max_records (int): maximum number of (most recent) tasks mined
+            n_neighbors (int): number of most similar tasks considered
+            min_samples (int): minimum number of similar tasks run with a
+                setting for it to be recommended
+        """
+        self.collection = collection
+        self.query = query or {}
+        self.max_records = max_records
+        self.n_neighbors = n_neighbors
+        self.min_samples = min_samples
+
+    def get_records(self, ncores, nsites):
+        """
+        Run statistics of the successful tasks with the same number of cores
+        and between half and twice the number of sites. The heavy arrays of
+        the task docs are reduced on the server.
+
+        Args:
+            ncores (int): number of cores
+            nsites (int): number of sites
+
+        Returns:
+            list of dicts with the keys nsites, nkpoints, nbands, worker
+                (the hostname recorded by TuneParallelization, if any),
+                ncores, the parallelization params and time_per_scf_step
+        """
+        match = {"state": "successful", "run_stats.overall": {"$exists": True},
+                 "nsites": {"$gte": nsites / 2, "$lte": nsites * 2}}
+        match.update(self.query)
+        n_electronic_steps = {"$sum": {"$map": {
+            "input": "$calcs_reversed", "as": "calc",
+            "in": {"$sum": {"$map": {
+                "input": {"$ifNull": ["$$calc.output.ionic_steps", []]}, "as": "step",
+                "in": {"$size": {"$ifNull": ["$$step.electronic_steps", []]}}}}}}}}
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"last_updated": -1}},
+            {"$limit": self.max_records},
+            {"$project": {
+                "_id": 0, "nsites": 1,
+                "incar": {"$arrayElemAt": ["$calcs_reversed.input.incar", 0]},
+                "nkpoints": {"$arrayElemAt": ["$calcs_reversed.input.nkpoints", 0]},
+                "nbands": {"$arrayElemAt": ["$calcs_reversed.input.parameters.NBANDS", 0]},
+                "cores": {"$max": {"$map": {"input": {"$objectToArray": "$run_stats"},
+                                            "as": "rs", "in": "$$rs.v.cores"}}},
+                "elapsed": "$run_stats.overall.Elapsed time (sec)",
+                "nscf": n_electronic_steps,
+                "tuned_time_per_scf_step": "$parallelization.time_per_scf_step",
+                "hostname": "$parallelization.hostname",
+            }},
+        ]
+        records = []
+        for doc in self.collection.aggregate(pipeline, allowDiskUse=True):
+            cores = doc.get("cores")
+            if cores is None or int(cores) != ncores:
+                continue
+            time_per_scf_step = doc.get("tuned_time_per_scf_step")
+            if time_per_scf_step is None and doc.get("nscf"):
+                time_per_scf_step = doc["elapsed"] / doc["nscf"]
+            if not time_per_scf_step:
+                continue
+            incar = doc.get("incar") or {}
+            params = {k: int(incar.get(k, v)) for k, v in VASP_DEFAULTS.items()}
+            if "NCORE" not in incar and incar.get("NPAR"):
+                params["NCORE"] = max(1, ncores // params["KPAR"] // int(incar["NPAR"]))
+            record = {"nsites": doc["nsites"], "nkpoints": doc.get("nkpoints"),
+                      "nbands": doc.get("nbands"), "ncores": ncores,
+                      "worker": doc.get("hostname"),
+                      "time_per_scf_step": time_per_scf_step}
+            record.update(params)
+            records.append(record)
+        return records
+
+    def recommend(self, ncores, nsites, nkpoints=None, nbands=None, worker=None):
+        """
+        Recommend NCORE/KPAR/NSIM for a job.
+
+        Args:
+            ncores (int): number of cores of the job
+            nsites (int): number of sites
+            nkpoints (int): number of irreducible k-points, if known
+            nbands (int): number of bands, if known
+            worker (str): host name of the worker. Tasks run on the same
+                worker are preferred if there are enough of them.
+
+        Returns:
+            (dict, dict) recommended params, and information on how they
+                were obtained ("source": "history" or "heuristic")
+        """
+        records = self.get_records(ncores, nsites)
+        same_worker = [r for r in records if worker and r["worker"] == worker]
+        if len(same_worker) >= self.n_neighbors:
+            records = same_worker
+
+        target = {"nsites": nsites, "nkpoints": nkpoints, "nbands": nbands}
+
+        def distance(r):
+            return sum(np.log(r[k] / v) ** 2 for k, v in target.items() if v and r.get(k))
+
+        def relative_cost(r):
+            # rough scaling of the cost of an SCF step with the system size
+            if nkpoints and nbands and r.get("nkpoints") and r.get("nbands"):
+                return nkpoints * nbands ** 2 / (r["nkpoints"] * r["nbands"] ** 2)
+            return (nsites / r["nsites"]) ** 2
+
+        neighbors = sorted(records, key=distance)[:self.n_neighbors]
+        times = defaultdict(list)
+        for r in neighbors:
+            key = tuple(r[k] for k in TUNED_PARAMS)
+            times[key].append(r["time_per_scf_step"] * relative_cost(r))
+
+        best, best_time = None, None
+        for key, t in times.items():
+            params = dict(zip(TUNED_PARAMS, key))
+            if len(t) < self.min_samples or not is_valid_parallelization(params, ncores,
+                                                                          nkpoints):
+                continue
+            if best_time is None or np.median(t) < best_time:
+                best, best_time = params, float(np.median(t))
+
+        if best is None:
+            return (get_heuristic_parallelization(ncores, nkpoints),
+                    {"source": "heuristic", "n_records": len(records)})
+        return best, {"source": "history", "n_records": len(records),
+                      "n_neighbors": len(neighbors),
+                      "expected_time_per_scf_step": best_time}
@@ -1,4 +1,7 @@
-from atomate.common.firetasks.glue_tasks import DeleteFiles
+import json
+
+from atomate.common.firetasks.glue_tasks import DeleteFiles, PassResult
+from atomate.utils.blob_store import intern_structure, is_blob_handle
 from atomate.utils.utils import get_meta_from_structure, get_fws_and_tasks
 from atomate.vasp.config import (
     ADD_NAMEFILE,
@@ -6,18 +9,21 @@ from atomate.vasp.config import (
     ADD_MODIFY_INCAR,
     GAMMA_VASP_CMD,
 )
-from atomate.vasp.firetasks.glue_tasks import CheckStability, CheckBandgap
+from atomate.vasp.firetasks.glue_tasks import CheckStability, CheckBandgap, \
+    SeedFromPreviousCalc
 from atomate.vasp.firetasks.lobster_tasks import RunLobsterFake
 from atomate.vasp.firetasks.neb_tasks import RunNEBVaspFake
-from atomate.vasp.firetasks.parse_outputs import JsonToDb
+from atomate.vasp.firetasks.parse_outputs import ElasticTensorToDb, JsonToDb
 from atomate.vasp.firetasks.run_calc import (
     RunVaspCustodian,
+    RunVaspPacked,
     RunVaspFake,
     RunVaspDirect,
     RunNoVasp,
 )
-from atomate.vasp.firetasks.write_inputs import ModifyIncar, ModifyPotcar, ModifyKpoints
-from fireworks import Workflow, FileWriteTask
+from atomate.vasp.firetasks.write_inputs import ModifyIncar, ModifyPotcar, ModifyKpoints, \
+    TuneParallelization, WriteTransmutedStructureIOSet, WriteVaspFromIOSet
+from fireworks import Firework, Workflow, FileWriteTask
 from fireworks.core.firework import Tracker
 from fireworks.utilities.fw_utilities import get_slug
 from pymatgen import Structure
@@ -641,6 +647,282 @@ def add_modify_incar_envchk(original_wf, fw_name_constraint=None):
     )
 
 
+def add_warm_start(original_wf, db_file=">>db_file<<", seed_params=None,
+                   fw_name_constraint=None):
+    """
+    Every FireWork that runs VASP is warm-started from the closest completed
+    calculation in the tasks collection (see SeedFromPreviousCalc): matching
+    CHGCAR/WAVECAR files and, optionally, the relaxed geometry are reused.
+    Whether seeding was used is stored in the task doc under "seeding".
+
+    Args:
+        original_wf (Workflow)
+        db_file (str): path to file containing the database credentials.
+            Supports env_chk.
+        seed_params (dict): other params of SeedFromPreviousCalc, e.g.
+            files_to_seed or seed_geometry
+        fw_name_constraint (str): Only apply changes to FWs where fw_name
+            contains this substring.
+
+    Returns:
+       Workflow
+    """
+    seed_params = seed_params or {}
+    idx_list = get_fws_and_tasks(
+        original_wf,
+        fw_name_constraint=fw_name_constraint,
+        task_name_constraint="RunVasp",
+    )
+    for idx_fw, idx_t in idx_list:
+        original_wf.fws[idx_fw].tasks.insert(
+            idx_t, SeedFromPreviousCalc(db_file=db_file, **seed_params))
+    return original_wf
+
+
+def add_parallelization_tuning(original_wf, db_file=">>db_file<<", tuning_params=None,
+                               fw_name_constraint=None):
+    """
+    Every FireWork that runs VASP sets NCORE/KPAR/NSIM at run time to the
+    values recommended from the run statistics of similar completed tasks
+    (see TuneParallelization). custodian's auto_npar is turned off so that it
+    does not override them. The recommendation and the achieved time per SCF
+    step are stored in the task doc under "parallelization".
+
+    Args:
+        original_wf (Workflow)
+        db_file (str): path to file containing the database credentials.
+            Supports env_chk.
+        tuning_params (dict): other params of TuneParallelization, e.g.
+            ncores or query
+        fw_name_constraint (str): Only apply changes to FWs where fw_name
+            contains this substring.
+
+    Returns:
+       Workflow
+    """
+    tuning_params = tuning_params or {}
+    idx_list = get_fws_and_tasks(
+        original_wf,
+        fw_name_constraint=fw_name_constraint,
+        task_name_constraint="RunVasp",
+    )
+    for idx_fw, idx_t in idx_list:
+        task = original_wf.fws[idx_fw].tasks[idx_t]
+        if "RunVaspCustodian" in str(task):
+            task["auto_npar"] = False
+        original_wf.fws[idx_fw].tasks.insert(
+            idx_t, TuneParallelization(db_file=db_file, **tuning_params))
+    return original_wf
+
+
+def pack_vasp_fws(original_wf, pack_size=None, fw_name_constraint=None, packing_params=None):
+    """
+    Pack sibling FireWorks that run VASP (same parents and children) into
+    FireWorks running several of them concurrently in one allocation with
+    RunVaspPacked, e.g. to fill large nodes with the small static
+    calculations of a deformation workflow. Each packed Firework takes the
+    spec of its jobs, and is named after them so that name constraints of
+    later powerups still match.
+
+    Args:
+        original_wf (Workflow)
+        pack_size (int): maximum number of calculations per packed Firework.
+            Defaults to packing all siblings together.
+        fw_name_constraint (str): Only pack FWs where fw_name contains this
+            substring.
+        packing_params (dict): other params of RunVaspPacked, e.g. ncores or
+            cores_per_job
+
+    Returns:
+       Workflow
+    """
+    packing_params = packing_params or {}
+    idx_list = get_fws_and_tasks(
+        original_wf,
+        fw_name_constraint=fw_name_constraint,
+        task_name_constraint="RunVasp",
+    )
+    links = original_wf.links
+    parent_links = links.parent_links
+    siblings = {}
+    for idx_fw in sorted({idx_fw for idx_fw, _ in idx_list}):
+        fw = original_wf.fws[idx_fw]
+        key = (tuple(sorted(parent_links.get(fw.fw_id, []))), tuple(sorted(links[fw.fw_id])))
+        siblings.setdefault(key, []).append(fw)
+
+    new_ids, packed_fws = {}, []
+    for fws in siblings.values():
+        size = pack_size or len(fws)
+        for i in range(0, len(fws), size):
+            chunk = fws[i:i + size]
+            if len(chunk) < 2:
+                continue
+            spec = {}
+            for fw in chunk:
+                spec.update(fw.spec)
+            packed_fw = Firework(
+                RunVaspPacked(jobs=[fw.tasks for fw in chunk], **packing_params),
+                name="packed {}".format(" | ".join(fw.name for fw in chunk)), spec=spec)
+            packed_fws.append(packed_fw)
+            for fw in chunk:
+                new_ids[fw.fw_id] = packed_fw.fw_id
+
+    fws = [fw for fw in original_wf.fws if fw.fw_id not in new_ids] + packed_fws
+    links_dict = {}
+    for parent, children in links.items():
+        links_dict.setdefault(new_ids.get(parent, parent), set()).update(
+            new_ids.get(child, child) for child in children)
+    links_dict = {k: sorted(v) for k, v in links_dict.items()}
+    return Workflow(fws, links_dict=links_dict, name=original_wf.name,
+                    metadata=original_wf.metadata)
+
+
+def add_walltime_continuation(original_wf, wall_time=None, max_segments=5,
+                              fw_name_constraint=None):
+    """
+    Every RunVaspCustodian task stops VASP cleanly before the walltime and,
+    if it had to, continues the run in a new Firework added as a detour,
+    which resumes from the checkpoint (CONTCAR, WAVECAR, CHGCAR) and runs
+    the rest of the original Firework. The VaspDrone merges the segments in
+    a single task doc. Useful for long MD runs and SCAN relaxations.
+
+    Args:
+        original_wf (Workflow)
+        wall_time (int): wall time of the jobs in seconds. Defaults to the
+            wall time given by the queue system, if the WalltimeHandler can
+            read it.
+        max_segments (int): maximum number of segments of a run
+        fw_name_constraint (str): Only apply changes to FWs where fw_name
+            contains this substring.
+
+    Returns:
+       Workflow
+    """
+    idx_list = get_fws_and_tasks(
+        original_wf,
+        fw_name_constraint=fw_name_constraint,
+        task_name_constraint="RunVaspCustodian",
+    )
+    for idx_fw, idx_t in idx_list:
+        fw = original_wf.fws[idx_fw]
+        fw.tasks[idx_t]["continuation"] = {
+            "tasks": fw.tasks[idx_t + 1:],
+            "name": fw.name,
+            "max_segments": max_segments,
+        }
+        if wall_time:
+            fw.tasks[idx_t]["wall_time"] = wall_time
+    return original_wf
+
+
+def use_blob_store(original_wf, db_file=">>db_file<<", blob_dir=None, min_size=None,
+                   fw_name_constraint=None):
+    """
+    Large results passed to the children (e.g. the normal modes of the Raman
+    workflow, the deformation data of the elastic workflow) are stored once
+    in a blob store and only a small handle is passed in the fw_spec, which
+    keeps the Firework documents small (see atomate.utils.blob_store).
+    Applies to the PassResult tasks, including those of packed Fireworks.
+
+    Args:
+        original_wf (Workflow)
+        db_file (str): path to file containing the database credentials.
+            The data is stored in GridFS. Supports env_chk.
+        blob_dir (str): shared directory in which to store the data instead,
+            if db_file is None. Supports env_chk.
+        min_size (int): minimum size in bytes of the stored values, smaller
+            values are passed inline. Defaults to DEFAULT_MIN_SIZE of
+            atomate.utils.blob_store.
+        fw_name_constraint (str): Only apply changes to FWs where fw_name
+            contains this substring.
+
+    Returns:
+       Workflow
+    """
+    blob_store = {"db_file": db_file, "blob_dir": blob_dir}
+    if min_size is not None:
+        blob_store["min_size"] = min_size
+
+    def _set_blob_store(tasks):
+        for task in tasks:
+            if isinstance(task, PassResult):
+                task["blob_store"] = dict(blob_store)
+
+    for fw in original_wf.fws:
+        if fw_name_constraint and fw_name_constraint not in fw.name:
+            continue
+        _set_blob_store(fw.tasks)
+        for task in fw.tasks:
+            if isinstance(task, RunVaspPacked):
+                for job in task["jobs"]:
+                    _set_blob_store(job)
+    return original_wf
+
+
+def intern_structures(original_wf, db_file=None, blob_dir=None, ref_db_file=">>db_file<<"):
+    """
+    Compact encoding of the structures of a workflow: the structures of the
+    input-writing tasks (and of ElasticTensorToDb) are stored once in the
+    blob store, content addressed, and the tasks only hold a small handle
+    that they resolve at run time. VASP input set objects, which embed the
+    structure again, are replaced by their name and parameters. Useful for
+    workflows with many Fireworks on the same structures, e.g. deformation
+    or magnetic orderings workflows, whose insertion into the LaunchPad is
+    dominated by the structures.
+
+    Args:
+        original_wf (Workflow)
+        db_file (str): path to file containing the database credentials, used
+            to store the structures in GridFS when the powerup is applied
+        blob_dir (str): shared directory in which to store the structures
+            instead, if db_file is None
+        ref_db_file (str): db_file recorded in the handles, resolved on the
+            workers. Defaults to the db_file of the worker (env_chk).
+
+    Returns:
+       Workflow
+    """
+    interned = {}
+
+    def _intern(structure):
+        d = structure if isinstance(structure, dict) else structure.as_dict()
+        key = json.dumps(d, sort_keys=True)
+        if key not in interned:
+            handle = intern_structure(d, db_file=db_file, blob_dir=blob_dir)
+            if handle["store"] == "gridfs":
+                handle["db_file"] = ref_db_file
+            interned[key] = handle
+        return dict(interned[key])
+
+    def _intern_tasks(tasks):
+        for task in tasks:
+            if isinstance(task, RunVaspPacked):
+                for job in task["jobs"]:
+                    _intern_tasks(job)
+                continue
+            if not isinstance(task, (WriteVaspFromIOSet, WriteTransmutedStructureIOSet,
+                                     ElasticTensorToDb)):
+                continue
+            vis = task.get("vasp_input_set")
+            if hasattr(vis, "as_dict"):
+                vis_dict = vis.as_dict()
+                vis_name = "{}.{}".format(vis_dict.pop("@module"), vis_dict.pop("@class"))
+                vis_dict.pop("@version", None)
+                vis_structure = vis_dict.pop("structure")
+                # the structure of the input set object is the one written
+                if isinstance(task, WriteVaspFromIOSet):
+                    task["structure"] = vis_structure
+                task["vasp_input_set"] = vis_name
+                task["vasp_input_params"] = vis_dict
+            if isinstance(task.get("structure"), (Structure, dict)) and \
+                    not is_blob_handle(task["structure"]):
+                task["structure"] = _intern(task["structure"])
+
+    for fw in original_wf.fws:
+        _intern_tasks(fw.tasks)
+    return original_wf
+
+
 def add_small_gap_multiply(
     original_wf, gap_cutoff, density_multiplier, fw_name_constraint=None
 ):
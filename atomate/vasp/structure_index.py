@@ -0,0 +1,279 @@
+# coding: utf-8
+
+
+"""
+This module defines a local structure fingerprint index, used to find
+structures that were already computed before submitting new workflows.
+
+Each structure is reduced to a fingerprint made of its reduced formula, its
+space group number and the number of formula units in its primitive cell.
+These are invariant to the choice of cell and to volume changes during
+relaxation, and candidates with the same fingerprint are confirmed with
+StructureMatcher.
+
+The fingerprint is only a prefilter: the space group and primitive cell found
+at a given symprec are not invariant within the StructureMatcher tolerances,
+e.g. a site displaced by 0.15 A lowers the symmetry of a structure while
+StructureMatcher still matches it. Structures without a match among the
+candidates sharing their fingerprint are therefore checked against all the
+indexed structures with the same reduced formula.
+"""
+
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from pydash.objects import get
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+
+from pymatgen import Structure
+from pymatgen.analysis.structure_matcher import StructureMatcher
+from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
+
+from atomate.utils.utils import get_logger
+from atomate.vasp.database import VaspCalcDb
+
+logger = get_logger(__name__)
+
+# structure field of the documents of each source collection
+SOURCE_FIELDS = {"tasks": ("task_id", "output.structure"),
+                 "materials": ("material_id", "structure")}
+
+
+def get_structure_fingerprint(structure, symprec=0.1):
+    """
+    Fingerprint of a structure: reduced formula, space group number and
+    number of formula units in the primitive cell.
+
+    Structures matched by StructureMatcher may have different fingerprints,
+    as small distortions can change the space group found at symprec. Only
+    the reduced formula is guaranteed to be shared.
+
+    Args:
+        structure (Structure): input structure
+        symprec (float): symmetry tolerance
+
+    Returns:
+        (dict) with the keys "fingerprint" (hash of the other fields),
+            "formula", "spacegroup" and "z"
+    """
+    formula = structure.composition.reduced_composition.alphabetical_formula
+    try:
+        sga = SpacegroupAnalyzer(structure, symprec=symprec)
+        spacegroup = sga.get_space_group_number()
+        primitive = sga.find_primitive()
+    except Exception:
+        spacegroup, primitive = 1, structure
+    z = int(primitive.composition.get_reduced_composition_and_factor()[1])
+    key = "{}|{}|{}".format(formula, spacegroup, z)
+    return {"fingerprint": hashlib.sha1(key.encode()).hexdigest()[:16],
+            "formula": formula, "spacegroup": spacegroup, "z": z}
+
+
+def _get_fingerprint_from_dict(args):
+    structure_dict, symprec = args
+    return get_structure_fingerprint(Structure.from_dict(structure_dict), symprec)
+
+
+class StructureIndex:
+    """
+    Fingerprint index of the structures in the tasks and materials
+    collections, stored in its own collection of the task database.
+    """
+
+    def __init__(self, db, tasks_collection="tasks", materials_collection="materials",
+                 collection_name="structure_fingerprints", symprec=0.1,
+                 ltol=0.2, stol=0.3, angle_tol=5):
+        """
+        Args:
+            db (Database): pymongo database holding the tasks and materials
+            tasks_collection (str): name of the tasks collection
+            materials_collection (str): name of the materials collection
+            collection_name (str): name of the collection holding the index
+            symprec (float): symmetry tolerance of the fingerprints
+            ltol (float): StructureMatcher tuning parameter
+            stol (float): StructureMatcher tuning parameter
+            angle_tol (float): StructureMatcher tuning parameter
+        """
+        self.db = db
+        self.source_collections = {"tasks": db[tasks_collection],
+                                   "materials": db[materials_collection]}
+        self.collection = db[collection_name]
+        self.symprec = symprec
+        self.matcher = StructureMatcher(ltol=ltol, stol=stol, angle_tol=angle_tol,
+                                        primitive_cell=True, scale=True,
+                                        attempt_supercell=False, allow_subset=False)
+        self.collection.create_index("fingerprint")
+        self.collection.create_index("formula")
+        self.collection.create_index([("source", ASCENDING), ("source_id", ASCENDING)],
+                                     unique=True)
+
+    @classmethod
+    def from_db_file(cls, db_file, **kwargs):
+        """
+        Args:
+            db_file (str): path to the db.json file of the task database
+            **kwargs: other arguments of StructureIndex
+
+        Returns:
+            StructureIndex
+        """
+        mmdb = VaspCalcDb.from_db_file(db_file, admin=True)
+        kwargs.setdefault("tasks_collection", mmdb.collection.name)
+        return cls(mmdb.db, **kwargs)
+
+    def build(self, sources=("tasks", "materials"), query=None, nprocs=1, chunk_size=1000):
+        """
+        Add the structures of the source collections that are not indexed yet.
+
+        Args:
+            sources (tuple): source collections to index, "tasks" and/or "materials"
+            query (dict): additional query on the source documents. By
+                default, only successful tasks are indexed.
+            nprocs (int): number of processes used to compute fingerprints.
+                None uses all available cores.
+            chunk_size (int): number of documents processed at a time
+
+        Returns:
+            (int) number of structures added to the index
+        """
+        n_added = 0
+        for source in sources:
+            id_field, structure_field = SOURCE_FIELDS[source]
+            q = dict(query or {})
+            if source == "tasks" and not query:
+                q["state"] = "successful"
+            # the ids are streamed and checked against the index a chunk at a
+            # time, as the ids of the whole collection may not fit in one query
+            cursor = self.source_collections[source].find(
+                q, {id_field: 1, "_id": 0}, batch_size=chunk_size)
+            chunk = []
+            for doc in cursor:
+                if doc.get(id_field) is not None:
+                    chunk.append(doc[id_field])
+                if len(chunk) >= chunk_size:
+                    n_added += self._add(source, chunk, nprocs)
+                    chunk = []
+            if chunk:
+                n_added += self._add(source, chunk, nprocs)
+        logger.info("Added {} structures to the structure index".format(n_added))
+        return n_added
+
+    def _add(self, source, source_ids, nprocs):
+        id_field, structure_field = SOURCE_FIELDS[source]
+        indexed = {d["source_id"] for d in self.collection.find(
+            {"source": source, "source_id": {"$in": source_ids}}, {"source_id": 1})}
+        new_ids = [i for i in source_ids if i not in indexed]
+        if not new_ids:
+            return 0
+        chunk = []
+        for doc in self.source_collections[source].find(
+                {id_field: {"$in": new_ids}}, {id_field: 1, structure_field: 1, "_id": 0}):
+            structure_dict = get(doc, structure_field)
+            if structure_dict is not None:
+                chunk.append((doc[id_field], structure_dict))
+
+        jobs = [(structure_dict, self.symprec) for _, structure_dict in chunk]
+        if nprocs == 1:
+            fingerprints = list(map(_get_fingerprint_from_dict, jobs))
+        else:
+            with ProcessPoolExecutor(max_workers=nprocs) as executor:
+                fingerprints = list(executor.map(_get_fingerprint_from_dict, jobs,
+                                                 chunksize=32))
+        docs = []
+        for (source_id, _), fp in zip(chunk, fingerprints):
+            fp.update({"source": source, "source_id": source_id})
+            docs.append(fp)
+        if not docs:
+            return 0
+        try:
+            return len(self.collection.insert_many(docs, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            # structures indexed meanwhile by a concurrent build
+            if any(err["code"] != 11000 for err in e.details["writeErrors"]):
+                raise
+            return e.details["nInserted"]
+
+    def find_matches(self, structures, sources=("tasks", "materials")):
+        """
+        Find the indexed structures matching each of the given structures.
+        All fingerprints are looked up in a single query, and StructureMatcher
+        is first run against the candidates sharing a fingerprint. The
+        structures without a match are then compared with the other indexed
+        structures of the same reduced formula, as matching structures may
+        have different space groups at the symmetry tolerance of the index.
+
+        Args:
+            structures ([Structure]): structures to check
+            sources (tuple): source collections to match against
+
+        Returns:
+            list with, for each structure, a list of (source, source_id) of
+                the matching structures (empty if there is no match)
+        """
+        fps = [get_structure_fingerprint(s, self.symprec) for s in structures]
+        candidates = self._get_candidates(
+            "fingerprint", {fp["fingerprint"] for fp in fps}, sources)
+        candidate_structures = self._get_structures(candidates)
+        matches = [self._match(structure, candidates.get(fp["fingerprint"], []),
+                               candidate_structures)
+                   for structure, fp in zip(structures, fps)]
+
+        # formula-only candidates of the structures without a match
+        unmatched = [i for i, m in enumerate(matches) if not m]
+        if unmatched:
+            formula_candidates = self._get_candidates(
+                "formula", {fps[i]["formula"] for i in unmatched}, sources)
+            candidate_structures.update(self._get_structures(formula_candidates,
+                                                             exclude=candidate_structures))
+            for i in unmatched:
+                tried = set(candidates.get(fps[i]["fingerprint"], []))
+                matches[i] = self._match(
+                    structures[i], [c for c in formula_candidates.get(fps[i]["formula"], [])
+                                    if c not in tried], candidate_structures)
+        return matches
+
+    def _get_candidates(self, field, values, sources):
+        candidates = defaultdict(list)
+        for doc in self.collection.find({field: {"$in": list(values)},
+                                         "source": {"$in": list(sources)}},
+                                        {field: 1, "source": 1, "source_id": 1}):
+            candidates[doc[field]].append((doc["source"], doc["source_id"]))
+        return candidates
+
+    def _get_structures(self, candidates, exclude=()):
+        # fetch the structures of all candidates in bulk
+        ids_by_source = defaultdict(set)
+        for cands in candidates.values():
+            for c in cands:
+                if c not in exclude:
+                    ids_by_source[c[0]].add(c[1])
+        structures = {}
+        for source, ids in ids_by_source.items():
+            id_field, structure_field = SOURCE_FIELDS[source]
+            for doc in self.source_collections[source].find(
+                    {id_field: {"$in": list(ids)}}, {id_field: 1, structure_field: 1}):
+                structure_dict = get(doc, structure_field)
+                if structure_dict is not None:
+                    structures[(source, doc[id_field])] = Structure.from_dict(structure_dict)
+        return structures
+
+    def _match(self, structure, candidates, candidate_structures):
+        return [c for c in candidates if c in candidate_structures and
+                self.matcher.fit(structure, candidate_structures[c])]
+
+    def filter_new(self, structures, sources=("tasks", "materials")):
+        """
+        Structures that do not match any indexed structure.
+
+        Args:
+            structures ([Structure]): structures to check
+            sources (tuple): source collections to match against
+
+        Returns:
+            list of Structures
+        """
+        return [s for s, m in zip(structures, self.find_matches(structures, sources))
+                if not m]
+
@@ -6,6 +6,8 @@ from monty.json import MSONable, MontyDecoder
 from pymatgen import MPRester
 from pymatgen.alchemy.filters import AbstractStructureFilter
 
+from atomate.vasp.structure_index import StructureIndex
+
 __author__ = 'Anubhav Jain <ajain@lbl.gov>, Kiran Mathew <kmathew@lbl.gov>'
 
 
@@ -14,7 +16,8 @@ class SubmissionFilter(AbstractStructureFilter):
                   'Cf', 'Es', 'Fm', 'Md', 'No', 'Lr']
 
     def __init__(self, is_valid=True, potcar_exists=True, max_natoms=200, is_ordered=True,
-                 not_in_MP=True, MAPI_KEY=None, require_bandstructure=False):
+                 not_in_MP=True, MAPI_KEY=None, require_bandstructure=False,
+                 not_in_db=False, db_file=None):
         """
         Initialize a submission filter for checking that structures are valid for calculations.
 
@@ -26,6 +29,11 @@ class SubmissionFilter(AbstractStructureFilter):
             not_in_MP (bool): If true, ensures structure not in MP
             MAPI_KEY (str): For MP checks, your MAPI key if not previously set as config var
             require_bandstructure (bool): For MP checks, require a band structure calc
+            not_in_db (bool): If true, ensures structure is not in the tasks or
+                materials collections of the database in db_file, using the local
+                StructureIndex (which must have been built beforehand). Can be used
+                with not_in_MP=False as an offline replacement of the MP check.
+            db_file (str): For database checks, path to the db.json file
         """
         self.is_valid = is_valid
         self.potcar_exists = potcar_exists
@@ -34,8 +42,42 @@ class SubmissionFilter(AbstractStructureFilter):
         self.not_in_MP = not_in_MP
         self.MAPI_KEY = MAPI_KEY
         self.require_bandstructure = require_bandstructure
+        self.not_in_db = not_in_db
+        self.db_file = db_file
+        self._mpr = None
+        self._structure_index = None
+
+    @property
+    def mpr(self):
+        if self._mpr is None:
+            self._mpr = MPRester(self.MAPI_KEY)
+        return self._mpr
+
+    @property
+    def structure_index(self):
+        if self._structure_index is None:
+            self._structure_index = StructureIndex.from_db_file(self.db_file)
+        return self._structure_index
 
     def test(self, structure):
+        return self.test_many([structure])[0]
+
+    def test_many(self, structures):
+        """
+        Test several structures, looking them up in the database in bulk.
+
+        Args:
+            structures ([Structure]): structures to test
+
+        Returns:
+            list of bools
+        """
+        db_matches = [[]] * len(structures)
+        if self.not_in_db:
+            db_matches = self.structure_index.find_matches(structures)
+        return [self._test(s, m) for s, m in zip(structures, db_matches)]
+
+    def _test(self, structure, db_matches):
         failures = []
 
         if self.is_valid:
@@ -55,8 +97,11 @@ class SubmissionFilter(AbstractStructureFilter):
             if not structure.is_ordered:
                 failures.append("IS_ORDERED=False")
 
+        if db_matches:
+            failures.append("NOT_IN_DB=False ({} {})".format(*db_matches[0]))
+
         if self.not_in_MP:
-            mpr = MPRester(self.MAPI_KEY)
+            mpr = self.mpr
             mpids = mpr.find_structure(structure)
             if mpids:
                 if self.require_bandstructure:
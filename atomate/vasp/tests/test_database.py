@@ -0,0 +1,85 @@
+# coding: utf-8
+
+import os
+import unittest
+
+import numpy as np
+
+from atomate.utils.testing import AtomateTest
+from atomate.vasp.database import VaspCalcDb, QUERY_SHAPES
+from atomate.vasp.firetasks.parse_outputs import get_calc_fields
+
+module_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+db_dir = os.path.join(module_dir, "..", "..", "common", "test_files")
+
+
+class VaspCalcDbTest(AtomateTest):
+
+    def setUp(self):
+        super(VaspCalcDbTest, self).setUp(lpad=False)
+        self.mmdb = VaspCalcDb.from_db_file(os.path.join(db_dir, "db.json"))
+        self.mmdb.reset()
+
+    def tearDown(self):
+        self.mmdb.reset()
+        super(VaspCalcDbTest, self).tearDown()
+
+    def test_binary_arrays(self):
+        fc = np.random.rand(4, 4, 3, 3)
+        task_doc = {"dir_name": "host:/path/to/calc",
+                    "calcs_reversed": [{"output": {"energy": -2.0, "force_constants": fc.tolist()}},
+                                       {"output": {"energy": -1.0}}]}
+        t_id = self.mmdb.insert_task(task_doc, binary_arrays=True)
+
+        doc = self.mmdb.collection.find_one({"task_id": t_id})
+        output = doc["calcs_reversed"][0]["output"]
+        self.assertNotIn("force_constants", output)
+        self.assertIn("force_constants_fs_id", output)
+        self.assertTrue(np.allclose(self.mmdb.get_calc_array(output, "force_constants"), fc))
+
+        # inline arrays are still supported
+        self.assertTrue(np.allclose(
+            self.mmdb.get_calc_array({"force_constants": fc.tolist()}, "force_constants"), fc))
+
+    def test_get_calc_fields(self):
+        for i in range(3):
+            self.mmdb.insert({"dir_name": "host:/calc/{}".format(i), "task_label": "test",
+                              "calcs_reversed": [{"output": {"energy": -i, "big": [0] * 100}},
+                                                 {"output": {"energy": 10 - i}}]})
+        docs = get_calc_fields(self.mmdb.collection, {"task_label": "test"},
+                               {"energy": "output.energy"}, extra_fields=["task_id"])
+        self.assertEqual(sorted(d["energy"] for d in docs), [8, 9, 10])
+        self.assertEqual(set(docs[0].keys()), {"task_id", "energy"})
+        docs = get_calc_fields(self.mmdb.collection, {"task_label": "test"},
+                               {"energy": "output.energy"}, calc_index=0)
+        self.assertEqual(sorted(d["energy"] for d in docs), [-2, -1, 0])
+
+        # a calculation without the field is not skipped over
+        self.mmdb.insert({"dir_name": "host:/calc/3", "task_label": "partial",
+                          "calcs_reversed": [{"output": {}}, {"output": {"energy": 5}}]})
+        docs = get_calc_fields(self.mmdb.collection, {"task_label": "partial"},
+                               {"energy": "output.energy"}, calc_index=0)
+        self.assertEqual(docs, [{}])
+        docs = get_calc_fields(self.mmdb.collection, {"task_label": "partial"},
+                               {"energy": "output.energy"}, calc_index=1)
+        self.assertEqual(docs, [{"energy": 5}])
+
+    def test_index_advisor(self):
+        self.mmdb.insert({"dir_name": "host:/calc/0", "task_label": "test",
+                          "wf_meta": {"wf_uuid": "uuid"}})
+        shape = [{"name": "magnetism", "collection": "tasks",
+                  "filter": {"wf_meta.wf_uuid": "uuid", "task_label": "test"}}]
+        self.mmdb.collection.drop_indexes()
+        self.assertEqual(len(self.mmdb.advise_indexes(shape)), 1)
+
+        self.mmdb.build_indexes()
+        report = self.mmdb.explain_queries()
+        self.assertEqual(len(report), len(QUERY_SHAPES))
+        collscans = [r["name"] for r in report
+                     if r["collscan"] and r["collection"] == self.mmdb.collection.name]
+        self.assertEqual(collscans, [])
+        self.assertEqual(self.mmdb.advise_indexes(shape), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
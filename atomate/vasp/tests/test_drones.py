@@ -2,7 +2,10 @@
 # Copyright (c) Materials Virtual Lab.
 # Distributed under the terms of the BSD License.
 
+import json
 import os
+import shutil
+import tempfile
 import unittest
 
 from monty.json import MontyDecoder
@@ -228,3 +231,30 @@ class VaspToDbTaskDroneTest(unittest.TestCase):
             len(doc["output"]["dielectric"]["energy"]),
             len(doc["output"]["optical_absorption_coeff"]),
         )
+
+    def test_merge_segments(self):
+        # a relaxation continued in a static segment after reaching the walltime
+        scratch_dir = tempfile.mkdtemp()
+        try:
+            prev_dir = os.path.join(scratch_dir, "segment0")
+            last_dir = os.path.join(scratch_dir, "segment1")
+            shutil.copytree(self.relax2, prev_dir)
+            shutil.copytree(self.Si_static, last_dir)
+            with open(os.path.join(last_dir, "continuation.json"), "w") as f:
+                json.dump({"segment": 1, "prev_dirs": [prev_dir]}, f)
+
+            drone = VaspDrone()
+            prev_doc = drone.assimilate(prev_dir)
+            doc = drone.assimilate(last_dir)
+            self.assertEqual(len(doc["calcs_reversed"]), 3)
+            self.assertEqual(doc["calcs_reversed"][1:], prev_doc["calcs_reversed"])
+            self.assertEqual(doc["input"], prev_doc["input"])
+            self.assertEqual(doc["continuation"]["dir_names"], [prev_doc["dir_name"]])
+            self.assertEqual(sorted(doc["run_stats"]),
+                             ["overall", "relax1_segment0", "relax2_segment0", "standard"])
+            self.assertAlmostEqual(
+                doc["run_stats"]["overall"]["Elapsed time (sec)"],
+                sum(v["Elapsed time (sec)"] for k, v in doc["run_stats"].items()
+                    if k != "overall"))
+        finally:
+            shutil.rmtree(scratch_dir)
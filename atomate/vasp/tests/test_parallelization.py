@@ -0,0 +1,111 @@
+# coding: utf-8
+
+import itertools
+import os
+import socket
+import unittest
+
+from monty.serialization import loadfn
+
+from pymatgen.core.lattice import Lattice
+from pymatgen.core.structure import Structure
+from pymatgen.io.vasp import Incar, Kpoints
+
+from atomate.utils.testing import AtomateTest
+from atomate.vasp.database import VaspCalcDb
+from atomate.vasp.firetasks.write_inputs import TuneParallelization
+from atomate.vasp.parallelization import ParallelizationTuner, \
+    get_heuristic_parallelization, get_time_per_scf_step, is_valid_parallelization
+
+module_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+db_dir = os.path.join(module_dir, "..", "..", "common", "test_files")
+
+# CalcDb.insert updates the task with the same dir_name
+calc_ids = itertools.count()
+
+
+def get_task_doc(nsites, ncore, kpar, elapsed, nscf=10, cores=32, hostname=None):
+    steps = [{"electronic_steps": [{}] * nscf}]
+    doc = {"state": "successful", "nsites": nsites, "dir_name": "/calc_{}".format(next(calc_ids)),
+           "run_stats": {"standard": {"cores": cores},
+                         "overall": {"Elapsed time (sec)": elapsed}},
+           "calcs_reversed": [{"input": {"incar": {"NCORE": ncore, "KPAR": kpar},
+                                         "nkpoints": 20,
+                                         "parameters": {"NBANDS": 8 * nsites}},
+                               "output": {"ionic_steps": steps}}]}
+    if hostname:
+        doc["parallelization"] = {"hostname": hostname}
+    return doc
+
+
+class ParallelizationTest(AtomateTest):
+
+    def setUp(self):
+        super(ParallelizationTest, self).setUp(lpad=False)
+        self.mmdb = VaspCalcDb.from_db_file(os.path.join(db_dir, "db.json"))
+        self.mmdb.reset()
+
+    def tearDown(self):
+        self.mmdb.reset()
+        super(ParallelizationTest, self).tearDown()
+
+    def test_heuristic(self):
+        params = get_heuristic_parallelization(32, nkpoints=20)
+        self.assertEqual(params, {"NCORE": 2, "KPAR": 4, "NSIM": 4})
+        self.assertTrue(is_valid_parallelization(params, 32, 20))
+        self.assertEqual(get_heuristic_parallelization(16, nkpoints=1)["KPAR"], 1)
+        self.assertFalse(is_valid_parallelization({"NCORE": 3, "KPAR": 2}, 32))
+        self.assertEqual(get_time_per_scf_step(get_task_doc(10, 4, 2, 100.)), 10.)
+
+    def test_recommend(self):
+        for i in range(3):
+            self.mmdb.insert(get_task_doc(10, 4, 2, 100. + i))
+            self.mmdb.insert(get_task_doc(12, 8, 1, 300. + i))
+            self.mmdb.insert(get_task_doc(10, 2, 4, 100. + i, cores=64))
+        tuner = ParallelizationTuner(self.mmdb.collection)
+        self.assertEqual(len(tuner.get_records(32, 10)), 6)
+
+        params, info = tuner.recommend(32, 11, nkpoints=20, nbands=88)
+        self.assertEqual(params, {"NCORE": 4, "KPAR": 2, "NSIM": 4})
+        self.assertEqual(info["source"], "history")
+
+        params, info = tuner.recommend(16, 11, nkpoints=20)
+        self.assertEqual(info["source"], "heuristic")
+        self.assertEqual(params, get_heuristic_parallelization(16, 20))
+
+    def test_same_worker(self):
+        # the tasks of the worker are preferred when there are enough of them
+        for i in range(3):
+            self.mmdb.insert(get_task_doc(10, 4, 2, 100. + i, hostname="node1"))
+            self.mmdb.insert(get_task_doc(10, 8, 1, 300. + i, hostname="node2"))
+        tuner = ParallelizationTuner(self.mmdb.collection, n_neighbors=3)
+        self.assertEqual(sorted(r["worker"] for r in tuner.get_records(32, 10)),
+                         ["node1"] * 3 + ["node2"] * 3)
+        params, _ = tuner.recommend(32, 10, nkpoints=20, worker="node2")
+        self.assertEqual(params["NCORE"], 8)
+        params, _ = tuner.recommend(32, 10, nkpoints=20, worker="node1")
+        self.assertEqual(params["NCORE"], 4)
+
+    def test_tune_parallelization(self):
+        hostname = socket.gethostname()
+        for i in range(3):
+            self.mmdb.insert(get_task_doc(2, 8, 1, 100. + i, hostname=hostname))
+        Structure(Lattice.cubic(3.0), ["Si", "Si"],
+                  [[0, 0, 0], [0.25, 0.25, 0.25]]).to(fmt="POSCAR", filename="POSCAR")
+        Kpoints.gamma_automatic((4, 4, 4)).write_file("KPOINTS")
+        Incar({"ENCUT": 520, "NPAR": 4}).write_file("INCAR")
+
+        TuneParallelization(db_file=os.path.join(db_dir, "db.json"),
+                            ncores=32).run_task({})
+        incar = Incar.from_file("INCAR")
+        self.assertNotIn("NPAR", incar)
+        self.assertEqual(incar["NCORE"], 8)
+        info = loadfn("parallelization.json")
+        self.assertEqual(info["hostname"], hostname)
+        self.assertEqual(info["source"], "history")
+        self.assertEqual(info["params"], {"NCORE": 8, "KPAR": 1, "NSIM": 4})
+        self.assertEqual(info["ncores"], 32)
+
+
+if __name__ == "__main__":
+    unittest.main()
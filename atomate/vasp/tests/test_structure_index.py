@@ -0,0 +1,87 @@
+# coding: utf-8
+
+import os
+import unittest
+
+from pymatgen.util.testing import PymatgenTest
+
+from atomate.utils.testing import AtomateTest
+from atomate.vasp.database import VaspCalcDb
+from atomate.vasp.structure_index import StructureIndex, get_structure_fingerprint
+from atomate.vasp.submission_filter import SubmissionFilter
+
+module_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+db_dir = os.path.join(module_dir, "..", "..", "common", "test_files")
+
+
+class StructureIndexTest(AtomateTest):
+
+    def setUp(self):
+        super(StructureIndexTest, self).setUp(lpad=False)
+        self.db_file = os.path.join(db_dir, "db.json")
+        self.mmdb = VaspCalcDb.from_db_file(self.db_file)
+        self.mmdb.reset()
+        self.mmdb.db["structure_fingerprints"].drop()
+        self.si = PymatgenTest.get_structure("Si")
+        self.mmdb.insert({"dir_name": "host:/calc/0", "state": "successful",
+                          "output": {"structure": self.si.as_dict()}})
+
+    def tearDown(self):
+        self.mmdb.reset()
+        self.mmdb.db["structure_fingerprints"].drop()
+        super(StructureIndexTest, self).tearDown()
+
+    def test_fingerprint(self):
+        supercell = self.si.copy()
+        supercell.make_supercell([2, 1, 1])
+        supercell.scale_lattice(supercell.volume * 1.1)
+        self.assertEqual(get_structure_fingerprint(self.si)["fingerprint"],
+                         get_structure_fingerprint(supercell)["fingerprint"])
+        self.assertNotEqual(get_structure_fingerprint(self.si)["fingerprint"],
+                            get_structure_fingerprint(
+                                PymatgenTest.get_structure("CsCl"))["fingerprint"])
+
+    def test_find_matches(self):
+        index = StructureIndex.from_db_file(self.db_file)
+        self.assertEqual(index.build(), 1)
+        self.assertEqual(index.build(), 0)
+
+        strained = self.si.copy()
+        strained.scale_lattice(self.si.volume * 1.05)
+        cscl = PymatgenTest.get_structure("CsCl")
+        matches = index.find_matches([strained, cscl])
+        self.assertEqual(len(matches[0]), 1)
+        self.assertEqual(matches[0][0][0], "tasks")
+        self.assertEqual(matches[1], [])
+        self.assertEqual(index.filter_new([strained, cscl]), [cscl])
+
+        sfilter = SubmissionFilter(not_in_MP=False, not_in_db=True, db_file=self.db_file)
+        self.assertEqual(sfilter.test_many([strained, cscl]), [False, True])
+        self.assertFalse(sfilter.test(self.si))
+
+    def test_find_matches_distorted(self):
+        index = StructureIndex.from_db_file(self.db_file)
+        index.build()
+        # the displaced site lowers the space group at symprec=0.1, but the
+        # structure still matches within the StructureMatcher tolerances
+        distorted = self.si.copy()
+        distorted.translate_sites([0], [0.15, 0, 0], frac_coords=False)
+        self.assertNotEqual(get_structure_fingerprint(distorted)["fingerprint"],
+                            get_structure_fingerprint(self.si)["fingerprint"])
+        matches = index.find_matches([distorted, self.si])
+        self.assertEqual(len(matches[0]), 1)
+        self.assertEqual(matches[0], matches[1])
+        self.assertEqual(index.filter_new([distorted]), [])
+
+    def test_build_chunks(self):
+        for i in range(1, 4):
+            self.mmdb.insert({"dir_name": "host:/calc/{}".format(i), "state": "successful",
+                              "output": {"structure": self.si.as_dict()}})
+        index = StructureIndex.from_db_file(self.db_file)
+        self.assertEqual(index.build(sources=("tasks",), chunk_size=3), 4)
+        self.assertEqual(index.build(sources=("tasks",), chunk_size=3), 0)
+        self.assertEqual(index.collection.count_documents({"source": "tasks"}), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
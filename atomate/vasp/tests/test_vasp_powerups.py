@@ -1,5 +1,9 @@
+import json
+import shutil
+import tempfile
 import unittest
 
+from atomate.utils.blob_store import is_blob_handle, resolve_blobs
 from atomate.utils.utils import get_fws_and_tasks
 from fireworks import Firework, ScriptTask, Workflow
 
@@ -18,7 +22,15 @@ from atomate.vasp.powerups import (
     clean_up_files,
     set_queue_options,
     use_potcar_spec,
+    add_warm_start,
+    add_parallelization_tuning,
+    pack_vasp_fws,
+    add_walltime_continuation,
+    use_blob_store,
+    intern_structures,
 )
+from atomate.vasp.firetasks.glue_tasks import pass_vasp_result
+from atomate.vasp.firetasks.run_calc import RunVaspCustodian
 from atomate.vasp.workflows.base.core import get_wf
 
 from pymatgen.io.vasp.sets import MPRelaxSet
@@ -259,6 +271,106 @@ class TestVaspPowerups(unittest.TestCase):
             task = wf.fws[idx_fw].tasks[idx_t]
             self.assertTrue(task["potcar_spec"])
 
+    def test_add_warm_start(self):
+        wf = add_warm_start(copy_wf(self.bs_wf), seed_params={"seed_geometry": True},
+                            fw_name_constraint="structure optimization")
+
+        for fw in wf.fws:
+            names = [t["_fw_name"] for t in fw.tasks]
+            if "structure optimization" in fw.name:
+                idx = names.index("{{atomate.vasp.firetasks.glue_tasks.SeedFromPreviousCalc}}")
+                self.assertIn("RunVasp", names[idx + 1])
+                self.assertEqual(fw.tasks[idx]["db_file"], ">>db_file<<")
+                self.assertTrue(fw.tasks[idx]["seed_geometry"])
+            else:
+                self.assertFalse(any("SeedFromPreviousCalc" in n for n in names))
+
+    def test_add_parallelization_tuning(self):
+        wf = add_parallelization_tuning(copy_wf(self.bs_wf), tuning_params={"ncores": 32})
+
+        for fw in wf.fws:
+            names = [t["_fw_name"] for t in fw.tasks]
+            idx = names.index("{{atomate.vasp.firetasks.write_inputs.TuneParallelization}}")
+            self.assertIn("RunVasp", names[idx + 1])
+            self.assertEqual(fw.tasks[idx]["ncores"], 32)
+            self.assertFalse(fw.tasks[idx + 1]["auto_npar"])
+
+    def test_pack_vasp_fws(self):
+        wf = pack_vasp_fws(copy_wf(self.bs_wf), packing_params={"cores_per_job": 16})
+        self.assertEqual(len(wf.fws), 3)
+
+        packed = [fw for fw in wf.fws if fw.name.startswith("packed")]
+        self.assertEqual(len(packed), 1)
+        task = packed[0].tasks[0]
+        self.assertEqual(task["_fw_name"], "{{atomate.vasp.firetasks.run_calc.RunVaspPacked}}")
+        self.assertEqual(len(task["jobs"]), 2)
+        self.assertEqual(task["cores_per_job"], 16)
+        self.assertIn("nscf", packed[0].name)
+
+        # the packed Firework takes the place of its jobs in the workflow
+        static = [fw for fw in wf.fws if "static" in fw.name][0]
+        self.assertEqual(wf.links[static.fw_id], [packed[0].fw_id])
+        self.assertEqual(wf.links[packed[0].fw_id], [])
+
+        wf = pack_vasp_fws(copy_wf(self.bs_wf), fw_name_constraint="optimization")
+        self.assertEqual(len(wf.fws), 4)
+
+    def test_add_walltime_continuation(self):
+        wf = add_walltime_continuation(copy_wf(self.bs_wf), wall_time=3600,
+                                       fw_name_constraint="structure optimization")
+        wf = copy_wf(wf)
+
+        idx_list = get_fws_and_tasks(wf, task_name_constraint="RunVaspCustodian")
+        for idx_fw, idx_t in idx_list:
+            fw = wf.fws[idx_fw]
+            task = fw.tasks[idx_t]
+            if "structure optimization" in fw.name:
+                self.assertEqual(task["wall_time"], 3600)
+                self.assertEqual(task["continuation"]["name"], fw.name)
+                self.assertEqual([t.fw_name for t in task["continuation"]["tasks"]],
+                                 [t.fw_name for t in fw.tasks[idx_t + 1:]])
+            else:
+                self.assertNotIn("continuation", task)
+
+    def test_use_blob_store(self):
+        fws = [Firework([RunVaspCustodian(vasp_cmd="test_VASP"),
+                         pass_vasp_result({"eigenvecs": "a>>normalmode_eigenvecs"},
+                                          mod_spec_key="normalmodes")],
+                        name="phonon {}".format(i)) for i in range(3)]
+        wf = pack_vasp_fws(Workflow(fws), pack_size=2)
+        wf = copy_wf(use_blob_store(wf, min_size=1000))
+
+        n_pass = 0
+        for fw in wf.fws:
+            tasks = fw.tasks
+            if fw.name.startswith("packed"):
+                tasks = [t for job in fw.tasks[0]["jobs"] for t in job]
+            for task in tasks:
+                if "PassResult" in task.fw_name:
+                    n_pass += 1
+                    self.assertEqual(task["blob_store"],
+                                     {"db_file": ">>db_file<<", "blob_dir": None,
+                                      "min_size": 1000})
+        self.assertEqual(n_pass, 3)
+
+    def test_intern_structures(self):
+        blob_dir = tempfile.mkdtemp()
+        try:
+            wf = intern_structures(copy_wf(self.bs_wf), blob_dir=blob_dir)
+            self.assertLess(len(json.dumps(wf.to_dict())),
+                            len(json.dumps(self.bs_wf.to_dict())))
+            wf = copy_wf(wf)
+            idx_fw, idx_t = get_fws_and_tasks(
+                wf, task_name_constraint="WriteVaspFromIOSet")[0]
+            task = wf.fws[idx_fw].tasks[idx_t]
+            self.assertTrue(is_blob_handle(task["structure"]))
+            self.assertEqual(task["vasp_input_set"], "pymatgen.io.vasp.sets.MPRelaxSet")
+            self.assertTrue(task["vasp_input_params"]["force_gamma"])
+            self.assertEqual(resolve_blobs(task["structure"]),
+                             PymatgenTest.get_structure("Si"))
+        finally:
+            shutil.rmtree(blob_dir)
+
 
 def copy_wf(wf):
     return Workflow.from_dict(wf.to_dict())
@@ -1,2 +1,5 @@
 
-from .presets.core import *
+from atomate.utils.lazy_import import lazy_star_imports
+
+# the preset workflows are imported on first use
+__getattr__, __dir__ = lazy_star_imports(__name__, ["presets.core"])
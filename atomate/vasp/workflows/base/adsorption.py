@@ -5,15 +5,21 @@
 This module defines a workflow for adsorption on surfaces
 """
 
+import inspect
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
 from fireworks import Workflow
 
 from atomate.vasp.fireworks.core import OptimizeFW, TransmuterFW
-from atomate.utils.utils import get_meta_from_structure
+from atomate.utils.utils import get_meta_from_structure, get_logger
 
 from pymatgen.analysis.adsorption import AdsorbateSiteFinder
-from pymatgen.core.surface import generate_all_slabs, Slab
+from pymatgen.core.surface import generate_all_slabs, Slab, SlabGenerator, \
+    get_symmetrically_distinct_miller_indices
 from pymatgen.transformations.advanced_transformations import SlabTransformation
 from pymatgen.transformations.standard_transformations import SupercellTransformation
 from pymatgen.io.vasp.sets import MVLSlabSet
@@ -21,6 +27,8 @@ from pymatgen.io.vasp.sets import MVLSlabSet
 __author__ = 'Joseph Montoya, Richard Tran'
 __email__ = 'montoyjh@lbl.gov'
 
+logger = get_logger(__name__)
+
 
 # TODO: Add functionality for reconstructions
 # TODO: Add framework for including vibrations and free energy
@@ -187,40 +195,15 @@ def get_wf_slab(slab, include_bulk_opt=False, adsorbates=None,
 
     # Add bulk opt firework if specified
     if include_bulk_opt:
-        oriented_bulk = slab.oriented_unit_cell
-        vis = MPSurfaceSet(oriented_bulk, bulk=True)
-        fws.append(OptimizeFW(structure=oriented_bulk, vasp_input_set=vis,
-                              vasp_cmd=vasp_cmd, db_file=db_file))
+        fws.append(_get_bulk_opt_fw(slab, vasp_cmd, db_file))
         parents = fws[-1]
 
-    name = slab.composition.reduced_formula
-    if getattr(slab, "miller_index", None):
-        name += "_{}".format(slab.miller_index)
-    # Create slab fw and add it to list of fws
-    slab_fw = get_slab_fw(slab, include_bulk_opt, db_file=db_file,
-                          vasp_cmd=vasp_cmd, parents=parents,
-                          name="{} slab optimization".format(name))
-    fws.append(slab_fw)
-
-    for adsorbate in adsorbates:
-        ads_slabs = AdsorbateSiteFinder(slab).generate_adsorption_structures(
-            adsorbate, **ads_structures_params)
-        for n, ads_slab in enumerate(ads_slabs):
-            # Create adsorbate fw
-            ads_name = "{}-{} adsorbate optimization {}".format(
-                adsorbate.composition.formula, name, n)
-            adsorbate_fw = get_slab_fw(
-                ads_slab, include_bulk_opt, db_file=db_file, vasp_cmd=vasp_cmd,
-                parents=parents, name=ads_name)
-            fws.append(adsorbate_fw)
-
-    if isinstance(slab, Slab):
-        name = "{}_{} slab workflow".format(
-            slab.composition.reduced_composition, slab.miller_index)
-    else:
-        name = "{} slab workflow".format(slab.composition.reduced_composition)
+    ads_structures = [(adsorbate, get_adsorption_structures(
+        slab, adsorbate, ads_structures_params)) for adsorbate in adsorbates]
+    fws.extend(_get_slab_and_adsorbate_fws(slab, ads_structures, include_bulk_opt,
+                                           vasp_cmd, db_file, parents))
 
-    wf = Workflow(fws, name=name)
+    wf = Workflow(fws, name=_get_slab_wf_name(slab))
 
     # Add optional molecules workflow
     if add_molecules_in_box:
@@ -258,12 +241,126 @@ def get_wf_molecules(molecules, vasp_input_set=None, db_file=None,
     return Workflow(fws, name=name)
 
 
-# TODO: this will duplicate a precursor optimization for slabs with
-#       the same miller index, but different shift
+def _get_bulk_opt_fw(slab, vasp_cmd, db_file):
+    """
+    Optimization of the oriented unit cell of a slab
+    """
+    oriented_bulk = slab.oriented_unit_cell
+    vis = MPSurfaceSet(oriented_bulk, bulk=True)
+    return OptimizeFW(structure=oriented_bulk, vasp_input_set=vis,
+                      vasp_cmd=vasp_cmd, db_file=db_file)
+
+
+def _get_slab_and_adsorbate_fws(slab, ads_structures, include_bulk_opt,
+                                vasp_cmd, db_file, parents):
+    """
+    Slab firework followed by the fireworks of its adsorption structures
+
+    Args:
+        slab (Slab or Structure): slab
+        ads_structures ([(Molecule, [Slab])]): adsorbates and their
+            adsorption structures on the slab
+        include_bulk_opt (bool): whether the fireworks are TransmuterFWs
+            based on the bulk optimization of the oriented unit cell
+        vasp_cmd (string): vasp command
+        db_file (string): path to database file
+        parents (Firework or list): parent fireworks
+
+    Returns:
+        list of Fireworks
+    """
+    name = slab.composition.reduced_formula
+    if getattr(slab, "miller_index", None):
+        name += "_{}".format(slab.miller_index)
+    # Create slab fw and add it to list of fws
+    fws = [get_slab_fw(slab, include_bulk_opt, db_file=db_file,
+                       vasp_cmd=vasp_cmd, parents=parents,
+                       name="{} slab optimization".format(name))]
+
+    for adsorbate, ads_slabs in ads_structures:
+        for n, ads_slab in enumerate(ads_slabs):
+            # Create adsorbate fw
+            ads_name = "{}-{} adsorbate optimization {}".format(
+                adsorbate.composition.formula, name, n)
+            adsorbate_fw = get_slab_fw(
+                ads_slab, include_bulk_opt, db_file=db_file, vasp_cmd=vasp_cmd,
+                parents=parents, name=ads_name)
+            fws.append(adsorbate_fw)
+    return fws
+
+
+def _get_slab_wf_name(slab):
+    if isinstance(slab, Slab):
+        return "{}_{} slab workflow".format(
+            slab.composition.reduced_composition, slab.miller_index)
+    return "{} slab workflow".format(slab.composition.reduced_composition)
+
+
+def get_adsorption_structures(slab, adsorbate, ads_structures_params=None):
+    """
+    Adsorption structures of an adsorbate on a slab
+
+    Args:
+        slab (Slab): slab
+        adsorbate (Molecule): adsorbate
+        ads_structures_params (dict): parameters to be supplied as
+            kwargs to AdsorbateSiteFinder.generate_adsorption_structures
+
+    Returns:
+        list of Slabs
+    """
+    return AdsorbateSiteFinder(slab).generate_adsorption_structures(
+        adsorbate, **(ads_structures_params or {}))
+
+
+def _split_slab_gen_params(slab_gen_params):
+    """
+    Split the slab_gen_params of generate_all_slabs between the arguments
+    of the SlabGenerator and of SlabGenerator.get_slabs.
+
+    Raises:
+        TypeError: if a parameter is an argument of neither
+    """
+    gen_args = inspect.signature(SlabGenerator.__init__).parameters
+    get_slabs_args = inspect.signature(SlabGenerator.get_slabs).parameters
+    # falsy, as slabs with reconstructions are generated by generate_all_slabs
+    params = {k: v for k, v in slab_gen_params.items()
+              if k != "include_reconstructions"}
+    unknown = [k for k in params if k not in gen_args and k not in get_slabs_args]
+    if unknown:
+        raise TypeError("Unknown slab_gen_params: {}".format(", ".join(unknown)))
+    return ({k: v for k, v in params.items() if k in gen_args},
+            {k: v for k, v in params.items() if k in get_slabs_args})
+
+
+def _get_slabs_for_miller_index(bulk_structure, miller_index, gen_params,
+                                get_slabs_params):
+    """
+    Slabs of a single Miller index, as generated by generate_all_slabs
+    """
+    gen = SlabGenerator(bulk_structure, miller_index, **gen_params)
+    return gen.get_slabs(**get_slabs_params)
+
+
+def _get_adsorption_structures_star(args):
+    return get_adsorption_structures(*args)
+
+
+def _map(func, iterable, nprocs):
+    """
+    map over a process pool, or serially if nprocs is 1
+    """
+    if nprocs == 1:
+        return list(map(func, iterable))
+    with ProcessPoolExecutor(max_workers=nprocs) as executor:
+        return list(executor.map(func, iterable))
+
+
 def get_wfs_all_slabs(bulk_structure, include_bulk_opt=False,
                       adsorbates=None, max_index=1, slab_gen_params=None,
                       ads_structures_params=None, vasp_cmd="vasp",
-                      db_file=None, add_molecules_in_box=False):
+                      db_file=None, add_molecules_in_box=False, nprocs=1,
+                      share_bulk_opt=True):
     """
     Convenience constructor that allows a user to construct a workflow
     that finds all adsorption configurations (or slabs) for a given
@@ -282,18 +379,73 @@ def get_wfs_all_slabs(bulk_structure, include_bulk_opt=False,
         db_file (str): location of db file
         add_molecules_in_box (bool): whether to add molecules in a box
             for the entire workflow
+        nprocs (int): number of processes used to generate the slabs (one
+            task per Miller index) and the adsorption structures (one task
+            per slab and adsorbate). None uses all available cores.
+        share_bulk_opt (bool): if include_bulk_opt is set, slabs with the
+            same Miller index (i.e., different terminations) share a single
+            optimization of their oriented unit cell and are returned as
+            one workflow per Miller index.
 
     Returns:
         list of slab-specific Workflows
     """
+    adsorbates = adsorbates or []
     # TODO: these could be more well-thought out defaults
     sgp = slab_gen_params or {"min_slab_size": 7.0, "min_vacuum_size": 20.0}
-    slabs = generate_all_slabs(bulk_structure, max_index=max_index, **sgp)
+
+    # generate slabs
+    t0 = time.time()
+    if nprocs == 1 or sgp.get("include_reconstructions"):
+        slabs = generate_all_slabs(bulk_structure, max_index=max_index, **sgp)
+    else:
+        gen_params, get_slabs_params = _split_slab_gen_params(sgp)
+        miller_indices = get_symmetrically_distinct_miller_indices(
+            bulk_structure, max_index)
+        n = len(miller_indices)
+        slabs = []
+        with ProcessPoolExecutor(max_workers=nprocs) as executor:
+            for miller_slabs in executor.map(
+                    _get_slabs_for_miller_index, [bulk_structure] * n,
+                    miller_indices, [gen_params] * n, [get_slabs_params] * n):
+                slabs.extend(miller_slabs)
+
+    # generate adsorption structures
+    t1 = time.time()
+    jobs = [(slab, adsorbate, ads_structures_params)
+            for slab in slabs for adsorbate in adsorbates]
+    all_ads_structures = iter(_map(_get_adsorption_structures_star, jobs, nprocs))
+    ads_structures = [[(adsorbate, next(all_ads_structures)) for adsorbate in adsorbates]
+                      for slab in slabs]
+
+    # build workflows, grouping slabs with the same oriented unit cell
+    t2 = time.time()
+    groups = OrderedDict()
+    for n, (slab, slab_ads_structures) in enumerate(zip(slabs, ads_structures)):
+        if include_bulk_opt and share_bulk_opt:
+            key = tuple(slab.miller_index)
+        else:
+            key = n
+        groups.setdefault(key, []).append((slab, slab_ads_structures))
+
     wfs = []
-    for slab in slabs:
-        slab_wf = get_wf_slab(slab, include_bulk_opt, adsorbates,
-                              ads_structures_params, vasp_cmd, db_file)
-        wfs.append(slab_wf)
+    for group in groups.values():
+        fws, parents = [], []
+        if include_bulk_opt:
+            fws.append(_get_bulk_opt_fw(group[0][0], vasp_cmd, db_file))
+            parents = fws[-1]
+        for slab, slab_ads_structures in group:
+            fws.extend(_get_slab_and_adsorbate_fws(
+                slab, slab_ads_structures, include_bulk_opt, vasp_cmd, db_file,
+                parents))
+        wfs.append(Workflow(fws, name=_get_slab_wf_name(group[0][0])))
+    t3 = time.time()
+
+    logger.info("Slab generation: {:.1f} s ({} slabs)".format(t1 - t0, len(slabs)))
+    logger.info("Adsorption structure generation: {:.1f} s ({} structures)".format(
+        t2 - t1, sum(len(a[1]) for s in ads_structures for a in s)))
+    logger.info("Workflow construction: {:.1f} s ({} workflows)".format(
+        t3 - t2, len(wfs)))
 
     if add_molecules_in_box:
         wfs.append(get_wf_molecules(adsorbates, db_file=db_file,
@@ -2,8 +2,10 @@
 
 
 import os
+from copy import deepcopy
+from functools import lru_cache
 
-from atomate.utils.utils import get_wf_from_spec_dict
+from atomate.utils.utils import get_wf_template
 
 from monty.serialization import loadfn
 
@@ -14,6 +16,14 @@ __email__ = 'ajain@lbl.gov, ongsp@eng.ucsd.edu, kmathew@lbl.gov'
 module_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)))
 
 
+@lru_cache(maxsize=None)
+def _load_library_spec(wf_filename):
+    """
+    Workflow spec of the library, parsed once per file
+    """
+    return loadfn(os.path.join(module_dir, "library", wf_filename))
+
+
 def get_wf(structure, wf_filename, params=None, common_params=None, vis=None, wf_metadata=None):
     """
     Get a workflow given a structure and a name of file from the workflow library.
@@ -35,7 +45,7 @@ def get_wf(structure, wf_filename, params=None, common_params=None, vis=None, wf
     Returns:
         A Workflow
     """
-    d = loadfn(os.path.join(module_dir, "library", wf_filename))
+    d = deepcopy(_load_library_spec(wf_filename))
 
     if params:
         if len(params) != len(d["fireworks"]):
@@ -51,13 +61,11 @@ def get_wf(structure, wf_filename, params=None, common_params=None, vis=None, wf
             d["common_params"] = {}
         d["common_params"].update(common_params)
 
-    if vis:
-        if "params" not in d["fireworks"][0]:
-            d["fireworks"][0]["params"] = {}
-        d["fireworks"][0]["params"]["vasp_input_set"] = vis.as_dict()
-
     if wf_metadata:
         d["metadata"] = d.get("metadata", {})
         d["metadata"].update(wf_metadata)
 
-    return get_wf_from_spec_dict(structure, d)
+    # the input set is specific to the structure, so it is not part of the
+    # (memoized) template
+    fw_param_updates = {0: {"vasp_input_set": vis}} if vis else None
+    return get_wf_template(d).get_wf(structure, fw_param_updates=fw_param_updates)
@@ -4,6 +4,7 @@ This module defines the deformation workflow.
 
 from atomate.utils.utils import get_logger
 from atomate.vasp.fireworks.core import TransmuterFW
+from atomate.vasp.powerups import pack_vasp_fws
 from fireworks import Workflow
 from pymatgen.io.vasp.sets import MPStaticSet
 
@@ -24,6 +25,7 @@ def get_wf_deformations(
     tag="",
     copy_vasp_outputs=True,
     metadata=None,
+    pack_size=None,
 ):
     """
     Returns a structure deformation workflow.
@@ -45,6 +47,9 @@ def get_wf_deformations(
         copy_vasp_outputs (bool): whether or not copy the outputs from the previous calc
             (usually structure optimization) before the transmuter fireworks.
         metadata (dict): meta data
+        pack_size (int): if set, the deformation calculations are packed by
+            this number into FireWorks running them concurrently in one
+            allocation (see pack_vasp_fws).
 
     Returns:
         Workflow
@@ -67,4 +72,7 @@ def get_wf_deformations(
 
     wfname = "{}:{}".format(structure.composition.reduced_formula, name)
 
-    return Workflow(fws, name=wfname, metadata=metadata)
+    wf = Workflow(fws, name=wfname, metadata=metadata)
+    if pack_size:
+        wf = pack_vasp_fws(wf, pack_size=pack_size)
+    return wf
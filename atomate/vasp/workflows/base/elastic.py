@@ -17,6 +17,7 @@ from atomate.utils.utils import get_logger, get_fws_and_tasks
 from atomate.vasp.workflows.base.deformations import get_wf_deformations
 from atomate.vasp.firetasks.parse_outputs import ElasticTensorToDb
 from atomate.vasp.firetasks.glue_tasks import pass_vasp_result
+from atomate.vasp.powerups import pack_vasp_fws
 
 __author__ = 'Shyam Dwaraknath, Joseph Montoya'
 __email__ = 'shyamd@lbl.gov, montoyjh@lbl.gov'
@@ -29,7 +30,7 @@ def get_wf_elastic_constant(structure, strain_states=None, stencils=None,
                             conventional=False, order=2, vasp_input_set=None,
                             analysis=True,
                             sym_reduce=False, tag='elastic',
-                            copy_vasp_outputs=False, **kwargs):
+                            copy_vasp_outputs=False, pack_size=None, **kwargs):
     """
     Returns a workflow to calculate elastic constants.
 
@@ -64,6 +65,9 @@ def get_wf_elastic_constant(structure, strain_states=None, stencils=None,
         sym_reduce (bool): Whether or not to apply symmetry reductions
         tag (str):
         copy_vasp_outputs (bool): whether or not to copy previous vasp outputs.
+        pack_size (int): if set, the deformation calculations are packed by
+            this number into FireWorks running them concurrently in one
+            allocation (see pack_vasp_fws).
         kwargs (keyword arguments): additional kwargs to be passed to get_wf_deformations
 
     Returns:
@@ -136,6 +140,10 @@ def get_wf_elastic_constant(structure, strain_states=None, stencils=None,
         wf_elastic.append_wf(Workflow.from_Firework(fw_analysis),
                              wf_elastic.leaf_fw_ids)
 
+    if pack_size:
+        wf_elastic = pack_vasp_fws(wf_elastic, pack_size=pack_size,
+                                   fw_name_constraint="deformation")
+
     wf_elastic.name = "{}:{}".format(structure.composition.reduced_formula,
                                      "elastic constants")
 
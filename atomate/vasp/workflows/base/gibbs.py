@@ -12,7 +12,7 @@ from fireworks import Firework, Workflow
 from pymatgen.analysis.elasticity.strain import Deformation
 from pymatgen.io.vasp.sets import MPStaticSet
 
-from atomate.utils.utils import get_logger
+from atomate.utils.utils import get_logger, get_fws_and_tasks
 from atomate.vasp.firetasks.parse_outputs import GibbsAnalysisToDb
 from atomate.vasp.workflows.base.deformations import get_wf_deformations
 
@@ -82,6 +82,11 @@ def get_wf_gibbs_free_energy(structure, deformations, vasp_input_set=None, vasp_
                                    vasp_cmd=vasp_cmd, db_file=db_file, tag=tag, metadata=metadata,
                                    vasp_input_set=vis_static)
 
+    if qha_type not in ["debye_model"]:
+        # keep the force constants out of the task docs; the analysis reads them from GridFS
+        for idx_fw, idx_t in get_fws_and_tasks(wf_gibbs, task_name_constraint="VaspToDb"):
+            wf_gibbs.fws[idx_fw].tasks[idx_t]["binary_arrays"] = True
+
     fw_analysis = Firework(GibbsAnalysisToDb(tag=tag, db_file=db_file, t_step=t_step, t_min=t_min,
                                              t_max=t_max, mesh=mesh, eos=eos, qha_type=qha_type,
                                              pressure=pressure, poisson=poisson, metadata=metadata,
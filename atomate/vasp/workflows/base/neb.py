@@ -7,8 +7,6 @@ This module defines the Nudged Elastic Band (NEB) workflow.
 
 from datetime import datetime
 
-from pymatgen_diffusion.neb.io import get_endpoints_from_index
-
 from fireworks.core.firework import Workflow
 
 from atomate.vasp.fireworks.core import NEBFW, NEBRelaxationFW
@@ -90,6 +88,8 @@ def get_wf_neb_from_structure(structure, user_incar_settings=None, additional_sp
         Workflow
 
     """
+    from pymatgen_diffusion.neb.io import get_endpoints_from_index
+
     spec = _update_spec(additional_spec)
     site_indices = spec["site_indices"]
     is_optimized = spec["is_optimized"]
@@ -12,7 +12,7 @@ from fireworks import Firework, Workflow
 from pymatgen.analysis.elasticity.strain import Deformation
 from pymatgen.io.vasp.sets import MPStaticSet
 
-from atomate.utils.utils import get_logger
+from atomate.utils.utils import get_logger, get_fws_and_tasks
 from atomate.vasp.firetasks.parse_outputs import ThermalExpansionCoeffToDb
 from atomate.vasp.workflows.base.deformations import get_wf_deformations
 
@@ -70,6 +70,10 @@ def get_wf_thermal_expansion(structure, deformations, vasp_input_set=None, vasp_
                                    copy_vasp_outputs=copy_vasp_outputs,
                                    vasp_input_set=vis_static)
 
+    # keep the force constants out of the task docs; the analysis reads them from GridFS
+    for idx_fw, idx_t in get_fws_and_tasks(wf_alpha, task_name_constraint="VaspToDb"):
+        wf_alpha.fws[idx_fw].tasks[idx_t]["binary_arrays"] = True
+
     fw_analysis = Firework(ThermalExpansionCoeffToDb(tag=tag, db_file=db_file, t_step=t_step,
                                                      t_min=t_min, t_max=t_max, mesh=mesh, eos=eos,
                                                      pressure=pressure),
@@ -10,7 +10,7 @@ from fireworks.core.rocket_launcher import rapidfire
 
 from atomate.vasp.powerups import use_fake_vasp
 from atomate.vasp.workflows.base.adsorption import get_wf_slab, \
-    get_slab_trans_params, MPSurfaceSet
+    get_slab_trans_params, get_wfs_all_slabs, MPSurfaceSet
 from atomate.utils.testing import AtomateTest
 
 from pymatgen import Structure, Molecule, Lattice
@@ -156,6 +156,36 @@ class TestAdsorptionWorkflow(AtomateTest):
         wf = self.lp.get_wf_by_fw_id(1)
         self.assertTrue(all([s == 'COMPLETED' for s in wf.fw_states.values()]))
 
+    def test_wfs_all_slabs(self):
+        adsorbates = [Molecule("H", [[0, 0, 0]])]
+        wfs = get_wfs_all_slabs(self.struct_ir, adsorbates=adsorbates)
+        self.assertEqual(len(wfs), len(self.slabs))
+
+        # same workflows when generated in parallel
+        wfs_parallel = get_wfs_all_slabs(self.struct_ir, adsorbates=adsorbates,
+                                         nprocs=2)
+        self.assertEqual([[fw.name for fw in wf.fws] for wf in wfs],
+                         [[fw.name for fw in wf.fws] for wf in wfs_parallel])
+
+        # one oriented bulk optimization per Miller index
+        wfs = get_wfs_all_slabs(self.struct_ir, include_bulk_opt=True,
+                                adsorbates=adsorbates, nprocs=2)
+        miller_indices = {slab.miller_index for slab in self.slabs}
+        self.assertEqual(len(wfs), len(miller_indices))
+        for wf in wfs:
+            bulk_fws = [fw for fw in wf.fws if fw.name.endswith("structure optimization")]
+            self.assertEqual(len(bulk_fws), 1)
+            self.assertEqual(len(wf.links[bulk_fws[0].fw_id]), len(wf.fws) - 1)
+
+        # the slab_gen_params are all passed on to the SlabGenerator
+        sgp = {"min_slab_size": 7.0, "min_vacuum_size": 20.0, "in_unit_planes": True,
+               "max_normal_search": 1, "include_reconstructions": False}
+        wfs = get_wfs_all_slabs(self.struct_ir, slab_gen_params=sgp, nprocs=2)
+        self.assertEqual(len(wfs), len(generate_all_slabs(self.struct_ir, 1, **sgp)))
+        sgp["min_slab_sise"] = 5.0
+        self.assertRaises(TypeError, get_wfs_all_slabs, self.struct_ir,
+                          slab_gen_params=sgp, nprocs=2)
+
 
 if __name__ == "__main__":
     unittest.main()
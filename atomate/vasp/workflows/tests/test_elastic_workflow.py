@@ -14,9 +14,11 @@ from fireworks.core.rocket_launcher import rapidfire
 from atomate.vasp.powerups import use_fake_vasp, add_modify_incar
 from atomate.vasp.workflows.base.elastic import get_wf_elastic_constant
 from atomate.vasp.workflows.presets.core import wf_elastic_constant, wf_elastic_constant_minimal, get_wf
-from atomate.vasp.firetasks.parse_outputs import ElasticTensorToDb
+from atomate.vasp.firetasks.parse_outputs import ElasticTensorToDb, get_elastic_fitting_data
 from atomate.utils.testing import AtomateTest
 
+from pymatgen.analysis.elasticity.strain import Deformation, Strain
+from pymatgen.analysis.elasticity.stress import Stress
 from pymatgen.util.testing import PymatgenTest
 from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
 from pymatgen import Structure
@@ -176,6 +178,34 @@ class TestElasticWorkflow(AtomateTest):
         wf = self.lp.get_wf_by_fw_id(1)
         self.assertTrue(all([s == 'COMPLETED' for s in wf.fw_states.values()]))
 
+    def test_elastic_fitting_data(self):
+        symmops = SpacegroupAnalyzer(self.struct_si).get_symmetry_operations(cartesian=True)
+        defo_dicts = []
+        for n, defo in enumerate([np.eye(3) + 0.01 * np.triu(np.ones((3, 3))),
+                                  np.diag([1.02, 1, 1])]):
+            defo = Deformation(defo)
+            stress = np.diag([1., 2., 3.]) * (n + 1) + 0.5
+            defo_dicts.append({"stress": stress.tolist(),
+                               "strain": defo.green_lagrange_strain.tolist(),
+                               "deformation_matrix": defo.tolist(),
+                               "symmops": symmops[:5] if n else []})
+
+        stresses, strains, defos, pk_stresses = get_elastic_fitting_data(defo_dicts)
+        self.assertEqual(stresses.shape, (7, 3, 3))
+        for i, (defo_dict, symmop) in enumerate([(defo_dicts[0], None)] +
+                                                [(defo_dicts[1], None)] +
+                                                [(defo_dicts[1], op) for op in symmops[:5]]):
+            stress = Stress(defo_dict["stress"])
+            strain = Strain(defo_dict["strain"])
+            defo = Deformation(defo_dict["deformation_matrix"])
+            if symmop:
+                stress, strain, defo = [t.transform(symmop) for t in (stress, strain, defo)]
+            np.testing.assert_allclose(stresses[i], -0.1 * stress, atol=1e-12)
+            np.testing.assert_allclose(strains[i], strain, atol=1e-12)
+            np.testing.assert_allclose(defos[i], defo, atol=1e-12)
+            np.testing.assert_allclose(pk_stresses[i], (-0.1 * stress).piola_kirchoff_2(defo),
+                                       atol=1e-12)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,91 @@
+"""
+Micro-benchmark of the stress/strain post-processing of ElasticTensorToDb on
+third-order inputs with symmetry-reduced deformations, comparing the former
+loop over Stress/Strain/Deformation objects with the batched
+get_elastic_fitting_data, and checking that both give the same fit.
+
+Usage: python bench_elastic_fitting.py [n_repeats]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from pymatgen.analysis.elasticity.elastic import ElasticTensorExpansion
+from pymatgen.analysis.elasticity.strain import Deformation, Strain
+from pymatgen.analysis.elasticity.stress import Stress
+from pymatgen.core.tensors import symmetry_reduce
+from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
+from pymatgen.util.testing import PymatgenTest
+
+from atomate.vasp.firetasks.parse_outputs import get_elastic_fitting_data
+from atomate.vasp.workflows.base.elastic import get_default_strain_states
+
+
+def get_loop_fitting_data(defo_dicts):
+    stresses, strains, deformations = [], [], []
+    for defo_dict in defo_dicts:
+        stresses.append(Stress(defo_dict["stress"]))
+        strains.append(Strain(defo_dict["strain"]))
+        deformations.append(Deformation(defo_dict["deformation_matrix"]))
+        for symmop in defo_dict.get("symmops", []):
+            stresses.append(Stress(defo_dict["stress"]).transform(symmop))
+            strains.append(Strain(defo_dict["strain"]).transform(symmop))
+            deformations.append(Deformation(defo_dict["deformation_matrix"]).transform(symmop))
+    stresses = [-0.1 * s for s in stresses]
+    pk_stresses = [stress.piola_kirchoff_2(deformation)
+                   for stress, deformation in zip(stresses, deformations)]
+    return stresses, strains, deformations, pk_stresses
+
+
+def get_order3_defo_dicts(structure):
+    # strains of the default order 3 elastic workflow, with a linear-elastic
+    # stress from a cubic stiffness tensor standing in for VASP
+    c11, c12, c44 = 165., 64., 79.
+    stiffness = np.zeros((6, 6))
+    stiffness[:3, :3] = c12
+    stiffness[np.arange(3), np.arange(3)] = c11
+    stiffness[np.arange(3, 6), np.arange(3, 6)] = c44
+    strains = []
+    for state in get_default_strain_states(3):
+        for s in np.linspace(-0.01, 0.01, 7):
+            if s:
+                strains.append(Strain.from_voigt(s * np.array(state)))
+    deformations = symmetry_reduce([s.get_deformation_matrix() for s in strains], structure)
+    defo_dicts = []
+    for defo, symmops in deformations.items():
+        strain = defo.green_lagrange_strain
+        stress = Stress.from_voigt(-10 * stiffness.dot(strain.voigt))
+        defo_dicts.append({"stress": stress.tolist(), "strain": strain.tolist(),
+                           "deformation_matrix": defo.tolist(), "symmops": symmops})
+    return defo_dicts
+
+
+def bench(func, defo_dicts, n):
+    t0 = time.time()
+    for _ in range(n):
+        result = func(defo_dicts)
+    return (time.time() - t0) / n, result
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    structure = SpacegroupAnalyzer(
+        PymatgenTest.get_structure("Si")).get_conventional_standard_structure()
+    defo_dicts = get_order3_defo_dicts(structure)
+    n_tensors = sum(1 + len(d["symmops"]) for d in defo_dicts)
+
+    t_loop, loop_data = bench(get_loop_fitting_data, defo_dicts, n)
+    t_batch, batch_data = bench(get_elastic_fitting_data, defo_dicts, n)
+    for a, b in zip(loop_data, batch_data):
+        np.testing.assert_allclose(np.array(a), b, atol=1e-12)
+
+    fits = [ElasticTensorExpansion.from_diff_fit(data[1], data[3], order=3)
+            for data in (loop_data, batch_data)]
+    for a, b in zip(*fits):
+        np.testing.assert_allclose(a, b, atol=1e-8)
+
+    print("{} deformations, {} stress/strain pairs".format(len(defo_dicts), n_tensors))
+    print("  loop:    {:.1f} ms".format(t_loop * 1e3))
+    print("  batched: {:.1f} ms".format(t_batch * 1e3))
@@ -0,0 +1,64 @@
+"""
+Micro-benchmark of get_phonopy_qha with synthetic force constants, comparing
+the serial computation of the phonon thermal properties of each volume with
+a process pool, and checking that both give the same Gibbs free energies.
+
+The force constants are those of a nearest-neighbor spring model of a Si
+supercell, with a spring constant decreasing with the volume.
+
+Usage: python bench_phonopy_qha.py [n_volumes] [mesh] [nprocs]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
+from pymatgen.util.testing import PymatgenTest
+
+from atomate.vasp.analysis.phonopy import get_phonopy_qha
+
+
+def get_spring_force_constants(structure, k, cutoff=2.5):
+    # force constants of central springs between neighbors, with the
+    # acoustic sum rule on the diagonal. get_phonopy_qha negates them.
+    n = len(structure)
+    fc = np.zeros((n, n, 3, 3))
+    for i, neighbors in enumerate(structure.get_all_neighbors(cutoff)):
+        for nn in neighbors:
+            r = nn.coords - structure[i].coords
+            r /= np.linalg.norm(r)
+            fc[i, nn.index] -= k * np.outer(r, r)
+            fc[i, i] += k * np.outer(r, r)
+    return (-fc).tolist()
+
+
+if __name__ == "__main__":
+    n_volumes = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    mesh = [int(sys.argv[2]) if len(sys.argv) > 2 else 30] * 3
+    nprocs = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    structure = SpacegroupAnalyzer(
+        PymatgenTest.get_structure("Si")).get_conventional_standard_structure()
+    structure.make_supercell([2, 2, 2])
+    v0 = structure.volume
+    volumes, energies, force_constants = [], [], []
+    for x in np.linspace(0.94, 1.06, n_volumes):
+        s = structure.copy()
+        s.scale_lattice(v0 * x)
+        volumes.append(s.volume)
+        energies.append(-5.4 * len(s) + 0.6 * len(s) * (x - 1) ** 2)
+        force_constants.append(get_spring_force_constants(s, 10.0 * x ** -4))
+
+    results = {}
+    for n in (1, nprocs):
+        t0 = time.time()
+        qha = get_phonopy_qha(energies, volumes, force_constants, structure, 0, 10, 1000,
+                              mesh, "vinet", nprocs=n)
+        results[n] = (time.time() - t0, qha.get_gibbs_temperature())
+
+    np.testing.assert_allclose(results[1][1], results[nprocs][1], rtol=1e-12)
+    print("{} volumes of {} atoms, mesh {}".format(n_volumes, len(structure), mesh))
+    print("  serial:   {:.2f} s".format(results[1][0]))
+    print("  parallel: {:.2f} s (nprocs={})".format(results[nprocs][0], nprocs or "all"))
@@ -0,0 +1,39 @@
+"""
+Micro-benchmark of the per-structure construction time of library workflows,
+comparing a fresh compilation of the spec for every structure (the behavior
+before compiled templates) with the memoized WorkflowTemplate.
+
+Usage: python bench_wf_templates.py [n_structures] [wf_filename]
+"""
+
+import sys
+import time
+from copy import deepcopy
+
+from pymatgen.util.testing import PymatgenTest
+
+from atomate.utils.utils import WorkflowTemplate, get_wf_template
+from atomate.vasp.workflows.base.core import _load_library_spec, get_wf
+
+
+def bench(func, structures):
+    t0 = time.time()
+    for s in structures:
+        func(s)
+    return (time.time() - t0) / len(structures)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    wf_filename = sys.argv[2] if len(sys.argv) > 2 else "band_structure.yaml"
+    structures = [PymatgenTest.get_structure(f) for f in ["Si", "CsCl", "LiFePO4"]] * n
+    spec = _load_library_spec(wf_filename)
+
+    t_compile = bench(lambda s: WorkflowTemplate(deepcopy(spec)).get_wf(s), structures)
+    t_template = bench(get_wf_template(spec).get_wf, structures)
+    t_get_wf = bench(lambda s: get_wf(s, wf_filename), structures)
+
+    print("{} ({} structures)".format(wf_filename, len(structures)))
+    print("  compiled per structure: {:.2f} ms/structure".format(t_compile * 1e3))
+    print("  compiled template:      {:.2f} ms/structure".format(t_template * 1e3))
+    print("  get_wf (memoized):      {:.2f} ms/structure".format(t_get_wf * 1e3))